@@ -9,7 +9,11 @@ import time
 import re
 import pyperclip
 import json # Added json import for MemoryManager
+import hashlib
 import threading # Added threading import for CronosManager
+import queue
+from concurrent.futures import wait, FIRST_COMPLETED
+from pathlib import Path
 
 # LAZY IMPORTS - Se cargan solo cuando se necesitan para inicio rápido
 pywhatkit = None
@@ -62,7 +66,8 @@ def _lazy_import_openai():
     return OpenAI
 
 from config import ConfigManager
-from voice import NeuralVoiceEngine
+from voice import NeuralVoiceEngine, FRASES_SISTEMA, parametros_de_perfil
+from speech_scheduler import PRIORIDAD_INFO, PRIORIDAD_ALARMA
 from devops import DevOpsManager
 from monitor import SystemMonitor
 from system_control import SystemControl
@@ -78,13 +83,43 @@ from calendar_module import CalendarManager
 from conversation_memory import ConversationMemory
 from weather_api import obtener_weather
 from routines import obtener_rutinas  # NUEVO  # NUEVO
-from second_brain import SecondBrain # CEREBRO VECTORIAL (NUEVO)
+from second_brain import SecondBrain, usa_memoria # CEREBRO VECTORIAL (NUEVO)
 from intent_classifier import HybridIntentClassifier # NLU HÍBRIDO (NUEVO)
+from keyword_router import obtener_router # ROUTER AHO-CORASICK (NUEVO)
+from latency_tracer import obtener_tracer # TRAZAS DE LATENCIA (NUEVO)
+from response_cache import ResponseCache # CACHE DE RESPUESTAS IA (NUEVO)
+from rate_limiter import obtener_rate_limiter # CUOTAS POR PROVEEDOR (NUEVO)
+from llm_io import obtener_llm_io # E/S LLM ASYNC (NUEVO)
+from context_budget import obtener_context_budget # PRESUPUESTO DE PROMPT (NUEVO)
+from local_llm import obtener_local_llm, _lazy_import_llama # MODELO LOCAL GGUF (NUEVO)
+from single_flight import SingleFlight # COALESCENCIA DE PETICIONES (NUEVO)
+from structured_output import esquema_acciones, describir_acciones, parametros_nativos, validar_accion, acciones_de, solo_acciones, ParserIncremental # JSON NATIVO (NUEVO)
 from web_agent import SaraWebSurfer # AGENTE WEB (NUEVO)
 
 # Constantes de configuración
 MAX_CHARS_VOZ = 200
+MAX_CHARS_VOZ_STREAM = 600  # Tope de lectura en voz de respuestas en streaming (el resto solo en chat)
 MAX_CHARS_TRANSLATION = 1000
+# Gemini: modelos a probar (en orden de prioridad/gratuidad)
+MODELOS_GEMINI_CANDIDATOS = [
+    'gemini-2.0-flash-exp',       # Experimental suele ser gratis
+    'gemini-2.0-flash-lite-preview-02-05', # Lite es eficiente
+    'gemini-1.5-flash',           # Estándar actual
+    'gemini-pro',                 # Legacy
+    'gemini-2.0-flash'            # Último recurso (puede tener cuota 0)
+]
+MODELO_GEMINI_DEFECTO = 'gemini-2.0-flash-exp'
+GEMINI_SYSTEM_INSTRUCTION = "Eres SARA, un asistente de IA avanzado. Tus respuestas son precisas y profesionales."
+GEMINI_MODELOS_CACHE_FILE = Path(__file__).resolve().parent / "gemini_models.json"  # Resultado de list_models() del último arranque
+GEMINI_MODELOS_TTL = 6 * 3600  # Pasado este tiempo se revalida en segundo plano
+
+# Sitios de consultar_ia que van primero al modelo local (tareas estructuradas baratas)
+SITIOS_LOCAL_PRIMERO = {"nlu", "router"}
+
+HEDGE_RETARDO_DEFECTO = 2.5  # Segundos antes de cubrir con otro proveedor (sin historial de latencia)
+HEDGE_RETARDO_MIN = 0.5
+HEDGE_RETARDO_MAX = 8.0
+MENSAJE_IA_OFFLINE = "⚠️ Modo Offline. Ve a 'Configuración' y agrega tus API Keys (Gemini, Groq o OpenAI) o un modelo local GGUF para activar la IA."
 
 APPS_LOCALES = {
     "word": "winword", "excel": "excel", "powerpoint": "powerpnt",
@@ -183,12 +218,12 @@ class CronosManager:
                         
                         # 2. Hablar
                         logging.info(f"ALARMA DESPERTADOR: {msg}")
-                        self.brain.voz.hablar(saludo)
+                        self.brain.voz.hablar(saludo, prioridad=PRIORIDAD_ALARMA)
                     else:
                         # Alarma Normal
                         aviso = f"¡Atención! Recordatorio: {msg}"
                         logging.info(f"ALARMA: {msg}")
-                        self.brain.voz.hablar(aviso)
+                        self.brain.voz.hablar(aviso, prioridad=PRIORIDAD_ALARMA)
                 else:
                     pendientes.append((fin, msg))
             
@@ -204,35 +239,63 @@ class SaraBrain:
         self.ia_online = False
         self.clients = {}
         self.preferred_provider = self.config.get("provider", "Gemini")
-        self.voz = NeuralVoiceEngine()
+        self.voz = NeuralVoiceEngine(self.config)
         self.devops = DevOpsManager()
         self.monitor = SystemMonitor() # Kept from original __init__
         self.memory = MemoryManager() # Cerebro a largo plazo (Clásico)
         self.cronos = CronosManager(self) # Referencia circular segura
         
-        # OPTIMIZACIÓN: Inicializar Intent Classifier PRIMERO (carga el modelo)
+        # OPTIMIZACIÓN: Inicializar Intent Classifier PRIMERO (el modelo carga en segundo plano)
         try:
             if splash_callback:
-                splash_callback(30, "Cargando NLU...", "Modelo all-MiniLM-L6-v2")
+                splash_callback(30, "Cargando NLU...", "Modelo all-MiniLM-L6-v2 (segundo plano)")
             # Pasamos self.consultar_ia como callback para Layer 3 (AI Fallback)
             # Y splash_callback para mostrar progreso
-            self.intent_classifier = HybridIntentClassifier(ia_callback=self.consultar_ia, splash_callback=splash_callback)
-            logging.info("✅ HybridIntentClassifier inicializado")
+            self.intent_classifier = HybridIntentClassifier(
+                ia_callback=self.consultar_ia,
+                splash_callback=splash_callback,
+                backend=self.config.get("nlu_backend")
+            )
+            logging.info("✅ HybridIntentClassifier inicializado (Capa 2 cargando en segundo plano)")
         except Exception as e:
             logging.error(f"❌ Error inicializando HybridIntentClassifier: {e}")
             self.intent_classifier = None
+
+        # Router de palabras clave compilado (cadena legacy en una sola pasada)
+        self.router = obtener_router()
+
+        # Trazas de latencia por etapa (stt -> nlu -> rag -> llm -> tts)
+        self.tracer = obtener_tracer()
+
+        # Cache persistente de respuestas IA (exacto + semántico con el MiniLM del NLU)
+        try:
+            self.response_cache = ResponseCache(embedder_fn=self._embedder_compartido)
+            logging.info("✅ ResponseCache inicializado")
+        except Exception as e:
+            logging.error(f"⚠️ Error inicializando cache de respuestas: {e}")
+            self.response_cache = None
+        
+        # Cuotas por proveedor (token bucket por minuto + contador diario en disco)
+        self.rate_limiter = obtener_rate_limiter(self.config.get("limites_ia"))
+        
+        # Peticiones IA idénticas en vuelo a la vez comparten una sola llamada
+        self.vuelos_ia = SingleFlight()
+        
+        # Presupuesto de tokens por prompt (RAG / historial / documentos recortados por relevancia)
+        self.context_budget = obtener_context_budget()
+        
         
         # OPTIMIZACIÓN: Pasar el modelo del NLU al Second Brain para reutilizarlo
         if splash_callback:
             splash_callback(60, "Inicializando Second Brain...", "Reutilizando modelo NLU")
         
-        # Pasar el modelo del intent_classifier al second_brain si está disponible
+        # Compartimos el Future del modelo: Second Brain no bloquea el arranque
         shared_model = None
-        if self.intent_classifier and hasattr(self.intent_classifier, 'model'):
-            shared_model = self.intent_classifier.model
+        if self.intent_classifier and hasattr(self.intent_classifier, 'model_future'):
+            shared_model = self.intent_classifier.model_future
             logging.info("🔄 Compartiendo modelo entre NLU y Second Brain")
         
-        self.second_brain = SecondBrain(shared_model=shared_model) # Cerebro Vectorial (RAG)
+        self.second_brain = SecondBrain(shared_model=shared_model, backend=self.config.get("nlu_backend")) # Cerebro Vectorial (RAG)
         self.web_agent = SaraWebSurfer() # Agente Web (Playwright)
         
         # Inicializar Calendario (NUEVO)
@@ -316,6 +379,10 @@ class SaraBrain:
             logging.error(f"⚠️ Error cargando perfil: {e}")
             self.perfil = None
         
+        # Voz, idioma y velocidad elegidos en el perfil (antes de precalentar el cache de audio)
+        if self.perfil:
+            self.aplicar_preferencias_voz()
+        
         # Inicializar Conversation Memory
         try:
             self.memory = ConversationMemory(max_history=10)
@@ -343,6 +410,9 @@ class SaraBrain:
         except Exception as e:
             logging.error(f"⚠️ Error inicializando rutinas: {e}")
             self.routines = None
+        
+        # Frases fijas al cache de audio: suenan al instante y sin red
+        self._precalentar_voz()
             
         self.conectar_ias()
         self.dictation_mode = False
@@ -350,12 +420,32 @@ class SaraBrain:
         # Asignar callback de IA al intent classifier (después de conectar_ias)
         if self.intent_classifier:
             self.intent_classifier.ia_callback = self.consultar_ia
+            self.intent_classifier.ia_json_callback = self.consultar_ia_estructurada
+
+    def aplicar_preferencias_voz(self):
+        """Reconfigura el motor de voz actual con el perfil y la config (nunca se sustituye self.voz)"""
+        voz = rate = None
+        if self.perfil:
+            voz, rate = parametros_de_perfil(self.perfil.profile["voice"])
+        self.voz.reconfigurar(self.config, voz=voz, rate=rate)
+
+    def _precalentar_voz(self):
+        """Pasa al TTS las frases fijas de rutinas, salud y Pomodoro (se sintetizan en segundo plano)"""
+        frases = list(FRASES_SISTEMA)
+        for modulo in (getattr(self, "routines", None), getattr(self, "health", None), getattr(self, "pomodoro", None)):
+            if modulo is not None:
+                try:
+                    frases.extend(modulo.frases_voz())
+                except Exception as e:
+                    logging.debug(f"Frases de voz no disponibles ({type(modulo).__name__}): {e}")
+        self.voz.precalentar(frases)
 
     def conectar_ias(self):
         # Recargar configuración para obtener las API keys más recientes
         self.config = ConfigManager.cargar_config()
         
         self.clients = {}
+        self.llm_io = obtener_llm_io()
         
         # GEMINI
         k_gem = self.config.get("gemini_key")
@@ -365,35 +455,19 @@ class SaraBrain:
             if genai_lib:
                 try:
                     genai_lib.configure(api_key=k_gem)
-                    # Lista de modelos a probar (en orden de prioridad/gratuidad)
-                    modelos_candidatos = [
-                        'gemini-2.0-flash-exp',       # Experimental suele ser gratis
-                        'gemini-2.0-flash-lite-preview-02-05', # Lite es eficiente
-                        'gemini-1.5-flash',           # Estándar actual
-                        'gemini-pro',                 # Legacy
-                        'gemini-2.0-flash'            # Último recurso (puede tener cuota 0)
-                    ]
-                    
-                    modelo_seleccionado = None
                     
-                    # Probar modelos disponibles
-                    try:
-                        disponibles = [m.name for m in genai_lib.list_models()]
-                        for candidato in modelos_candidatos:
-                            # Buscar coincidencia exacta o parcial (ej: context/models/)
-                            if any(candidato in m for m in disponibles):
-                                modelo_seleccionado = candidato
-                                break
-                    except: pass
+                    # Modelo elegido en el último arranque (sin ir a la red); se revalida en segundo plano
+                    cache = self._leer_cache_modelos_gemini(k_gem)
+                    modelo_seleccionado = cache["modelo"] if cache else MODELO_GEMINI_DEFECTO
                     
-                    # Si no se encontró ninguno de la lista, usar fallback
-                    if not modelo_seleccionado:
-                        modelo_seleccionado = 'gemini-2.0-flash-exp'
+                    self.clients["Gemini"] = self._crear_modelo_gemini(genai_lib, modelo_seleccionado)
                     
-                    self.clients["Gemini"] = genai_lib.GenerativeModel(
-                        modelo_seleccionado,
-                        system_instruction="Eres SARA, un asistente de IA avanzado. Tus respuestas son precisas y profesionales."
-                    )
+                    if not cache or time.time() - cache.get("timestamp", 0) > GEMINI_MODELOS_TTL:
+                        threading.Thread(
+                            target=self._revalidar_modelos_gemini,
+                            args=(genai_lib, k_gem, modelo_seleccionado),
+                            daemon=True
+                        ).start()
                     logging.info(f"✅ Gemini conectado exitosamente ({modelo_seleccionado})")
                 except Exception as e:
                     logging.warning(f"Error conectando Gemini: {e}")
@@ -424,7 +498,28 @@ class SaraBrain:
                 except Exception as e:
                     logging.warning(f"Error conectando OpenAI: {e}")
 
+        # LOCAL (GGUF en CPU): último en la lista, primero para tareas estructuradas
+        ruta_local = self.config.get("local_model_path")
+        if ruta_local:
+            if not os.path.exists(ruta_local):
+                logging.warning(f"Modelo local no encontrado: {ruta_local}")
+            elif _lazy_import_llama():
+                self.clients["Local"] = obtener_local_llm(ruta_local, self.config.get("local_threads") or None)
+                logging.info("✅ Modelo local conectado (cargando en segundo plano)")
+
         self.ia_online = len(self.clients) > 0
+        # El contexto corto del modelo local no debe encoger los prompts de la nube
+        self.context_budget.configurar_proveedores([p for p in self.clients if p != "Local"] or list(self.clients))
+        
+        # Clientes async: un solo event loop con conexiones keep-alive para todas las llamadas
+        try:
+            self.llm_io.conectar(
+                gemini_model=self.clients.get("Gemini"),
+                groq_key=k_groq if "Groq" in self.clients else "",
+                openai_key=k_openai if "ChatGPT" in self.clients else ""
+            )
+        except Exception as e:
+            logging.warning(f"Error preparando LLM I/O async (se usarán los clientes síncronos): {e}")
         
         # Actualizar proveedor preferido desde config
         nuevo_provider = self.config.get("provider", "Gemini")
@@ -438,100 +533,561 @@ class SaraBrain:
             
         return self.ia_online
 
-    def consultar_ia(self, prompt, contexto_extra=""):
-        if not self.ia_online: 
-            return "⚠️ Modo Offline. Ve a 'Configuración' y agrega tus API Keys (Gemini, Groq o OpenAI) para activar la IA.", "error"
+    @staticmethod
+    def _crear_modelo_gemini(genai_lib, modelo):
+        return genai_lib.GenerativeModel(modelo, system_instruction=GEMINI_SYSTEM_INSTRUCTION)
+
+    @staticmethod
+    def _huella_key(api_key):
+        """Identifica la API key en el cache sin guardarla (otra key puede ver otros modelos)"""
+        return hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:12]
+
+    def _leer_cache_modelos_gemini(self, api_key):
+        """Último descubrimiento de modelos Gemini para esta key (None si no hay)"""
+        try:
+            with open(GEMINI_MODELOS_CACHE_FILE, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("key") == self._huella_key(api_key) and cache.get("modelo"):
+                return cache
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"Cache de modelos Gemini ilegible: {e}")
+        return None
+
+    def _revalidar_modelos_gemini(self, genai_lib, api_key, modelo_actual):
+        """
+        Consulta list_models() en segundo plano, guarda el resultado y, si hay un
+        candidato mejor que el que se está usando, lo cambia en caliente.
+        """
+        try:
+            disponibles = [m.name for m in genai_lib.list_models()]
+        except Exception as e:
+            logging.info(f"No se pudo revalidar modelos Gemini (se mantiene {modelo_actual}): {e}")
+            return
+        
+        modelo_seleccionado = MODELO_GEMINI_DEFECTO
+        for candidato in MODELOS_GEMINI_CANDIDATOS:
+            # Buscar coincidencia exacta o parcial (ej: context/models/)
+            if any(candidato in m for m in disponibles):
+                modelo_seleccionado = candidato
+                break
+        
+        try:
+            tmp = GEMINI_MODELOS_CACHE_FILE.with_name(GEMINI_MODELOS_CACHE_FILE.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "key": self._huella_key(api_key),
+                    "modelo": modelo_seleccionado,
+                    "disponibles": disponibles,
+                    "timestamp": time.time()
+                }, f, indent=2)
+            os.replace(tmp, GEMINI_MODELOS_CACHE_FILE)
+        except Exception as e:
+            logging.warning(f"No se pudo guardar cache de modelos Gemini: {e}")
         
+        # Cambio en caliente (solo si la key no cambió mientras tanto)
+        if modelo_seleccionado != modelo_actual and self.config.get("gemini_key") == api_key and "Gemini" in self.clients:
+            try:
+                nuevo = self._crear_modelo_gemini(genai_lib, modelo_seleccionado)
+                self.clients["Gemini"] = nuevo
+                self.llm_io.reemplazar_cliente("Gemini", nuevo)
+                logging.info(f"🔄 Gemini: {modelo_actual} -> {modelo_seleccionado}")
+            except Exception as e:
+                logging.warning(f"No se pudo cambiar a {modelo_seleccionado}: {e}")
+
+    def _construir_prompt(self, prompt, contexto_extra="", historial=None, consulta_rag=None):
+        """
+        Prompt final con el contexto RAG del Second Brain y el historial, dentro del presupuesto de tokens.
+        Solo se buscan memorias si hay consulta_rag (según la política del sitio de llamada).
+        """
         # --- SECOND BRAIN CONTEXT INJECTION ---
-        contexto_rag = ""
-        if self.second_brain:
-             memories = self.second_brain.recordar(prompt)
-             if memories:
-                 contexto_rag = "\n[MEMORIA A LARGO PLAZO RECUPERADA]:\n" + "\n".join(memories) + "\n"
+        memorias = []
+        if self.second_brain and consulta_rag:
+             with self.tracer.etapa("rag"):
+                 memorias = self.second_brain.recordar_puntuado(consulta_rag)
+        
+        return self.context_budget.componer(prompt, contexto_extra, memorias, historial)
+
+    def _orden_proveedores(self, sitio=None):
+        """
+        Proveedor preferido primero, luego el resto (los que tienen cuota disponible delante).
+        El modelo local va primero en SITIOS_LOCAL_PRIMERO si ya está cargado; si no, al final.
+        """
+        orden = [self.preferred_provider] + [k for k in self.clients.keys() if k != self.preferred_provider]
+        orden = self.rate_limiter.ordenar([p for p in orden if p != "Local"])
+        
+        local = self.clients.get("Local")
+        if local is not None and not local.fallido():
+            if sitio in SITIOS_LOCAL_PRIMERO and local.listo():
+                orden.insert(0, "Local")
+            elif "Local" not in orden:
+                orden.append("Local")
+        return orden
+
+    def _embedder_compartido(self):
+        """Modelo de embeddings del NLU si ya terminó de cargar (None mientras tanto)"""
+        if self.intent_classifier and self.intent_classifier.modelo_listo():
+            return self.intent_classifier.model
+        return None
+
+    def consultar_ia(self, prompt, contexto_extra="", sitio=None, clave_semantica=None, historial=None,
+                     consulta_memoria=None):
+        """
+        Consulta al proveedor preferido (con fallback al resto).
+        
+        Args:
+            prompt: Prompt del usuario o de la función que llama
+            contexto_extra: Texto que se añade al final del prompt
+            sitio: Nombre del punto de llamada para el cache de respuestas
+                ("router", "resumen", "guardian"...). None = sin cache
+                (turnos de conversación).
+            clave_semantica: Parte variable del prompt (p.ej. el tema) para
+                reutilizar respuestas de peticiones casi iguales
+            historial: Turnos recientes de ConversationMemory; entran según
+                relevancia y presupuesto (ver context_budget.py)
+            consulta_memoria: Texto con el que buscar en el Second Brain si el
+                prompt es una plantilla larga (por defecto el prompt). Si el
+                sitio no usa memorias (ver POLITICAS_RECUPERACION) no se busca.
+        """
+        if not self.ia_online: 
+            return MENSAJE_IA_OFFLINE, "error"
+        
+        # --- CACHE DE RESPUESTAS (antes del RAG: un acierto ahorra también la búsqueda) ---
+        if self.response_cache and sitio:
+            with self.tracer.etapa("cache_ia"):
+                cacheada = self.response_cache.obtener(sitio, prompt, contexto_extra, clave_semantica)
+            if cacheada is not None:
+                return cacheada, "ai"
+        
+        consulta_rag = (consulta_memoria or prompt) if usa_memoria(sitio) else None
+        
+        # Single-flight: un duplicado simultáneo espera la respuesta de la llamada original
+        clave = self._clave_vuelo("texto", sitio, prompt, contexto_extra, historial, consulta_memoria)
+        inicio = time.perf_counter()
+        (respuesta, origen), compartido = self.vuelos_ia.ejecutar(
+            clave, self._consultar_proveedores, prompt, contexto_extra, historial, consulta_rag, sitio
+        )
+        if compartido:
+            self.tracer.registrar("ia_coalescida", (time.perf_counter() - inicio) * 1000)
+            return respuesta, origen
+        
+        if origen == "ai" and self.response_cache and sitio:
+            self.response_cache.guardar(sitio, prompt, respuesta, contexto_extra, clave_semantica)
+        return respuesta, origen
+
+    @staticmethod
+    def _clave_vuelo(tipo, sitio, prompt, *extras):
+        """Clave de coalescencia: mismo prompt normalizado y mismos parámetros"""
+        return (tipo, sitio, " ".join(prompt.split()),
+                json.dumps(extras, sort_keys=True, ensure_ascii=False, default=str))
+
+    @staticmethod
+    def _contexto_cache_json(esquema):
+        """Parte extra de la clave del cache para respuestas JSON: no comparten entrada
+        con el texto libre del mismo sitio/prompt ni con otro esquema"""
+        huella = hashlib.sha1(json.dumps(esquema, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return f"json:{huella[:16]}"
+
+    def _consultar_proveedores(self, prompt, contexto_extra="", historial=None, consulta_rag=None, sitio=None):
+        """Llamada real al LLM: proveedor preferido primero y fallback al resto"""
+        full_prompt = self._construir_prompt(prompt, contexto_extra, historial, consulta_rag)
+        providers = self._orden_proveedores(sitio)
         
-        full_prompt = f"{contexto_rag}{prompt} {contexto_extra}"
-        providers = [self.preferred_provider] + [k for k in self.clients.keys() if k != self.preferred_provider]
+        if self.config.get("hedging_ia") and len(self.clients) > 1:
+            return self._consultar_con_cobertura(full_prompt, providers)
         
         errores_limite = []  # Guardar errores de límite para reportar
         
         for p in providers:
             if p in self.clients:
+                if not self._reservar_turno(p, errores_limite):
+                    continue
                 try:
-                    if p == "Gemini": 
-                        # GEMINI: Soporta JSON mode nativo en modelos nuevos, pero usaremos texto estructurado por compatibilidad
-                        return self.clients[p].generate_content(full_prompt).text, "ai"
-                    else: 
-                        model = "llama-3.3-70b-versatile" if p == "Groq" else "gpt-4o-mini"
-                        
-                        # Configurar respuesta JSON si se solicita explícitamente en el prompt
-                        response_format = {"type": "json_object"} if "JSON" in full_prompt else None
-                        
-                        resp = self.clients[p].chat.completions.create(
-                            messages=[
-                                {"role": "system", "content": "Eres SARA. Responde brevemente. Si se pide JSON, entrega SOLO JSON válido."}, 
-                                {"role": "user", "content": full_prompt}
-                            ],
-                            model=model,
-                            response_format=response_format
-                        )
-                        return resp.choices[0].message.content, "ai"
-                        
+                    return self._enviar_proveedor(p, full_prompt).result(), "ai"
                 except Exception as e:
-                    error_str = str(e).lower()
-                    
-                    # Detectar errores de límite de uso
-                    if any(x in error_str for x in ["quota", "limit", "rate limit", "429", "resource exhausted", "too many requests"]):
-                        mensaje_limite = self._generar_mensaje_limite(p, error_str)
-                        errores_limite.append((p, mensaje_limite))
-                        logging.warning(f"⚠️ Límite alcanzado en {p}: {error_str}")
-                        continue
-                    
-                    # Detectar errores de autenticación
-                    elif any(x in error_str for x in ["invalid api key", "unauthorized", "401", "403", "authentication"]):
-                        logging.error(f"❌ API Key inválida para {p}: {error_str}")
-                        continue
-                    
-                    # Otros errores
-                    else:
-                        logging.error(f"Fallo IA {p}: {e}")
-                        continue
+                    self._registrar_error_ia(p, e, errores_limite)
+                    continue
+        
+        return self._mensaje_fallo_ias(errores_limite, providers), "error"
+
+    def _parametros_chat(self, p, full_prompt):
+        """Modelo / system / formato de respuesta de Groq y OpenAI"""
+        return {
+            "model": "llama-3.3-70b-versatile" if p == "Groq" else "gpt-4o-mini",
+            "system": "Eres SARA. Responde brevemente. Si se pide JSON, entrega SOLO JSON válido.",
+            # Configurar respuesta JSON si se solicita explícitamente en el prompt
+            "response_format": {"type": "json_object"} if "JSON" in full_prompt else None,
+        }
+
+    def _peticion_sync(self, p, full_prompt):
+        """Petición bloqueante con el cliente síncrono (si el SDK no trae cliente async)"""
+        if p == "Local":
+            params = self._parametros_chat(p, full_prompt)
+            return self.clients[p].generar(full_prompt, system=params["system"], json_mode=params["response_format"] is not None)
+        
+        if p == "Gemini": 
+            # GEMINI: Soporta JSON mode nativo en modelos nuevos, pero usaremos texto estructurado por compatibilidad
+            return self.clients[p].generate_content(full_prompt).text
+        
+        params = self._parametros_chat(p, full_prompt)
+        resp = self.clients[p].chat.completions.create(
+            messages=[
+                {"role": "system", "content": params["system"]}, 
+                {"role": "user", "content": full_prompt}
+            ],
+            model=params["model"],
+            response_format=params["response_format"]
+        )
+        return resp.choices[0].message.content
+
+    def _enviar_proveedor(self, p, full_prompt, traza=None):
+        """
+        Lanza la petición a p en el loop de E/S LLM y devuelve su Future.
+        La latencia de las respuestas buenas alimenta el tracer (y el p90 del hedging).
+        """
+        if traza is None:
+            traza = self.tracer.traza_actual()
+        inicio = time.perf_counter()
+        
+        if self.llm_io.disponible(p):
+            if p == "Gemini":
+                futuro = self.llm_io.completar(p, full_prompt)
+            else:
+                futuro = self.llm_io.completar(p, full_prompt, **self._parametros_chat(p, full_prompt))
+        else:
+            futuro = self.llm_io.bloqueante(self._peticion_sync, p, full_prompt)
+        
+        def medir(f):
+            # Solo las respuestas buenas (un 429 rápido falsearía el p90)
+            if not f.cancelled() and f.exception() is None:
+                self.tracer.registrar(f"llm:{p}", (time.perf_counter() - inicio) * 1000, traza)
         
+        futuro.add_done_callback(medir)
+        return futuro
+
+    def _retardo_cobertura(self, p):
+        """Cuánto esperar a p antes de lanzar el siguiente: su p90 histórico (acotado)"""
+        pxx = self.tracer.percentil(f"llm:{p}", self.config.get("hedge_percentil", 90))
+        if pxx is None:
+            return HEDGE_RETARDO_DEFECTO
+        return min(HEDGE_RETARDO_MAX, max(HEDGE_RETARDO_MIN, pxx / 1000))
+
+    def _consultar_con_cobertura(self, full_prompt, providers):
+        """
+        Hedging: se lanza el preferido y, si no responde dentro de su p90, el
+        siguiente en paralelo. Gana la primera respuesta válida; las demás se
+        cancelan (el loop de E/S corta la petición HTTP en curso).
+        """
+        candidatos = [p for p in providers if p in self.clients]
+        traza = self.tracer.traza_actual()
+        errores_limite = []
+        pendientes = {}  # future -> proveedor
+        lanzados = []
+        
+        def lanzar_siguiente():
+            while len(lanzados) < len(candidatos):
+                p = candidatos[len(lanzados)]
+                lanzados.append(p)
+                if self._reservar_turno(p, errores_limite):
+                    pendientes[self._enviar_proveedor(p, full_prompt, traza)] = p
+                    return True
+            return False
+        
+        lanzar_siguiente()
+        while pendientes:
+            quedan = len(lanzados) < len(candidatos)
+            espera = self._retardo_cobertura(lanzados[-1]) if quedan else None
+            hechos, _ = wait(pendientes, timeout=espera, return_when=FIRST_COMPLETED)
+            
+            if not hechos:
+                logging.info(f"🏁 {lanzados[-1]} tarda más de {espera:.1f}s, cubriendo con el siguiente proveedor")
+                lanzar_siguiente()
+                continue
+            
+            for futuro in hechos:
+                p = pendientes.pop(futuro)
+                try:
+                    texto = futuro.result()
+                except Exception as e:
+                    self._registrar_error_ia(p, e, errores_limite)
+                    continue
+                if texto:
+                    for resto in pendientes:
+                        resto.cancel()
+                    if len(lanzados) > 1:
+                        logging.info(f"🏁 Respuesta de {p} (cobertura entre {', '.join(lanzados)})")
+                    return texto, "ai"
+            
+            # Los que terminaron fallaron: fallback inmediato, sin esperar el p90
+            if quedan:
+                lanzar_siguiente()
+        
+        return self._mensaje_fallo_ias(errores_limite, providers), "error"
+
+    def _reservar_turno(self, p, errores_limite):
+        """Reserva cuota antes de llamar; sin margen se salta el proveedor sin gastar la petición"""
+        if self.rate_limiter.reservar(p):
+            return True
+        errores_limite.append((p, self._generar_mensaje_limite(p)))
+        logging.info(f"🚦 {p} sin cuota disponible, probando el siguiente proveedor")
+        return False
+
+    def _registrar_error_ia(self, p, e, errores_limite):
+        """Clasifica el error de un proveedor (límite / API key / otro) y lo registra"""
+        error_str = str(e).lower()
+        
+        # Detectar errores de límite de uso
+        if any(x in error_str for x in ["quota", "limit", "rate limit", "429", "resource exhausted", "too many requests"]):
+            self.rate_limiter.penalizar(p, error_str)
+            mensaje_limite = self._generar_mensaje_limite(p, error_str)
+            errores_limite.append((p, mensaje_limite))
+            logging.warning(f"⚠️ Límite alcanzado en {p}: {error_str}")
+        
+        # Detectar errores de autenticación
+        elif any(x in error_str for x in ["invalid api key", "unauthorized", "401", "403", "authentication"]):
+            logging.error(f"❌ API Key inválida para {p}: {error_str}")
+        
+        # Otros errores
+        else:
+            logging.error(f"Fallo IA {p}: {e}")
+
+    def _mensaje_fallo_ias(self, errores_limite, providers):
+        """Mensaje final cuando ningún proveedor respondió"""
         # Si todos fallaron por límite, dar mensaje específico
         if errores_limite:
             if len(errores_limite) == len(providers):
                 # Todos los proveedores alcanzaron el límite
-                return self._mensaje_todos_limites_alcanzados(errores_limite), "error"
+                return self._mensaje_todos_limites_alcanzados(errores_limite)
             else:
                 # Algunos alcanzaron límite, otros fallaron
-                return errores_limite[0][1], "error"
+                return errores_limite[0][1]
         
         # Si llegamos aquí, todos fallaron por otras razones
-        return "❌ Error: Todas las IAs fallaron. Verifica tus API Keys en Configuración.", "error"
+        return "❌ Error: Todas las IAs fallaron. Verifica tus API Keys en Configuración."
+
+    def _stream_proveedor(self, p, full_prompt, esquema=None):
+        """
+        Fragmentos de texto del proveedor p según van llegando (streaming nativo).
+        Con esquema, se pide JSON con el modo nativo del proveedor (ver structured_output.py).
+        
+        La petición corre en el loop de E/S LLM (mismo semáforo y pool HTTP que
+        consultar_ia); este hilo solo consume los fragmentos.
+        """
+        nativo = parametros_nativos(p, esquema) if esquema else {}
+        if not self.llm_io.disponible(p):
+            return self.llm_io.stream_bloqueante(self._stream_sync, p, full_prompt, esquema)
+        if p == "Gemini":
+            return self.llm_io.stream(p, full_prompt, **nativo)
+        return self.llm_io.stream(
+            p, full_prompt,
+            model="llama-3.3-70b-versatile" if p == "Groq" else "gpt-4o-mini",
+            system=self._system_stream(esquema),
+            **nativo
+        )
+
+    @staticmethod
+    def _system_stream(esquema):
+        return "Eres SARA. Entrega SOLO JSON válido." if esquema else "Eres SARA. Responde brevemente."
+
+    def _stream_sync(self, p, full_prompt, esquema=None):
+        """Streaming con el cliente síncrono (modelo local o SDK sin cliente async)"""
+        nativo = parametros_nativos(p, esquema) if esquema else {}
+        system = self._system_stream(esquema)
+        
+        if p == "Local":
+            yield from self.clients[p].generar_stream(full_prompt, system=system, **nativo)
+        elif p == "Gemini":
+            for chunk in self.clients[p].generate_content(full_prompt, stream=True, **nativo):
+                try:
+                    texto = chunk.text
+                except ValueError:
+                    # Chunk sin texto (p.ej. solo metadatos de seguridad)
+                    continue
+                if texto:
+                    yield texto
+        else:
+            model = "llama-3.3-70b-versatile" if p == "Groq" else "gpt-4o-mini"
+            stream = self.clients[p].chat.completions.create(
+                messages=[
+                    {"role": "system", "content": system}, 
+                    {"role": "user", "content": full_prompt}
+                ],
+                model=model,
+                stream=True,
+                **nativo
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def consultar_ia_stream(self, prompt, contexto_extra=""):
+        """
+        Como consultar_ia, pero la respuesta se va leyendo en voz mientras llega:
+        cada frase completa pasa al TTS en cuanto se cierra, así el primer audio
+        tarda lo que tarda la primera frase y no la respuesta entera.
+        
+        Returns:
+            (texto_completo, "ai_stream") si ya se habló, o lo mismo que consultar_ia
+            si no se pudo hacer streaming.
+        """
+        if not self.ia_online or not self.voz:
+            return self.consultar_ia(prompt, contexto_extra)
+        
+        full_prompt = self._construir_prompt(prompt, contexto_extra, consulta_rag=prompt)
+        providers = self._orden_proveedores()
+        errores_limite = []
+        
+        for p in providers:
+            if p not in self.clients or not self._reservar_turno(p, errores_limite):
+                continue
+            
+            inicio = time.perf_counter()
+            fragmentos = self._stream_proveedor(p, full_prompt)
+            try:
+                # Si el proveedor falla antes del primer token, probamos el siguiente
+                primero = next(fragmentos)
+            except StopIteration:
+                logging.warning(f"Respuesta vacía en streaming de {p}")
+                continue
+            except Exception as e:
+                self._registrar_error_ia(p, e, errores_limite)
+                continue
+            self.tracer.registrar(f"llm_primer_token:{p}", (time.perf_counter() - inicio) * 1000)
+            
+            # A partir de aquí la respuesta se va hablando
+            canal = queue.Queue()
+            self.voz.hablar_stream(iter(canal.get, None))
+            
+            partes = [primero]
+            leidos = len(primero)
+            canal.put(primero)
+            try:
+                for fragmento in fragmentos:
+                    partes.append(fragmento)
+                    if leidos < MAX_CHARS_VOZ_STREAM:
+                        canal.put(fragmento)
+                        leidos += len(fragmento)
+            except Exception as e:
+                logging.error(f"Streaming de {p} interrumpido: {e}")
+            finally:
+                canal.put(None)  # Fin del stream para el TTS
+            
+            self.tracer.registrar(f"llm:{p}", (time.perf_counter() - inicio) * 1000)
+            return "".join(partes), "ai_stream"
+        
+        return self._mensaje_fallo_ias(errores_limite, providers), "error"
     
-    def _generar_mensaje_limite(self, provider, error_str):
+    def consultar_ia_estructurada(self, prompt, esquema, sitio=None, al_elemento=None):
+        """
+        Pide JSON con el modo nativo de cada proveedor y lo lee en streaming.
+        
+        Args:
+            prompt: Instrucciones (el esquema va aparte, en modo nativo)
+            esquema: JSON Schema de la respuesta (ver structured_output.py)
+            sitio: Sitio de llamada (cache, memorias, modelo local primero)
+            al_elemento: Se llama con cada elemento de array en cuanto se
+                cierra, antes de que termine la respuesta
+        
+        Returns:
+            (datos, origen): datos = JSON completo (None si no se pudo parsear)
+        """
+        if not self.ia_online:
+            return None, "error"
+        
+        # Cache: la respuesta completa se reproduce elemento a elemento
+        if self.response_cache and sitio:
+            with self.tracer.etapa("cache_ia"):
+                cacheada = self.response_cache.obtener(sitio, prompt, self._contexto_cache_json(esquema))
+            if cacheada is not None:
+                parser = ParserIncremental()
+                for elemento in parser.alimentar(cacheada):
+                    if al_elemento:
+                        al_elemento(elemento)
+                return parser.resultado(), "ai"
+        
+        # Sin callback por elemento no hay efectos por llamador: los duplicados simultáneos se coalescen
+        if al_elemento is None:
+            clave = self._clave_vuelo("json", sitio, prompt, esquema)
+            inicio = time.perf_counter()
+            (datos, origen), compartido = self.vuelos_ia.ejecutar(
+                clave, self._estructurada_proveedores, prompt, esquema, sitio, None
+            )
+            if compartido:
+                self.tracer.registrar("ia_coalescida", (time.perf_counter() - inicio) * 1000)
+            return datos, origen
+        return self._estructurada_proveedores(prompt, esquema, sitio, al_elemento)
+
+    def _estructurada_proveedores(self, prompt, esquema, sitio, al_elemento):
+        """Llamada real de consultar_ia_estructurada: streaming JSON con fallback entre proveedores"""
+        consulta_rag = prompt if usa_memoria(sitio) else None
+        full_prompt = self._construir_prompt(prompt, consulta_rag=consulta_rag)
+        providers = self._orden_proveedores(sitio)
+        errores_limite = []
+        
+        for p in providers:
+            if p not in self.clients or not self._reservar_turno(p, errores_limite):
+                continue
+            
+            inicio = time.perf_counter()
+            parser = ParserIncremental()
+            try:
+                for fragmento in self._stream_proveedor(p, full_prompt, esquema):
+                    for elemento in parser.alimentar(fragmento):
+                        if parser.entregados == 1:
+                            self.tracer.registrar(f"llm_primer_elemento:{p}", (time.perf_counter() - inicio) * 1000)
+                        if al_elemento:
+                            al_elemento(elemento)
+            except Exception as e:
+                # Si ya se ejecutaron acciones no se repiten con otro proveedor
+                if parser.entregados:
+                    logging.error(f"Streaming JSON de {p} interrumpido tras {parser.entregados} elementos: {e}")
+                    return parser.resultado(), "ai"
+                self._registrar_error_ia(p, e, errores_limite)
+                continue
+            
+            self.tracer.registrar(f"llm:{p}", (time.perf_counter() - inicio) * 1000)
+            datos = parser.resultado()
+            if datos is None and not parser.entregados:
+                logging.warning(f"{p} no devolvió JSON válido: {parser.texto()[:120]}")
+                continue
+            if datos is not None and self.response_cache and sitio:
+                # Router: una respuesta con "chat" es conversación (política sin cache); solo se reproducen acciones
+                sitio_cache = "conversacion" if sitio == "router" and not solo_acciones(datos) else sitio
+                self.response_cache.guardar(sitio_cache, prompt, parser.texto(), self._contexto_cache_json(esquema))
+            return datos, "ai"
+        
+        return None, "error"
+
+    def _generar_mensaje_limite(self, provider, error_str=""):
         """Genera un mensaje amigable cuando se alcanza el límite de una API"""
+        limites = self.rate_limiter.descripcion_limites(provider)
+        espera = self.rate_limiter.segundos_para_reintento(provider)
+        if espera is None:
+            cuando = "Se agotó la cuota de hoy, vuelve mañana"
+        else:
+            cuando = f"Espera ~{max(1, round(espera))} s (límite por minuto)"
         
         mensajes = {
-            "Gemini": "⏰ Límite de uso de Gemini alcanzado.\n\n"
+            "Gemini": f"⏰ Límite de uso de Gemini alcanzado.\n\n"
                      "💡 Opciones:\n"
-                     "1. Espera unos minutos (límite por minuto)\n"
-                     "2. Usa otra API (Groq o OpenAI) desde Configuración\n"
-                     "3. Si es límite diario, vuelve mañana\n\n"
-                     "📊 Gemini Free: 15 requests/minuto, 1500/día",
+                     f"1. {cuando}\n"
+                     "2. Usa otra API (Groq o OpenAI) desde Configuración\n\n"
+                     f"📊 {limites}",
             
-            "Groq": "⏰ Límite de uso de Groq alcanzado.\n\n"
+            "Groq": f"⏰ Límite de uso de Groq alcanzado.\n\n"
                    "💡 Opciones:\n"
-                   "1. Espera 1 minuto (límite: 30 req/min)\n"
+                   f"1. {cuando}\n"
                    "2. Usa Gemini desde Configuración\n"
                    "3. Upgrade a Groq Pro para más requests\n\n"
-                   "📊 Groq Free: 30 requests/minuto, 14,400/día",
+                   f"📊 {limites}",
             
             "ChatGPT": "⏰ Límite de uso de OpenAI alcanzado.\n\n"
                       "💡 Opciones:\n"
                       "1. Revisa tu plan en platform.openai.com\n"
                       "2. Usa Gemini (gratis) desde Configuración\n"
                       "3. Recarga créditos si es necesario\n\n"
-                      "📊 OpenAI: Límites según tu plan de pago"
+                      f"📊 {limites}"
         }
         
         return mensajes.get(provider, f"⏰ Límite de uso alcanzado en {provider}.\n\nPrueba con otro proveedor desde Configuración.")
@@ -587,7 +1143,7 @@ class SaraBrain:
         # 4. Fallback IA
         if self.ia_online:
             p = f"El usuario quiere abrir '{objetivo}'. Si es una web, dame SOLO la URL. Si no, di 'NO'."
-            resp, _ = self.consultar_ia(p)
+            resp, _ = self.consultar_ia(p, sitio="abrir_web")
             if "http" in resp:
                 webbrowser.open(resp.strip())
                 return f"Abriendo recomendación IA: {objetivo}", "ai"
@@ -604,12 +1160,14 @@ class SaraBrain:
             
             # Usar Gemini
             if "Gemini" in self.clients:
+                if not self.rate_limiter.reservar("Gemini"):
+                    return self._generar_mensaje_limite("Gemini"), "error"
                 model = self.clients["Gemini"]
                 
                 # Prompt mejorado
                 prompt_base = f"El usuario dice: '{prompt_usuario}'. Analiza la captura de pantalla y responde concisamente."
                 
-                response = model.generate_content([prompt_base, screenshot])
+                response = self.llm_io.bloqueante(model.generate_content, [prompt_base, screenshot]).result()
                 return response.text, "ai"
             else:
                  return "❌ Solo Gemini soporta visión por ahora. Cambia el proveedor en Configuración.", "error"
@@ -634,7 +1192,7 @@ Analiza la intención. Responde SOLO JSON válido:
   "quiere_subir": true/false,
   "mensaje_commit": "mensaje si menciona, sino 'Update automático SARA'"
 }}"""
-                respuesta_ia = self.consultar_ia(prompt_ia, "")[0]
+                respuesta_ia = self.consultar_ia(prompt_ia, "", sitio="router")[0]
                 import json as json_lib
                 try:
                     respuesta_limpia = respuesta_ia.strip()
@@ -681,8 +1239,8 @@ Analiza la intención. Responde SOLO JSON válido:
                     reminder = self.health.check_reminders()
                     if reminder:
                         emoji, title, message = reminder
-                        # Notificar por voz
-                        self.voz.hablar(message)
+                        # Notificar por voz (espera a que SARA termine lo que esté diciendo)
+                        self.voz.hablar(message, prioridad=PRIORIDAD_INFO)
                         logging.info(f"🏥 Recordatorio de salud: {title}")
                 
                 time.sleep(30)  # Verificar cada 30 segundos
@@ -693,14 +1251,24 @@ Analiza la intención. Responde SOLO JSON válido:
 
     def _es_similar(self, texto, keywords, umbral=0.8):
         """Devuelve True si alguna palabra del texto se parece a las keywords"""
-        words = texto.split()
-        for w in words:
-            # Cotejar contra cada keyword
-            matches = difflib.get_close_matches(w, keywords, n=1, cutoff=umbral)
-            if matches:
-                logging.debug(f"Fuzzy match: '{w}' -> '{matches[0]}'")
-                return True
-        return False
+        # Índice difuso con poda por longitud (ver keyword_router.FuzzyIndex)
+        return self.router.es_similar(texto, keywords, umbral)
+    
+    def _reporte_latencia(self, cmd):
+        """Reporte p50/p95/p99 por etapa; con 'exporta' también lo vuelca a JSON."""
+        reporte = self.tracer.reporte_texto()
+        vuelos = self.vuelos_ia.estadisticas()
+        if vuelos["duplicados"]:
+            reporte += (f"\n\n🛬 Peticiones IA coalescidas: {vuelos['duplicados']} duplicados "
+                        f"de {vuelos['ejecuciones'] + vuelos['duplicados']}")
+        if "exporta" in cmd or "json" in cmd:
+            try:
+                ruta = self.tracer.exportar_json()
+                reporte += f"\n\n💾 Guardado en {ruta.name}"
+            except Exception as e:
+                logging.error(f"Error exportando latencias: {e}")
+                reporte += "\n\n⚠️ No pude guardar el JSON de latencias."
+        return reporte
     
     def _procesar_con_nlu(self, comando):
         """
@@ -711,9 +1279,15 @@ Analiza la intención. Responde SOLO JSON válido:
             return None
         
         # Clasificar intención
-        intent, params, source = self.intent_classifier.clasificar(comando)
+        with self.tracer.etapa("clasificar"):
+            intent, params, source = self.intent_classifier.clasificar(comando)
+        self.tracer.marcar_intent(intent)
         logging.info(f"🎯 Intent: {intent} | Source: {source} | Params: {params}")
         
+        # Modelo aún cargando y sin patrón: usar la cadena clásica de keywords
+        if intent is None:
+            return None
+        
         # Etiqueta visual para depuración
         tag = ""
         if source == "ml": tag = "[ML] "
@@ -752,7 +1326,7 @@ Analiza la intención. Responde SOLO JSON válido:
                 query = params.get("query", "")
                 res = self.web_agent.buscar_google(query)
                 if self.ia_online:
-                    resumen_ia, _ = self.consultar_ia(f"Resume esta investigación web:\\n{res}")
+                    resumen_ia, _ = self.consultar_ia(f"Resume esta investigación web:\\n{res}", sitio="resumen")
                     return resumen_ia, "sara"
                 return f"🔎 Resultados:\\n{res}", "sara"
         
@@ -762,7 +1336,8 @@ Analiza la intención. Responde SOLO JSON válido:
                 if "http" in url:
                     contenido = self.web_agent.leer_pagina(url)
                     if self.ia_online:
-                        resumen_ia, _ = self.consultar_ia(f"Resume este contenido:\\n{contenido}")
+                        contenido_ia = self.context_budget.recortar_documento(contenido)
+                        resumen_ia, _ = self.consultar_ia(f"Resume este contenido:\\n{contenido_ia}", sitio="resumen")
                         return resumen_ia, "sara"
                     return f"📄 Contenido:\\n{contenido[:500]}...", "sara"
                 else:
@@ -795,7 +1370,7 @@ Analiza la intención. Responde SOLO JSON válido:
             target_lang = params.get("target_lang", "en")
             if self.ia_online:
                 prompt = f"Traduce al {'inglés' if target_lang == 'en' else 'español'}: {text}"
-                return self.consultar_ia(prompt)
+                return self.consultar_ia(prompt, sitio="traduccion")
         
         elif intent == "CALCULAR":
             expr = params.get("expression", "")
@@ -814,9 +1389,9 @@ Analiza la intención. Responde SOLO JSON válido:
                 return "🧘‍♂️ Modo Zen activado.", "sara"
         
         elif intent == "CONVERSACION":
-            # Delegar a IA
+            # Delegar a IA (respuesta hablada en streaming, frase a frase)
             if self.ia_online:
-                return self.consultar_ia(params.get("text", comando))
+                return self.consultar_ia_stream(params.get("text", comando))
         
         return None
 
@@ -825,11 +1400,16 @@ Analiza la intención. Responde SOLO JSON válido:
     def procesar(self, comando):
         cmd = comando.lower()
         
+        # === REPORTE DE LATENCIA (antes del NLU para no clasificarlo) ===
+        if "latencia" in cmd and any(x in cmd for x in ["reporte", "informe", "estadisticas", "estadísticas", "exporta"]):
+            return self._reporte_latencia(cmd), "sara"
+        
         # === PRIORIDAD 1: INTENTAR NLU HÍBRIDO ===
         # === PRIORIDAD 1: INTENTAR NLU HÍBRIDO ===
         if self.intent_classifier:
             print(f"DEBUG BRAIN: Calling NLU with '{comando}'")
-            resultado_nlu = self._procesar_con_nlu(comando)
+            with self.tracer.etapa("nlu"):
+                resultado_nlu = self._procesar_con_nlu(comando)
             print(f"DEBUG BRAIN: NLU Result: {resultado_nlu}")
             if resultado_nlu:
                 # Guardar en memoria conversacional
@@ -841,10 +1421,12 @@ Analiza la intención. Responde SOLO JSON válido:
             logging.warning("⚠️ NLU Classifier is NONE. Falling back to legacy logic.")
         
         # === PRIORIDAD 2: COMANDOS ESPECIALIZADOS (que no están en NLU) ===
+        # Una sola pasada Aho-Corasick: todos los grupos de keywords que coinciden
+        rutas = self.router.analizar(cmd)
         
         # --- COMMANDOS DE MEMORIA (SECOND BRAIN) - Lectura de documentos ---
         if self.second_brain:
-            if "lee este documento" in cmd or "lee este archivo" in cmd:
+            if "leer_documento" in rutas:
                 ruta = pyperclip.paste().replace('"', '')
                 if os.path.exists(ruta):
                     res = self.second_brain.ingestar_archivo(ruta)
@@ -854,7 +1436,7 @@ Analiza la intención. Responde SOLO JSON válido:
 
             
             # 2. Lectura de documentos (Arrastrar y soltar mental o ruta)
-            if "lee este documento" in cmd or "lee este archivo" in cmd:
+            if "leer_documento" in rutas:
                 # Intentar leer desde el portapapeles si es una ruta
                 ruta = pyperclip.paste().replace('"', '')
                 if os.path.exists(ruta):
@@ -866,25 +1448,26 @@ Analiza la intención. Responde SOLO JSON válido:
         # --- AGENTE WEB (PLAYWRIGHT) ---
         if self.web_agent:
             # 1. Investigación Web
-            if "investiga sobre" in cmd or "investiga" in cmd:
+            if "investigar" in rutas:
                 tema = cmd.replace("investiga sobre", "").replace("investiga", "").replace("sara", "").strip()
                 res = self.web_agent.buscar_google(tema)
                 
                 # Resumir con IA
                 if self.ia_online:
-                    resumen_ia, _ = self.consultar_ia(f"Resume esta investigación web para el usuario:\n{res}")
+                    resumen_ia, _ = self.consultar_ia(f"Resume esta investigación web para el usuario:\n{res}", sitio="resumen")
                     return resumen_ia, "sara"
                 return f"🔎 Resultados:\n{res}", "sara"
             
             # 2. Leer Página
-            if "lee esta página" in cmd or "qué dice esta página" in cmd or "que dice esta pagina" in cmd:
+            if "leer_pagina" in rutas:
                  # Intentar leer URL del portapapeles
                 url = pyperclip.paste().strip()
                 if "http" in url:
                     contenido = self.web_agent.leer_pagina(url)
                     # Resumir con IA
                     if self.ia_online:
-                        resumen_ia, _ = self.consultar_ia(f"Resume este contenido web en 3 puntos clave:\n{contenido}")
+                        contenido_ia = self.context_budget.recortar_documento(contenido)
+                        resumen_ia, _ = self.consultar_ia(f"Resume este contenido web en 3 puntos clave:\n{contenido_ia}", sitio="resumen")
                         return resumen_ia, "sara"
                     return f"📄 Contenido:\n{contenido[:500]}...", "sara"
                 else:
@@ -892,27 +1475,23 @@ Analiza la intención. Responde SOLO JSON válido:
 
         # === MEMORIA CONTEXTUAL (NUEVO) ===
         # Detectar si es pregunta de seguimiento
-        contexto_adicional = ""
+        historial = None
         if self.memory and self.memory.is_follow_up_question(comando):
-            contexto_adicional = self.memory.get_context_prompt(include_last_n=2)
+            # Turnos recientes; el presupuesto de contexto decide cuáles entran por relevancia
+            historial = self.memory.get_recent_turns(4)
             logging.debug(f"Pregunta de seguimiento detectada. Tema: {self.memory.get_last_topic()}")
 
         # --- CONTROL DE VOLUMEN DIRECTO (SIN IA) ---
         if self.sys_control:
-            if any(x in cmd for x in ["sube el volumen", "subele volumen", "sube volumen", "súbele volumen"]):
+            if "volumen_subir" in rutas:
                 return self.sys_control.adjust_volume(10), "sys"
-            elif any(x in cmd for x in ["baja el volumen", "bájale volumen", "baja volumen"]):
+            elif "volumen_bajar" in rutas:
                 return self.sys_control.adjust_volume(-10), "sys"
-            elif "silencio" in cmd or "mute" in cmd:
+            elif "silencio" in rutas:
                 return self.sys_control.mute_volume(), "sys"
 
         # --- NETWORKGUARDIAN (ANTES DE TODO) ---
-        if self.guardian and any(x in cmd for x in [
-            "vigilancia", "dispositivos", "red", "fortaleza", "wifi", "panel",
-            "alertas", "tráfico", "consumidores", "conexiones",
-            "confía", "confiar", "sospechoso", "renombrar dispositivo",
-            "dashboard", "escanear"
-        ]):
+        if self.guardian and "guardian" in rutas:
             resultado = procesar_comando_guardian(cmd, self.guardian)
             if resultado:
                 # Guardar en memoria
@@ -921,8 +1500,8 @@ Analiza la intención. Responde SOLO JSON válido:
                 return resultado
 
         # --- RUTINAS (NUEVO) ---
-        es_rutina = self._es_similar(cmd, ["rutina", "modo", "escena"], 0.8)
-        if self.routines and (es_rutina or "rutina" in cmd or "modo" in cmd):
+        # "rutina"/"modo" literal o parecido a "rutina", "modo", "escena" (umbral 0.8)
+        if self.routines and "rutina" in rutas:
             # Ej: "ejecuta rutina buenos días" o "activa modo trabajo"
             if "rutina" in cmd:
                 nombre_rutina = cmd.split("rutina")[-1].strip()
@@ -941,8 +1520,8 @@ Analiza la intención. Responde SOLO JSON válido:
                 return self.routines.get_available_routines(), "sara"
 
         # --- CALENDARIO / AGENDA (NUEVO) ---
-        keywords_agenda = ["agenda", "eventos", "calendario", "que tengo", "qué tengo", "reunión", "cita", "compromiso"]
-        if self._es_similar(cmd, keywords_agenda, 0.8) or "agenda" in cmd or "calendario" in cmd:
+        # "agenda"/"calendario" literal o parecido a sus keywords (umbral 0.8)
+        if "agenda" in rutas:
             # CONSULTA
             if any(x in cmd for x in ["que tengo", "qué tengo", "ver", "lee", "dime", "hoy", "mañana", "próximos"]):
                 if self.calendar:
@@ -955,10 +1534,8 @@ Analiza la intención. Responde SOLO JSON válido:
             # Para esta iteración, solo consulta. La creación por voz natural es compleja sin un parser de fechas robusto.
         
         # --- CLIMA / TIEMPO (NUEVO) ---
-        keywords_clima = ["clima", "tiempo", "temperatura", "pronóstico", "llover", "lluvia", 
-                         "calor", "frío", "frio", "va a estar", "van a estar"]
-                         
-        if self.weather and (self._es_similar(cmd, keywords_clima, 0.75) or 
+        # Parecido a las keywords de clima (umbral 0.75) o seguimiento del tema
+        if self.weather and ("clima" in rutas or 
                             (self.memory and self.memory.get_last_topic() == "clima" and self.memory.is_follow_up_question(comando))):
             
             ciudad = None
@@ -1015,102 +1592,59 @@ Analiza la intención. Responde SOLO JSON válido:
         if self.ia_online:
             # Detectar comandos locales rápidos para no gastar IA innecesariamente
             # Quitamos "play" para que el Router decida si es spotify o youtube
-            es_comando_rapido = any(x in cmd for x in ["hora", "fecha", "sistema", "monitor", "mute", "silencio", "volumen", "sube", "baja", "súbele", "bájale", "zen", "sen", "sem", "cen"])
+            es_comando_rapido = "comando_rapido" in rutas
             
             if not es_comando_rapido:
                 try:
-                    # Prompt del Router
-
+                    # Prompt del Router (el esquema va en modo JSON nativo del proveedor)
                     prompt_router = f"""Analiza el comando: "{cmd}"
-                    Responde SOLO un objeto JSON con las acciones.
+                    Responde SOLO JSON con la lista de acciones en "actions", en el orden en que se deben ejecutar.
                     Acciones posibles:
-                    - "search_web": {{ "query": "lo que busca", "site": "youtube/google" }}
-                    - "open_app": {{ "app_name": "nombre app" }}
-                    - "volume": {{ "level": 0-100 (int) }} o {{ "change": +/- int }}
-                    - "brightness": {{ "level": 0-100 (int) }}
-                    - "media": "play_pause" / "next" / "prev" / "mute"
-                    - "timer": {{ "minutes": int, "message": "msg" }}
-                    - "zen_mode": {{ "enable": true/false }}
-                    - "chat": "respuesta conversacional si no es acción"
+{describir_acciones()}
+                    Usa "chat" con "response" si no es una acción.
                     
                     Ejemplo: "Sube volumen al 50 y pon rock"
-                    [
+                    {{"actions": [
                       {{ "action": "volume", "level": 50 }},
                       {{ "action": "search_web", "query": "rock music", "site": "youtube" }}
-                    ]
+                    ]}}
                     """
                     
-                    resp_json, _ = self.consultar_ia(prompt_router)
+                    resultados = []
+                    respuesta_chat = []
+                    recibidos = []
                     
-                    # Intentar parsear JSON
-                    import json
-                    # Limpiar markdown si existe
-                    if "```" in resp_json:
-                        resp_json = resp_json.split("```")[1].replace("json", "").strip()
+                    def ejecutar(elemento):
+                        # Cada acción se ejecuta en cuanto su objeto JSON se cierra en el stream
+                        recibidos.append(elemento)
+                        accion = validar_accion(elemento)
+                        if accion is None:
+                            return
+                        if accion["action"] == "chat":
+                            respuesta_chat.append(accion["response"])
+                            return
+                        try:
+                            resultado = self._ejecutar_accion_router(accion, cmd)
+                            if resultado:
+                                resultados.append(resultado)
+                        except Exception as e:
+                            logging.error(f"Acción {accion} falló: {e}")
                     
-                    acciones = json.loads(resp_json)
+                    datos, _ = self.consultar_ia_estructurada(
+                        prompt_router, esquema_acciones(), sitio="router", al_elemento=ejecutar
+                    )
                     
-                    # Si la IA responde un chat normal (str) o lista vacía
-                    if isinstance(acciones, str):
-                        return acciones, "ai"
-                        
-                    resultados = []
-                    es_accion_valida = False
+                    # Respuesta de un solo objeto (sin array): no pasó por el parser incremental
+                    if not recibidos:
+                        if isinstance(datos, str):
+                            return datos, "ai"
+                        for elemento in acciones_de(datos):
+                            ejecutar(elemento)
                     
-                    if isinstance(acciones, list):
-                        for accion in acciones:
-                            tipo = accion.get("action")
-                            es_accion_valida = True
-                            
-                            if tipo == "volume":
-                                if "level" in accion:
-                                    resultados.append(self.sys_control.set_volume(int(accion["level"])))
-                                elif "change" in accion:
-                                    resultados.append(self.sys_control.adjust_volume(int(accion["change"])))
-                                    
-                            elif tipo == "brightness":
-                                resultados.append(self.sys_control.set_brightness(int(accion["level"])))
-                                
-                            elif tipo == "media":
-                                op = accion.get("value") or accion.get("operation") or "play_pause" # Robustez
-                                if op == "play_pause": resultados.append(self.sys_control.media_play_pause())
-                                elif op == "next": resultados.append(self.sys_control.media_next())
-                                elif op == "prev": resultados.append(self.sys_control.media_prev())
-                                elif op == "mute": resultados.append(self.sys_control.mute_volume())
-
-                            elif tipo == "open_app":
-                                resultados.append(self.abrir_inteligente(accion["app_name"], cmd)[0])
-
-                            elif tipo == "search_web":
-                                q = accion["query"]
-                                site = accion.get("site", "google")
-                                if site == "youtube":
-                                    webbrowser.open(f"https://www.youtube.com/results?search_query={q}")
-                                else:
-                                    webbrowser.open(f"https://www.google.com/search?q={q}")
-                                resultados.append(f"Buscando {q} en {site}")
-
-                            elif tipo == "timer":
-                                resultados.append(self.cronos.programar_alarma(accion["minutes"], accion.get("message", "Alarma")))
-                            
-                            elif tipo == "zen_mode":
-                                enable = accion.get("enable", True)
-                                self.sys_control.minimize_all_windows()
-                                if enable:
-                                    time.sleep(0.5)
-                                    webbrowser.open("https://www.youtube.com/watch?v=jfKfPfyJRdk")
-                                    resultados.append("🧘‍♂️ Modo Zen activado por IA.")
-                                else:
-                                    # Intentar cerrar musica
-                                    self.sys_control.close_window_by_title("lofi")
-                                    self.sys_control.close_window_by_title("youtube")
-                                    resultados.append("🧘‍♂️ Modo Zen desactivado.")
-
-                            elif tipo == "chat":
-                                return accion.get("response", "Entendido."), "ai"
-
-                    if es_accion_valida and resultados:
+                    if resultados:
                         return " | ".join(resultados), "sys"
+                    if respuesta_chat:
+                        return respuesta_chat[0], "ai"
                         
                 except Exception as e:
                     logging.error(f"Fallo Smart Router: {e}")
@@ -1118,7 +1652,7 @@ Analiza la intención. Responde SOLO JSON válido:
                     pass
 
         # --- GESTIÓN DE DIRECTORIO ---
-        if any(x in cmd for x in ["trabajar en", "cambiar directorio", "cambiar carpeta"]):
+        if "directorio" in rutas:
             ruta = cmd.replace("trabajar en", "").replace("cambiar directorio", "").replace("cambiar carpeta", "").strip()
             # Limpiar comillas
             ruta = ruta.replace('"', '').replace("'", "")
@@ -1146,35 +1680,35 @@ Analiza la intención. Responde SOLO JSON válido:
 
         # --- DETECCIÓN DE COMANDOS COMPLEJOS ---
         acciones_git = sum([
-            "git" in cmd or "repo" in cmd,
-            any(x in cmd for x in ["inicializar", "init", "crear"]),
-            any(x in cmd for x in ["subir", "push", "upload"]),
-            any(x in cmd for x in ["commit", "guardar"])
+            "git_repo" in rutas,
+            "git_accion_crear" in rutas,
+            "git_accion_subir" in rutas,
+            "git_accion_commit" in rutas
         ])
         
         if acciones_git >= 2:
             return self.procesar_comando_git_completo(comando), "dev"
 
         # --- SECCIÓN DEVOPS AVANZADA (NUEVO) ---
-        if "puertos abiertos" in cmd or "quien usa" in cmd:
+        if "puertos" in rutas:
             # Extraer puerto
             puerto = "".join([c for c in cmd if c.isdigit()])
             if not puerto: return "❌ Dime qué puerto (ej: 'quien usa el 8080').", "error"
             return SystemOps.quien_usa_puerto(puerto), "sys"
 
-        elif "libera el puerto" in cmd or "matar puerto" in cmd:
+        elif "liberar_puerto" in rutas:
             puerto = "".join([c for c in cmd if c.isdigit()])
             if not puerto: return "❌ Dime qué puerto liberar.", "error"
             return SystemOps.liberar_puerto(puerto), "sys"
 
-        elif "mi ip" in cmd:
+        elif "mi_ip" in rutas:
             return f"{SystemOps.obtener_ip_local()}\n{SystemOps.obtener_ip_publica()}", "sys"
 
-        elif "instalar dependencias" in cmd or "instalar paquetes" in cmd:
+        elif "instalar_dependencias" in rutas:
             code, out, err = BuildManager.instalar_dependencias()
             return f"📦 Resultado Instalación:\n{out}\n{err}", "dev"
 
-        elif "construir proyecto" in cmd or "build" in cmd:
+        elif "build" in rutas:
             code, out, err = BuildManager.construir_proyecto()
             return f"🔨 Build Terminado:\n{out}", "dev"
 
@@ -1197,32 +1731,32 @@ Analiza la intención. Responde SOLO JSON válido:
             return f"🏗️ Resultado Build:\n{out}\n{err}", "dev"
 
         # --- SECCIÓN GIT CLÁSICA ---
-        if "git push" in cmd or "subir cambios" in cmd:
+        if "git_push" in rutas:
             mensaje = cmd.replace("git push", "").replace("subir cambios", "").strip()
             if not mensaje: mensaje = "Update automático SARA"
             return self.devops.git_smart_push(mensaje), "dev"
         
-        elif "git status" in cmd:
+        elif "git_status" in rutas:
             return self.devops.git_status(), "dev"
         
-        elif "inicializar git" in cmd or "git init" in cmd:
+        elif "git_init" in rutas:
             return self.devops.git_init(), "dev"
         
-        elif "git ramas" in cmd or "listar ramas" in cmd:
+        elif "git_ramas" in rutas:
             return self.devops.git_listar_ramas(), "dev"
         
-        elif "cambiar rama" in cmd or "git checkout" in cmd:
+        elif "git_cambiar_rama" in rutas:
             nombre = cmd.replace("cambiar rama", "").replace("git checkout", "").strip()
             return self.devops.git_cambiar_rama(nombre), "dev"
         
-        elif "crear rama" in cmd or "git branch" in cmd and "nueva" in cmd:
+        elif "git_crear_rama" in rutas or "git_branch_nueva" in rutas:
             nombre = cmd.replace("crear rama", "").replace("git branch", "").replace("nueva", "").strip()
             return self.devops.git_crear_rama(nombre), "dev"
         
-        elif "git pull" in cmd or "traer cambios" in cmd:
+        elif "git_pull" in rutas:
             return self.devops.git_pull(), "dev"
         
-        elif "git ayuda" in cmd:
+        elif "git_ayuda" in rutas:
             ayuda = "📚 COMANDOS GIT:\n" + "="*30 + "\n"
             ayuda += "• 'trabajar en [ruta]' (Cambia carpeta)\n"
             ayuda += "• 'git status', 'git init'\n"
@@ -1231,7 +1765,7 @@ Analiza la intención. Responde SOLO JSON válido:
             return ayuda, "dev"
             
         # --- AYUDA GENERAL (NUEVO) ---
-        elif "ayuda" in cmd or "comandos" in cmd or "que puedes hacer" in cmd:
+        elif "ayuda_dev" in rutas:
             ayuda = "🤖 COMANDOS DISPONIBLES:\n" + "="*25 + "\n"
             
             ayuda += "⚡ RÁPIDOS (Local):\n"
@@ -1252,31 +1786,31 @@ Analiza la intención. Responde SOLO JSON válido:
             return ayuda, "sara"
 		
         # --- COMANDOS DE SISTEMA AVANZADOS ---
-        elif any(x in cmd for x in ["limpieza profunda", "limpia sistema", "limpia todo", "limpia temporales y papelera"]):
+        elif "limpieza_profunda" in rutas:
             return self.sys_control.deep_clean_system(), "sys"
         
-        elif "captura pantalla" in cmd or "screenshot" in cmd:
+        elif "screenshot" in rutas:
             return self.devops.iniciar_tunel_serveo(), "dev"
 
-        elif "compartir proyecto" in cmd or "serveo" in cmd:
+        elif "compartir_proyecto" in rutas:
             return self.devops.iniciar_tunel_serveo(), "dev"
 
         # --- SECCIÓN SISTEMA ---
         # --- SECCIÓN SISTEMA ---
-        elif "sistema" in cmd or "estado" in cmd or "monitor" in cmd:
+        elif "estado_sistema" in rutas:
             return self.monitor.obtener_reporte_completo(), "sistema"
         
         # --- ABRIR CONFIGURACIÓN ---
-        elif any(x in cmd for x in ["abre configuración", "abre configuracion", "abrir configuración", "abrir configuracion", "abre ajustes", "abrir ajustes", "abre settings", "configuración", "ajustes", "settings"]):
+        elif "abrir_configuracion" in rutas:
             # Este comando necesita ser manejado por la GUI
             return "OPEN_SETTINGS_TAB", "ui_command"
         
         # --- ABRIR CONFIGURACIÓN DE PERFIL ---
-        elif any(x in cmd for x in ["abre mi perfil", "mi perfil", "configurar perfil", "editar perfil", "perfil de usuario", "ver mi perfil", "ver perfil", "mostrar perfil"]):
+        elif "abrir_perfil" in rutas:
             return "OPEN_PROFILE_SETTINGS", "ui_command"
         
         # --- MODO SALUD (HEALTH MONITOR) ---
-        elif any(x in cmd for x in ["voy a trabajar", "empezar trabajo", "iniciar trabajo", "trabajar en casa", "trabajar en oficina"]):
+        elif "trabajo_iniciar" in rutas:
             if not self.health:
                 return "❌ Monitor de salud no disponible", "error"
             
@@ -1292,32 +1826,32 @@ Analiza la intención. Responde SOLO JSON válido:
             
             return self.health.start_session(profile), "health"
         
-        elif any(x in cmd for x in ["pausa trabajo", "pausar trabajo", "descanso"]):
+        elif "trabajo_pausar" in rutas:
             if not self.health:
                 return "❌ Monitor de salud no disponible", "error"
             return self.health.pause_session(), "health"
         
-        elif any(x in cmd for x in ["reanudar trabajo", "continuar trabajo", "volver al trabajo"]):
+        elif "trabajo_reanudar" in rutas:
             if not self.health:
                 return "❌ Monitor de salud no disponible", "error"
             return self.health.resume_session(), "health"
         
-        elif any(x in cmd for x in ["terminar trabajo", "fin de jornada", "acabar trabajo"]):
+        elif "trabajo_terminar" in rutas:
             if not self.health:
                 return "❌ Monitor de salud no disponible", "error"
             return self.health.stop_session(), "health"
         
-        elif any(x in cmd for x in ["cuánto tiempo llevo", "cuanto tiempo llevo", "tiempo trabajado"]):
+        elif "trabajo_tiempo" in rutas:
             if not self.health:
                 return "❌ Monitor de salud no disponible", "error"
             return self.health.get_elapsed_time(), "health"
         
-        elif any(x in cmd for x in ["próximo descanso", "proximo descanso", "siguiente descanso"]):
+        elif "trabajo_proximo_descanso" in rutas:
             if not self.health:
                 return "❌ Monitor de salud no disponible", "error"
             return self.health.get_next_reminder(), "health"
         
-        elif any(x in cmd for x in ["cambiar a modo", "cambiar modo"]):
+        elif "trabajo_cambiar_modo" in rutas:
             if not self.health:
                 return "❌ Monitor de salud no disponible", "error"
             
@@ -1334,7 +1868,7 @@ Analiza la intención. Responde SOLO JSON válido:
             return self.health.change_profile(new_profile), "health"
         
         # --- ASISTENTE DE ESTUDIO ---
-        elif any(x in cmd for x in ["resume pdf", "resumir pdf", "resumen de pdf"]):
+        elif "resumir_pdf" in rutas:
             if not self.study:
                 return "❌ Asistente de estudio no disponible", "error"
             
@@ -1347,7 +1881,7 @@ Analiza la intención. Responde SOLO JSON válido:
             else:
                 return "❌ Especifica la ruta del PDF. Ejemplo: 'resume pdf C:\\Documents\\archivo.pdf'", "error"
         
-        elif any(x in cmd for x in ["crea flashcards", "genera flashcards", "flashcards de"]):
+        elif "flashcards" in rutas:
             if not self.study:
                 return "❌ Asistente de estudio no disponible", "error"
             
@@ -1360,17 +1894,17 @@ Analiza la intención. Responde SOLO JSON válido:
             return self.study.generate_flashcards(topic, count=5), "study"
         
         # --- CONTROL DE VIDEOJUEGOS ---
-        elif any(x in cmd for x in ["que juegos tengo", "lista juegos", "mis juegos"]):
+        elif "juegos_listar" in rutas:
             if not self.games:
                 return "❌ Controlador de juegos no disponible", "error"
             return self.games.list_games(), "games"
         
-        elif any(x in cmd for x in ["escanear juegos", "buscar juegos", "detectar juegos"]):
+        elif "juegos_escanear" in rutas:
             if not self.games:
                 return "❌ Controlador de juegos no disponible", "error"
             return self.games.scan_games(), "games"
         
-        elif any(x in cmd for x in ["abre", "juega", "lanza"]) and any(y in cmd for y in ["juego", "valorant", "league", "minecraft", "fortnite", "apex"]):
+        elif "juego_abrir" in rutas:
             if not self.games:
                 return "❌ Controlador de juegos no disponible", "error"
             
@@ -1378,12 +1912,12 @@ Analiza la intención. Responde SOLO JSON válido:
             game_name = cmd.replace("abre", "").replace("juega", "").replace("lanza", "").replace("juego", "").strip()
             return self.games.launch_game(game_name), "games"
         
-        elif any(x in cmd for x in ["optimiza para jugar", "modo gaming", "modo competitivo", "optimizar juegos"]):
+        elif "juegos_optimizar" in rutas:
             if not self.games:
                 return "❌ Controlador de juegos no disponible", "error"
             return self.games.optimize_for_gaming(), "games"
         
-        elif any(x in cmd for x in ["cierra juego", "cerrar juego"]):
+        elif "juego_cerrar" in rutas:
             if not self.games:
                 return "❌ Controlador de juegos no disponible", "error"
             
@@ -1393,12 +1927,12 @@ Analiza la intención. Responde SOLO JSON válido:
             return self.games.close_game(game_name), "games"
         
         # --- GESTIÓN DE PERFIL DE USUARIO ---
-        elif any(x in cmd for x in ["mi perfil", "ver perfil", "mostrar perfil", "configuracion personal"]):
+        elif "perfil_ver" in rutas:
             if not self.perfil:
                 return "❌ Perfil no disponible", "error"
             return self.perfil.get_config_summary(), "perfil"
         
-        elif any(x in cmd for x in ["llamame", "llámame", "mi nombre es"]):
+        elif "perfil_nombre" in rutas:
             if not self.perfil:
                 return "❌ Perfil no disponible", "error"
             
@@ -1410,21 +1944,23 @@ Analiza la intención. Responde SOLO JSON válido:
             self.perfil.update_user_info(preferred_name=nombre)
             return f"✅ Perfecto, te llamaré {nombre}", "perfil"
         
-        elif any(x in cmd for x in ["cambiar idioma", "idioma", "cambiar voz"]):
+        elif "idioma" in rutas:
             if not self.perfil:
                 return "❌ Perfil no disponible", "error"
             
             # Detectar idioma
             if "ingles" in cmd or "english" in cmd:
                 self.perfil.update_voice_preferences(language="en-US")
+                self.aplicar_preferencias_voz()
                 return "✅ Voice language changed to English", "perfil"
             elif "español" in cmd or "espanol" in cmd:
                 self.perfil.update_voice_preferences(language="es-ES")
+                self.aplicar_preferencias_voz()
                 return "✅ Idioma cambiado a Español", "perfil"
             else:
                 return "❌ Idiomas disponibles: Español, Inglés", "error"
         
-        elif any(x in cmd for x in ["abre configuracion", "abrir configuracion", "configuracion", "ajustes", "settings"]):
+        elif "configuracion" in rutas:
             # Abrir ventana de configuración
             try:
                 from config_perfil_ui import abrir_configuracion
@@ -1439,8 +1975,7 @@ Analiza la intención. Responde SOLO JSON válido:
         # --- MODO ZEN ---
         # Primero verificar SI QUIERE SALIR, porque "salir de modo zen" contiene "modo zen"
         # Ahora acepta también "desactivar modo" o "salir del modo" genérico
-        elif (any(x in cmd for x in ["salir", "desactivar", "fin", "quita", "normalidad"]) and any(y in cmd for y in ["zen", "sen", "sem", "cen"])) or \
-             any(x in cmd for x in ["desactivar modo", "salir del modo", "quita el modo", "desactiva el modo"]):
+        elif "zen_salir" in rutas or "modo_salir" in rutas:
             
             # Intentar cerrar la música (busca 'lofi' o 'youtube')
             self.sys_control.close_window_by_title("lofi")
@@ -1449,21 +1984,21 @@ Analiza la intención. Responde SOLO JSON válido:
             self.sys_control.minimize_all_windows() # Toggle Win+D para restaurar
             return "Modo Zen desactivado. Bienvenid@ de vuelta.", "sistema"
 
-        elif any(x in cmd for x in ["modo zen", "modo sen", "modo sem", "modo cen", "activar zen", "modo relax"]):
+        elif "zen_activar" in rutas:
             self.sys_control.minimize_all_windows()
             time.sleep(0.5)
             webbrowser.open("https://www.youtube.com/watch?v=jfKfPfyJRdk")
             return "Modo Zen Activado. Silenciando notificaciones...", "sistema"
 
         # --- ORDENAR VENTANAS ---
-        elif any(x in cmd for x in ["minimiza el escritorio", "minimiza todo", "minimizar todo", "mostrar escritorio"]):
+        elif "minimizar_todo" in rutas:
             return self.sys_control.minimize_all_windows(), "sys"
         
-        elif any(x in cmd for x in ["maximiza", "maximizar"]):
+        elif "maximizar" in rutas:
             return self.sys_control.maximize_window(), "sys"
 
         # --- GESTIÓN DE PROCESOS ---
-        elif "matar" in cmd or "cerrar" in cmd:
+        elif "cerrar_app" in rutas:
             target = cmd.replace("matar", "").replace("cerrar", "").strip()
             if not target: return "❌ Especifica qué proceso cerrar.", "error"
             # Seguridad: Solo alfanuméricos
@@ -1472,7 +2007,7 @@ Analiza la intención. Responde SOLO JSON válido:
             return self.sys_control.kill_process(target), "sys"
         
         # --- APAGADO / REINICIO ---
-        elif any(x in cmd for x in ["apaga el sistema", "apagar pc", "apaga la computadora"]):
+        elif "apagar" in rutas:
             # Buscar tiempo: "en 10 minutos"
             minutos = 0
             match = re.search(r'en (\d+) minuto', cmd)
@@ -1480,38 +2015,38 @@ Analiza la intención. Responde SOLO JSON válido:
             
             return self.sys_control.shutdown_system(minutos), "sys"
 
-        elif any(x in cmd for x in ["reinicia", "reiniciar"]):
+        elif "reiniciar" in rutas:
             minutos = 0
             match = re.search(r'en (\d+) minuto', cmd)
             if match: minutos = int(match.group(1))
             return self.sys_control.restart_system(minutos), "sys"
 
-        elif any(x in cmd for x in ["cancela apagado", "cancelar apagado", "no apagues"]):
+        elif "cancelar_apagado" in rutas:
             return self.sys_control.cancel_shutdown(), "sys"
 
         # --- BLOQUEO Y UI ---
-        elif "bloquear" in cmd:
+        elif "bloquear" in rutas:
             # Usar método del control del sistema si existe, o el clásico
             if hasattr(self.sys_control, 'lock_screen'):
                 return self.sys_control.lock_screen(), "sys"
             os.system("rundll32.exe user32.dll,LockWorkStation") # Fallback
             return "PC Bloqueada.", "sistema"
             
-        elif any(x in cmd for x in ["vacía la papelera", "limpia la papelera", "vaciar papelera"]):
+        elif "papelera" in rutas:
             return self.sys_control.empty_recycle_bin(), "sys"
 
         # --- ESTEROIDES DE SISTEMA (NUEVO) ---
-        elif any(x in cmd for x in ["toma captura", "toma una captura", "pantallazo", "captura de pantalla"]):
+        elif "captura" in rutas:
             return self.sys_control.take_screenshot(), "sys"
 
-        elif any(x in cmd for x in ["limpia temporales", "limpieza profunda", "borra basura"]):
+        elif "limpiar_temporales" in rutas:
             return self.sys_control.clean_temp_files(), "sys"
 
-        elif any(x in cmd for x in ["procesos pesados", "consumo de ram", "qué proceso consume más", "estado de procesos"]):
+        elif "procesos" in rutas:
             return self.sys_control.get_heavy_processes(), "sys"
 
         # --- MODO OFICIO (Redacción Asistida - REPARADO) ---
-        elif any(x in cmd for x in ["redacta oficio", "redactar oficio", "ayuda con oficio", "modo oficio"]):
+        elif "oficio_modo" in rutas:
             # Abrir Word de forma segura
             try:
                 # Usar Popen es más seguro que os.system
@@ -1534,7 +2069,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
 """
             return instrucciones, "sys"
 
-        elif "genera el oficio" in cmd or "generar oficio" in cmd or "escribe el oficio" in cmd or "redacta el oficio" in cmd:
+        elif "oficio_generar" in rutas:
             # Verificar IA
             if not self.ia_online:
                 return "❌ Necesito conectarme a la IA para redactar. Verifica tu internet o API Key.", "error"
@@ -1566,7 +2101,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             return f"✅ Aquí tienes el borrador ({msg_extra}):\n\n{respuesta_ia}", "sys"
 
         # --- SECCIÓN UTILIDADES ---
-        elif "anota" in cmd:
+        elif "anota" in rutas:
             nota = cmd.replace("anota", "").strip()
             try:
                 with open("sara_notas.txt", "a", encoding="utf-8") as f:
@@ -1575,7 +2110,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             except: return "Error guardando nota.", "error"
 
         # Comando rápido "Pon música/algo" -> Asumir YouTube
-        elif "pon" in cmd or "reproduce" in cmd:
+        elif "reproducir" in rutas:
             # Limpieza mejorada de palabras basura
             objetivo = re.sub(r"(pon|reproduce|el|la|los|las|un|una|de|por favor|eh|ver|escuchar)", "", cmd).strip()
             
@@ -1593,12 +2128,12 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             except Exception as e:
                 return f"❌ Error al reproducir: {e}", "error"
 
-        elif any(x in cmd for x in ["abre", "abrir", "busca"]):
+        elif "abrir" in rutas:
             objetivo = re.sub(r"(abre|abrir|busca|buscar|el|la|por favor)", "", cmd).strip()
             return self.abrir_inteligente(objetivo, cmd)
 
         # --- CRONOS (ALARMAS INTELIGENTES) ---
-        elif any(x in cmd for x in ["recuérdame", "recuerdame", "despiértame", "despiertame", "alarma", "avísame"]):
+        elif "alarma" in rutas:
             # 1. Intento: Tiempo relativo ("en X minutos")
             match_tiempo = re.search(r'(en|dentro de)\s+(\d+)\s+(minuto|hora|segundo)', cmd)
             
@@ -1647,7 +2182,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
                 return "❌ Dime la hora. Ejemplo: 'En 5 minutos' o 'A las 7:00 am'.", "error"
 
         # --- POMODORO (PRODUCTIVIDAD) ---
-        elif self.pomodoro and any(x in cmd for x in ["pomodoro", "concentración", "concentracion", "enfoque"]):
+        elif self.pomodoro and "pomodoro" in rutas:
             # Iniciar Pomodoro
             if any(x in cmd for x in ["inicia", "iniciar", "empieza", "empezar", "comienza", "comenzar"]):
                 # Duración personalizada
@@ -1714,7 +2249,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
                 return ayuda_pomo, "sys"
 
         # --- ORGANIZADOR INTELIGENTE ---
-        elif any(x in cmd for x in ["ordena", "ordenar", "limpia", "limpiar", "organiza"]):
+        elif "organizar" in rutas:
             if "escritorio" in cmd: target = "escritorio"
             elif "descargas" in cmd: target = "descargas"
             elif "documentos" in cmd: target = "documentos"
@@ -1723,11 +2258,11 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             return SystemOps.organizar_archivos(target), "sys"
 
         # --- SARA VISION (OJOS) ---
-        elif any(x in cmd for x in ["mira mi pantalla", "mira la pantalla", "qué ves", "que ves", "analiza esto", "analiza la pantalla"]):
+        elif "vision" in rutas:
             return self.ver_pantalla(cmd), "ai"
 
         # --- CODE REVIEW CON IA ---
-        elif self.code_reviewer and any(x in cmd for x in ["revisa", "analiza código", "analiza codigo", "code review"]):
+        elif self.code_reviewer and "code_review" in rutas:
             # Extraer nombre de archivo
             archivo = None
             
@@ -1756,7 +2291,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             return self.code_reviewer.analizar_archivo(ruta, tipo)
         
         # Generar tests
-        elif self.code_reviewer and any(x in cmd for x in ["genera tests", "generar tests", "crear tests"]):
+        elif self.code_reviewer and "code_tests" in rutas:
             match_archivo = re.search(r'(para|de)\s+(\w+\.py)', cmd)
             if match_archivo:
                 archivo = match_archivo.group(2)
@@ -1766,7 +2301,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
                 return "❌ Especifica el archivo. Ejemplo: 'Genera tests para brain.py'", "error"
         
         # Generar documentación
-        elif self.code_reviewer and any(x in cmd for x in ["documenta", "documentar", "genera documentación", "genera documentacion"]):
+        elif self.code_reviewer and "code_docs" in rutas:
             match_archivo = re.search(r'(documenta|documentar)\s+(\w+\.py)', cmd)
             if not match_archivo:
                 match_archivo = re.search(r'(para|de)\s+(\w+\.py)', cmd)
@@ -1779,7 +2314,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
                 return "❌ Especifica el archivo. Ejemplo: 'Documenta brain.py'", "error"
         
         # Sugerir refactoring
-        elif self.code_reviewer and any(x in cmd for x in ["refactoriza", "refactorizar", "mejora código", "mejora codigo"]):
+        elif self.code_reviewer and "code_refactor" in rutas:
             match_archivo = re.search(r'(\w+\.py)', cmd)
             if match_archivo:
                 archivo = match_archivo.group(1)
@@ -1789,7 +2324,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
                 return "❌ Especifica el archivo. Ejemplo: 'Refactoriza brain.py'", "error"
         
         # Explicar código
-        elif self.code_reviewer and any(x in cmd for x in ["explica", "explicar código", "explicar codigo", "qué hace", "que hace"]):
+        elif self.code_reviewer and "code_explicar" in rutas:
             match_archivo = re.search(r'(\w+\.py)', cmd)
             if match_archivo:
                 archivo = match_archivo.group(1)
@@ -1799,7 +2334,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
                 return "❌ Especifica el archivo. Ejemplo: 'Explica brain.py'", "error"
 
         # --- MODO CENTINELA (SEGURIDAD) ---
-        elif "centinela" in cmd or "sistema de seguridad" in cmd:
+        elif "centinela" in rutas:
             # DESACTIVAR tiene prioridad (si dice desactiva/quita/apaga)
             if any(x in cmd for x in ["desactiva", "quita", "apaga", "salir", "detener"]):
                  return "🔓 Contraseña aceptada. Centinela desactivado.", "sentinel_off"
@@ -1807,7 +2342,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             else:
                  return "🛡️ CENTINELA ACTIVADO. Sistema bloqueado.", "sentinel_on"
                  
-        elif "codigo alfa" in cmd or "código alfa" in cmd:
+        elif "codigo_alfa" in rutas:
              return "🔓 Contraseña aceptada. Centinela desactivado.", "sentinel_off"
 
         # --- (SECCIÓN ELIMINADA: LEGACY FACIAL RECOGNITION) ---
@@ -1816,7 +2351,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
         # --- CONTROL DE VOLUMEN (FALLBACK LOCAL) ---
         # --- CONTROL DE VOLUMEN (FALLBACK LOCAL) ---
         # --- CONTROL DE VOLUMEN (FALLBACK LOCAL) ---
-        elif any(x in cmd for x in ["volumen", "sonido", "audio", "subele", "bajale", "súbele", "bájale"]):
+        elif "volumen" in rutas:
             try:
                 # 1. Prioridad: Definir Nivel Específico (ej: "a 20", "al 50", "baja a 10")
                 numeros = [int(s) for s in cmd.split() if s.isdigit()]
@@ -1840,7 +2375,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
                 return f"❌ Error volumen: {e}", "error"
 
         # --- AYUDA / COMANDOS ---
-        elif any(x in cmd for x in ["ayuda", "comandos", "qué puedes hacer", "que puedes hacer"]):
+        elif "ayuda" in rutas:
             ayuda = """📋 TODOS LOS COMANDOS DE SARA:
 
 🎵 MEDIA & ENTRETENIMIENTO:
@@ -1921,14 +2456,14 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
 
 
 
-        elif "traduce" in cmd:
+        elif "traducir" in rutas:
             try:
                 txt = pyperclip.paste()
                 if not txt: return "Portapapeles vacío.", "error"
-                return self.consultar_ia(f"Traduce al español:\n{txt[:MAX_CHARS_TRANSLATION]}"), "ai"
+                return self.consultar_ia(f"Traduce al español:\n{txt[:MAX_CHARS_TRANSLATION]}", sitio="traduccion"), "ai"
             except: return "Error en traducción.", "error"
 
-        elif "hora" in cmd: 
+        elif "hora" in rutas: 
             now = datetime.datetime.now()
             hora = now.hour
             minutos = now.minute
@@ -1947,12 +2482,12 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
                 tiempo_texto = f"Son las {hora} y {minutos} {periodo}"
                 
             return tiempo_texto, "sistema"
-        elif "fecha" in cmd: 
+        elif "fecha" in rutas: 
             return f"Hoy es {datetime.datetime.now().strftime('%A %d de %B')}", "sistema"
 
         
         # Escaneo de red WiFi
-        elif any(x in cmd for x in ["escanea red", "escanea wifi", "escanea mi red", "escanear red", "escanear wifi", "dispositivos conectados", "cuantos dispositivos", "ver dispositivos"]):
+        elif "red_escanear" in rutas:
             resultado = self.monitor.escanear_red()
             
             if 'error' in resultado:
@@ -1979,7 +2514,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             return respuesta, "sara"
         
         # Investigar dispositivo específico
-        elif any(x in cmd for x in ["investiga el dispositivo", "investiga dispositivo", "información del dispositivo", "info del dispositivo"]):
+        elif "dispositivo_investigar" in rutas:
             # Extraer IP del comando
             ip_match = re.search(r'\d+\.\d+\.\d+\.\d+', cmd)
             
@@ -2009,7 +2544,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             return respuesta, "sara"
         
         # Bloquear dispositivo
-        elif any(x in cmd for x in ["bloquea el dispositivo", "bloquea dispositivo", "bloquear dispositivo", "echa al dispositivo"]):
+        elif "dispositivo_bloquear" in rutas:
             # Extraer IP
             ip_match = re.search(r'\d+\.\d+\.\d+\.\d+', cmd)
             
@@ -2022,7 +2557,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             return resultado['mensaje'], "sara" if resultado['exito'] else "error"
         
         # Desbloquear dispositivo
-        elif any(x in cmd for x in ["desbloquea el dispositivo", "desbloquea dispositivo", "desbloquear dispositivo"]):
+        elif "dispositivo_desbloquear" in rutas:
             # Extraer IP
             ip_match = re.search(r'\d+\.\d+\.\d+\.\d+', cmd)
             
@@ -2034,32 +2569,32 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             
             return resultado['mensaje'], "sara" if resultado['exito'] else "error"
         
-        elif "configura" in cmd:
+        elif "configura" in rutas:
             return "📝 Ve a la pestaña 'Configuración' para agregar tus API Keys.", "sys"
 
         # --- ADVANCED PC CONTROL (IRON MAN MODE) ---
         
         # 1. Control de Dictado
-        if "modo dictado" in cmd or "toma dictado" in cmd:
+        if "dictado" in rutas:
             self.dictation_mode = True
             return "📝 Modo Dictado ACTIVADO. Di 'terminar dictado' para finalizar.", "sara"
         
         # 2. Control Multimedia
         # 2. Control Multimedia
-        elif "sube volumen" in cmd:
+        elif "sube_volumen" in rutas:
             return self.sys_control.adjust_volume(10), "sys"
-        elif "baja volumen" in cmd:
+        elif "baja_volumen" in rutas:
             return self.sys_control.adjust_volume(-10), "sys"
-        elif "silencio" in cmd or "mute" in cmd:
+        elif "silencio" in rutas:
             pyautogui.press("volumemute")
             return "🔇 Silencio.", "local"
-        elif "pausa" in cmd or "play" in cmd or "continuar" in cmd:
+        elif "media_pausa" in rutas:
             pyautogui.press("playpause")
             return "⏯️ Play/Pausa.", "local"
 
         # 3. Macro: Abre App y Escribe
         # Ej: "Abre notas y escribe comprar leche"
-        elif "abre" in cmd and "y escribe" in cmd:
+        elif "macro_escribir" in rutas:
             try:
                 # Parsear: "abre [app] y escribe [texto]"
                 parte_app = re.search(r"abre (.*?) y escribe", cmd).group(1).strip()
@@ -2081,7 +2616,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
 
         # 4. Macro: Abre App y Reproduce/Busca (NUEVO)
         # Ej: "Abre YouTube y reproduce rock"
-        elif "abre" in cmd and ("y reproduce" in cmd or "y busca" in cmd):
+        elif "macro_reproducir" in rutas:
             try:
                 separador = "y reproduce" if "y reproduce" in cmd else "y busca"
                 parte_app = re.search(f"abre (.*?) {separador}", cmd).group(1).strip()
@@ -2115,7 +2650,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
         import random
         
         # --- NUEVO: COMANDO DE CIERRE REAL ---
-        if any(x in cmd for x in ["ciérrate", "cierra el programa", "cierra s.a.r.a", "apágate", "nos vemos"]):
+        if "cerrar_sara" in rutas:
             return "¡Hasta luego! Cerrando sistemas...", "exit"
         
         # Patrones (Regex) -> [Posibles Respuestas]
@@ -2149,7 +2684,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
         ]
         
         # Comando de hora (con formato legible para voz)
-        if any(x in cmd for x in ["qué hora", "que hora", "hora es", "dime la hora"]):
+        if "hora_pregunta" in rutas:
             ahora = datetime.datetime.now()
             hora = ahora.hour
             minutos = ahora.minute
@@ -2186,7 +2721,7 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
 
         # 2. Calculadora Local (Evitar IA para matemáticas simples)
         # Patrones: "cuanto es 5+5", "calcula 2*3"
-        if "cuanto es" in cmd or "calcula" in cmd:
+        if "calcular" in rutas:
             try:
                 # Extraer expresión matemática
                 expr = cmd.replace("cuanto es", "").replace("calcula", "").replace("x", "*").strip()
@@ -2206,13 +2741,8 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             if not self.ia_online:
                 return "💡 Comandos: 'sistema', 'trabajar en [ruta]', 'git status'. Configura la IA para más.", "sys"
             
-            # Agregar contexto si existe
-            comando_con_contexto = comando
-            if contexto_adicional:
-                comando_con_contexto = f"{contexto_adicional}\nUsuario: {comando}"
-            
-            # Usar IA para interpretar el comando y decidir qué hacer
-            respuesta, origen = self._ai_command_router(comando_con_contexto)
+            # Usar IA para interpretar el comando y decidir qué hacer (con el historial si es seguimiento)
+            respuesta, origen = self._ai_command_router(comando, historial)
             
             # Guardar en memoria
             if self.memory:
@@ -2220,7 +2750,54 @@ O simplemente di: "Genera el oficio" y te preguntaré los datos.
             
             return respuesta, origen
     
-    def _ai_command_router(self, comando: str):
+    def _ejecutar_accion_router(self, accion, cmd):
+        """Ejecuta una acción ya validada del Smart Intent Router (ver ACCIONES_ROUTER)"""
+        tipo = accion["action"]
+        
+        if tipo == "volume":
+            if "level" in accion:
+                return self.sys_control.set_volume(accion["level"])
+            return self.sys_control.adjust_volume(accion["change"])
+                
+        elif tipo == "brightness":
+            return self.sys_control.set_brightness(accion["level"])
+            
+        elif tipo == "media":
+            op = accion["operation"]
+            if op == "play_pause": return self.sys_control.media_play_pause()
+            elif op == "next": return self.sys_control.media_next()
+            elif op == "prev": return self.sys_control.media_prev()
+            elif op == "mute": return self.sys_control.mute_volume()
+
+        elif tipo == "open_app":
+            return self.abrir_inteligente(accion["app_name"], cmd)[0]
+
+        elif tipo == "search_web":
+            q = accion["query"]
+            site = accion.get("site", "google")
+            if site == "youtube":
+                webbrowser.open(f"https://www.youtube.com/results?search_query={q}")
+            else:
+                webbrowser.open(f"https://www.google.com/search?q={q}")
+            return f"Buscando {q} en {site}"
+
+        elif tipo == "timer":
+            return self.cronos.programar_alarma(accion["minutes"], accion.get("message", "Alarma"))
+        
+        elif tipo == "zen_mode":
+            enable = accion.get("enable", True)
+            self.sys_control.minimize_all_windows()
+            if enable:
+                time.sleep(0.5)
+                webbrowser.open("https://www.youtube.com/watch?v=jfKfPfyJRdk")
+                return "🧘‍♂️ Modo Zen activado por IA."
+            # Intentar cerrar musica
+            self.sys_control.close_window_by_title("lofi")
+            self.sys_control.close_window_by_title("youtube")
+            return "🧘‍♂️ Modo Zen desactivado."
+        return None
+
+    def _ai_command_router(self, comando: str, historial=None):
         """
         Router inteligente que usa IA para interpretar comandos ambiguos
         y ejecutarlos automáticamente
@@ -2252,7 +2829,7 @@ Comando del usuario: "{comando}"
 
         try:
             # Consultar IA
-            respuesta_ia, _ = self.consultar_ia(system_prompt, "")
+            respuesta_ia, _ = self.consultar_ia(system_prompt, "", historial=historial, consulta_memoria=comando)
             
             # Si la IA dice "EJECUTAR:", extraer el comando y ejecutarlo
             if "EJECUTAR:" in respuesta_ia:
@@ -2271,7 +2848,7 @@ Comando del usuario: "{comando}"
             # Fallback a respuesta normal
             contexto = f"\n\nDirectorio actual de trabajo: {DevOpsManager.WORK_DIR}. Ayuda con comandos Git si se solicita."
             try:
-                return self.consultar_ia(comando, contexto)
+                return self.consultar_ia(comando, contexto, historial=historial)
             except:
                 return "Lo siento, no entendí eso. ¿Podrías repetirlo?", "error"
 
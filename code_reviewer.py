@@ -59,7 +59,7 @@ class CodeReviewer:
         
         # Consultar IA
         try:
-            resultado, tipo = self.ia_callback(prompt)
+            resultado, tipo = self.ia_callback(prompt, sitio="code")
             return resultado, "ai"
         except Exception as e:
             logging.error(f"Error en análisis de código: {e}")
@@ -184,7 +184,7 @@ Genera un archivo de tests completo ({nombre_test}) que incluya:
 El código debe ser ejecutable directamente. Usa asserts claros y nombres descriptivos."""
 
         try:
-            resultado, _ = self.ia_callback(prompt)
+            resultado, _ = self.ia_callback(prompt, sitio="code")
             return resultado, "ai"
         except Exception as e:
             return f"❌ Error generando tests: {e}", "error"
@@ -231,7 +231,7 @@ Genera el código COMPLETO con:
 Devuelve el código completo mejorado, no solo las docstrings."""
 
         try:
-            resultado, _ = self.ia_callback(prompt)
+            resultado, _ = self.ia_callback(prompt, sitio="code")
             return resultado, "ai"
         except Exception as e:
             return f"❌ Error generando documentación: {e}", "error"
@@ -282,7 +282,7 @@ Para cada sugerencia:
 - Justifica el beneficio"""
 
         try:
-            resultado, _ = self.ia_callback(prompt)
+            resultado, _ = self.ia_callback(prompt, sitio="code")
             return resultado, "ai"
         except Exception as e:
             return f"❌ Error sugiriendo refactoring: {e}", "error"
@@ -329,7 +329,7 @@ Proporciona:
 Usa lenguaje simple, como si explicaras a un colega."""
 
         try:
-            resultado, _ = self.ia_callback(prompt)
+            resultado, _ = self.ia_callback(prompt, sitio="code")
             return resultado, "ai"
         except Exception as e:
             return f"❌ Error explicando código: {e}", "error"
@@ -7,6 +7,18 @@ from dotenv import load_dotenv
 
 CONFIG_FILE = "sara_config.json"
 
+# Ajustes avanzados de IA: solo se leen/guardan en sara_config.json
+#   limites_ia: cuotas por proveedor (ver rate_limiter.py)
+#   hedging_ia: lanzar el siguiente proveedor si el preferido tarda más que su p90
+#   hedge_percentil: percentil de latencia usado como retardo de cobertura
+#   local_model_path / local_threads: modelo GGUF local (ver local_llm.py)
+CLAVES_AVANZADAS_IA = ("limites_ia", "hedging_ia", "hedge_percentil", "local_model_path", "local_threads")
+
+# Ajustes avanzados de voz (ver voice.py / tts_local.py)
+#   tts_local: "" = voz local automática (sin red o lenta + confirmaciones), "siempre", "no"
+#   tts_local_model: modelo Piper .onnx (si no hay, voz del sistema con pyttsx3)
+CLAVES_AVANZADAS_VOZ = ("tts_local", "tts_local_model")
+
 # Determinar la ruta del archivo .env
 # Para desarrollo: usar .env en el directorio actual
 # Para ejecutable: usar %APPDATA%\SARA\.env
@@ -45,7 +57,15 @@ class ConfigManager:
             "groq_key": "",
             "openai_key": "",
             "theme": "Dark",
-            "git_path": "C:/Program Files/Git/bin/git.exe"
+            "git_path": "C:/Program Files/Git/bin/git.exe",
+            "nlu_backend": "sentence-transformers",  # o "onnx-int8" (ver encoder_backend.py)
+            "limites_ia": {},
+            "hedging_ia": False,
+            "hedge_percentil": 90,
+            "local_model_path": "",
+            "local_threads": 0,  # 0 = la mitad de los núcleos
+            "tts_local": "",
+            "tts_local_model": ""
         }
         
         # PRIORIDAD 1: Variables de entorno (MÁS SEGURO)
@@ -56,7 +76,13 @@ class ConfigManager:
             "openai_key": os.getenv("OPENAI_API_KEY", ""),
             "weather_key": os.getenv("WEATHER_API_KEY", ""), # NUEVO
             "theme": os.getenv("SARA_THEME", default["theme"]),
-            "git_path": os.getenv("SARA_GIT_PATH", default["git_path"])
+            "git_path": os.getenv("SARA_GIT_PATH", default["git_path"]),
+            "nlu_backend": os.getenv("SARA_NLU_BACKEND", default["nlu_backend"]),
+            "hedging_ia": os.getenv("SARA_HEDGING", "0") == "1",
+            "local_model_path": os.getenv("SARA_LOCAL_MODEL", ""),
+            "local_threads": int(os.getenv("SARA_LOCAL_THREADS", "0") or 0),
+            "tts_local": os.getenv("SARA_TTS_LOCAL", ""),
+            "tts_local_model": os.getenv("SARA_TTS_LOCAL_MODEL", "")
         }
         
         # PRIORIDAD 2: Archivo JSON (solo configuración no sensible)
@@ -74,6 +100,14 @@ class ConfigManager:
                     
                     if not config["git_path"] or config["git_path"] == default["git_path"]:
                         config["git_path"] = file_config.get("git_path", default["git_path"])
+                    
+                    if not config["nlu_backend"] or config["nlu_backend"] == default["nlu_backend"]:
+                        config["nlu_backend"] = file_config.get("nlu_backend", default["nlu_backend"])
+                    
+                    for clave in CLAVES_AVANZADAS_IA + CLAVES_AVANZADAS_VOZ:
+                        # Las variables de entorno mandan sobre el archivo
+                        if clave in file_config and not config.get(clave):
+                            config[clave] = file_config[clave]
                         
             except Exception as e:
                 logging.warning(f"Error leyendo config: {e}")
@@ -90,8 +124,12 @@ class ConfigManager:
         safe_data = {
             "provider": data.get("provider", "Gemini"),
             "theme": data.get("theme", "Dark"),
-            "git_path": data.get("git_path", "C:/Program Files/Git/bin/git.exe")
+            "git_path": data.get("git_path", "C:/Program Files/Git/bin/git.exe"),
+            "nlu_backend": data.get("nlu_backend", "sentence-transformers")
         }
+        for clave in CLAVES_AVANZADAS_IA + CLAVES_AVANZADAS_VOZ:
+            if clave in data:
+                safe_data[clave] = data[clave]
         
         try:
             with open(CONFIG_FILE, "w", encoding="utf-8") as f:
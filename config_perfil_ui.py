@@ -192,9 +192,10 @@ class ConfiguracionPerfil(ctk.CTkToplevel):
                 # Acceder al brain desde la ventana padre (SARA)
                 if hasattr(self.master, 'brain'):
                     brain = self.master.brain
-                    # Reinicializar motor de voz con nuevas preferencias
-                    from voice import NeuralVoiceEngine
-                    brain.voz = NeuralVoiceEngine()
+                    # Mismo motor con las nuevas preferencias: recrearlo duplicaría el
+                    # planificador sobre el mismo canal y dejaría a Guardian/Pomodoro
+                    # hablando por el motor viejo
+                    brain.aplicar_preferencias_voz()
                     
                     # Confirmar con voz nueva
                     nombre = self.nombre_preferido.get() or self.nombre.get() or "Usuario"
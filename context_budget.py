@@ -0,0 +1,267 @@
+"""
+📐 SARA - Context Budget
+=========================
+
+Presupuesto de tamaño de prompt compartido por todas las llamadas a la IA.
+
+Un prompt se compone de:
+    sistema (fijo) + memorias RAG + historial de conversación + payload
+
+El presupuesto (en tokens estimados) depende de los proveedores conectados:
+se usa el menor, así el mismo prompt sirve para el fallback/hedging. No es
+el contexto máximo del modelo sino lo que nos permitimos por petición:
+prompts más cortos = menos latencia y menos límites por tokens/minuto.
+
+- Memorias RAG e historial tienen cada uno una fracción del presupuesto y se
+  recortan por RELEVANCIA (distancia de Chroma, solapamiento con la
+  consulta), no por posición.
+- Los documentos largos (PDF, páginas web) se parten en trozos y se quedan
+  los más relevantes/representativos en su orden original, con el inicio y
+  el final siempre incluidos, en lugar de cortar a N caracteres y perder el
+  final del documento.
+
+Los tokens se estiman por caracteres con una razón por proveedor (español
+~3.5-4 caracteres/token); no hace falta el tokenizer de cada modelo.
+"""
+
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tokens de entrada que nos permitimos por petición (latencia/cuota, no el máximo del modelo)
+PRESUPUESTO_ENTRADA = {
+    "Gemini": 12000,   # gemini flash: contexto enorme, el límite es la latencia
+    "Groq": 6000,      # llama-3.3-70b free: el tope real son los tokens/minuto
+    "ChatGPT": 8000,   # gpt-4o-mini
+}
+PRESUPUESTO_DEFECTO = 6000
+
+CHARS_POR_TOKEN = {"Gemini": 4.0, "Groq": 3.6, "ChatGPT": 3.8}
+CHARS_POR_TOKEN_DEFECTO = 3.6
+
+RESERVA_SISTEMA = 200        # Mensaje de sistema / instrucciones fijas del proveedor
+FRACCION_RAG = 0.15          # Máximo del presupuesto para memorias del Second Brain
+FRACCION_HISTORIAL = 0.15    # Máximo para turnos de conversación recientes
+CHARS_TROZO = 800            # Tamaño de trozo al recortar documentos
+SEPARADOR_OMITIDO = "\n[...]\n"
+
+_PALABRA = re.compile(r"\w{4,}", re.UNICODE)
+
+
+def _palabras(texto: str) -> List[str]:
+    return _PALABRA.findall(texto.lower())
+
+
+def _solapamiento(consulta: set, texto: str) -> float:
+    """Fracción de las palabras de la consulta presentes en el texto."""
+    if not consulta:
+        return 0.0
+    return len(consulta & set(_palabras(texto))) / len(consulta)
+
+
+class ContextBudget:
+    """Estimación de tokens y reparto del presupuesto de un prompt."""
+
+    def __init__(self, presupuestos: Optional[Dict[str, int]] = None):
+        self.presupuestos = dict(PRESUPUESTO_ENTRADA)
+        self.presupuestos.update(presupuestos or {})
+        self.proveedores: List[str] = []
+
+    def configurar_proveedores(self, proveedores: Iterable[str]):
+        """Proveedores conectados (se llama desde conectar_ias)."""
+        self.proveedores = list(proveedores)
+
+    # ------------------------------------------------------------------
+    # Estimaciones
+    # ------------------------------------------------------------------
+    def _chars_por_token(self) -> float:
+        # La razón más pesimista de los proveedores activos
+        if not self.proveedores:
+            return CHARS_POR_TOKEN_DEFECTO
+        return min(CHARS_POR_TOKEN.get(p, CHARS_POR_TOKEN_DEFECTO) for p in self.proveedores)
+
+    def estimar_tokens(self, texto: str) -> int:
+        if not texto:
+            return 0
+        return math.ceil(len(texto) / self._chars_por_token())
+
+    def presupuesto(self) -> int:
+        """Tokens de entrada por petición (el menor de los proveedores activos)."""
+        if not self.proveedores:
+            return PRESUPUESTO_DEFECTO
+        return min(self.presupuestos.get(p, PRESUPUESTO_DEFECTO) for p in self.proveedores)
+
+    def presupuesto_documento(self, instrucciones: str = "") -> int:
+        """Tokens disponibles para un documento (descontando sistema, RAG e instrucciones)."""
+        total = self.presupuesto()
+        reservado = RESERVA_SISTEMA + int(total * FRACCION_RAG) + self.estimar_tokens(instrucciones)
+        return max(0, total - reservado)
+
+    # ------------------------------------------------------------------
+    # Selección por relevancia
+    # ------------------------------------------------------------------
+    def seleccionar(self, items: Sequence[Tuple[str, float]], max_tokens: int) -> List[str]:
+        """
+        Elige los textos de mayor puntuación que caben en max_tokens y los
+        devuelve en su orden original.
+        """
+        elegidos = set()
+        usados = 0
+        for idx in sorted(range(len(items)), key=lambda i: items[i][1], reverse=True):
+            coste = self.estimar_tokens(items[idx][0])
+            if usados + coste <= max_tokens:
+                elegidos.add(idx)
+                usados += coste
+        return [items[i][0] for i in sorted(elegidos)]
+
+    def _puntuar_historial(self, historial: Sequence[Dict], consulta: str) -> List[Tuple[str, float]]:
+        """Turnos formateados con puntuación = relación con la consulta + recencia."""
+        palabras_consulta = set(_palabras(consulta))
+        items = []
+        for i, turno in enumerate(historial):
+            texto = f"Usuario: {turno.get('user', '')}\nSARA: {turno.get('sara', '')}\n"
+            recencia = (i + 1) / len(historial)
+            items.append((texto, _solapamiento(palabras_consulta, texto) + 0.5 * recencia))
+        return items
+
+    # ------------------------------------------------------------------
+    # Composición del prompt
+    # ------------------------------------------------------------------
+    def componer(self, prompt: str, contexto_extra: str = "",
+                 memorias: Optional[Sequence[Tuple[str, float]]] = None,
+                 historial: Optional[Sequence[Dict]] = None) -> str:
+        """
+        Prompt final dentro del presupuesto.
+
+        Args:
+            prompt: Instrucción + payload del que llama (no se recorta aquí;
+                los documentos largos se recortan antes con recortar_documento)
+            contexto_extra: Texto que va al final del prompt
+            memorias: (texto, relevancia 0-1) del Second Brain
+            historial: Turnos {"user", "sara"} de ConversationMemory, del más
+                antiguo al más reciente
+        """
+        total = self.presupuesto()
+        libre = total - RESERVA_SISTEMA - self.estimar_tokens(prompt) - self.estimar_tokens(contexto_extra)
+        if libre < 0:
+            logger.warning(f"📐 Prompt de ~{total - libre} tokens supera el presupuesto ({total})")
+
+        contexto_rag = ""
+        if memorias and libre > 0:
+            elegidas = self.seleccionar(memorias, min(libre, int(total * FRACCION_RAG)))
+            if elegidas:
+                contexto_rag = "\n[MEMORIA A LARGO PLAZO RECUPERADA]:\n" + "\n".join(elegidas) + "\n"
+                libre -= self.estimar_tokens(contexto_rag)
+
+        contexto_historial = ""
+        if historial and libre > 0:
+            turnos = self.seleccionar(self._puntuar_historial(historial, prompt),
+                                      min(libre, int(total * FRACCION_HISTORIAL)))
+            if turnos:
+                contexto_historial = "Contexto de conversación reciente:\n" + "".join(turnos) + "\n"
+
+        return f"{contexto_rag}{contexto_historial}{prompt} {contexto_extra}"
+
+    # ------------------------------------------------------------------
+    # Documentos largos
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _trocear(texto: str) -> List[str]:
+        """Trozos de ~CHARS_TROZO respetando párrafos (y frases si un párrafo es enorme)."""
+        trozos, actual = [], ""
+        for parrafo in re.split(r"\n\s*\n|\n", texto):
+            parrafo = parrafo.strip()
+            if not parrafo:
+                continue
+            piezas = [parrafo]
+            if len(parrafo) > CHARS_TROZO:
+                piezas = re.split(r"(?<=[.!?])\s+", parrafo)
+            for pieza in piezas:
+                if actual and len(actual) + len(pieza) > CHARS_TROZO:
+                    trozos.append(actual)
+                    actual = ""
+                while len(pieza) > CHARS_TROZO:
+                    trozos.append(pieza[:CHARS_TROZO])
+                    pieza = pieza[CHARS_TROZO:]
+                actual = f"{actual}\n{pieza}" if actual else pieza
+        if actual:
+            trozos.append(actual)
+        return trozos
+
+    def recortar_documento(self, texto: str, max_tokens: Optional[int] = None, consulta: str = "") -> str:
+        """
+        Ajusta un documento al presupuesto conservando lo más relevante.
+
+        Sin consulta, la relevancia de un trozo es cuánto comparte el
+        vocabulario dominante del documento (lo representativo); con consulta,
+        su solapamiento con ella. El primer y último trozo se priorizan
+        (introducción / conclusión). Los huecos se marcan con [...].
+        """
+        if max_tokens is None:
+            max_tokens = self.presupuesto_documento()
+        if self.estimar_tokens(texto) <= max_tokens:
+            return texto
+
+        trozos = self._trocear(texto)
+        if not trozos:
+            return ""
+
+        if consulta:
+            palabras_consulta = set(_palabras(consulta))
+            puntuaciones = [_solapamiento(palabras_consulta, t) for t in trozos]
+        else:
+            frecuencias = Counter(_palabras(texto))
+            puntuaciones = []
+            for trozo in trozos:
+                palabras = _palabras(trozo)
+                puntuaciones.append(sum(frecuencias[p] for p in set(palabras)) / math.sqrt(len(palabras) + 1))
+            tope = max(puntuaciones) or 1.0
+            puntuaciones = [p / tope for p in puntuaciones]
+
+        puntuaciones[0] += 2.0
+        puntuaciones[-1] += 1.5
+
+        # Presupuesto descontando los separadores que se van a insertar
+        coste_separador = self.estimar_tokens(SEPARADOR_OMITIDO)
+        items = list(zip(range(len(trozos)), puntuaciones))
+        elegidos, usados = [], 0
+        for idx, _ in sorted(items, key=lambda x: x[1], reverse=True):
+            coste = self.estimar_tokens(trozos[idx]) + coste_separador
+            if usados + coste <= max_tokens:
+                elegidos.append(idx)
+                usados += coste
+        elegidos.sort()
+
+        partes = []
+        anterior = -1
+        for idx in elegidos:
+            if idx != anterior + 1:
+                partes.append(SEPARADOR_OMITIDO)
+            elif partes:
+                partes.append("\n")
+            partes.append(trozos[idx])
+            anterior = idx
+        if anterior != len(trozos) - 1:
+            partes.append(SEPARADOR_OMITIDO)
+
+        logger.info(f"📐 Documento recortado: {len(elegidos)}/{len(trozos)} trozos (~{usados} tokens)")
+        return "".join(partes)
+
+
+_budget_instance = None
+_budget_lock = threading.Lock()
+
+
+def obtener_context_budget() -> ContextBudget:
+    """Obtiene el presupuesto de contexto global (singleton)."""
+    global _budget_instance
+    if _budget_instance is None:
+        with _budget_lock:
+            if _budget_instance is None:
+                _budget_instance = ContextBudget()
+    return _budget_instance
@@ -50,6 +50,18 @@ class ConversationMemory:
         
         logging.debug(f"Memoria: Agregado turno. Total: {len(self.history)}")
     
+    def get_recent_turns(self, n: int = 4) -> List[Dict]:
+        """
+        Últimos n turnos (del más antiguo al más reciente)
+        
+        Args:
+            n: Número de turnos
+            
+        Returns:
+            Copia de los turnos (dicts con 'user', 'sara', ...)
+        """
+        return [dict(turn) for turn in self.history[-n:]]
+    
     def get_context_prompt(self, include_last_n: int = 3) -> str:
         """
         Genera un prompt con el contexto de conversación reciente
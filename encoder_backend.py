@@ -0,0 +1,311 @@
+"""
+⚡ SARA - Encoder Backends
+==========================
+
+Backends intercambiables para generar embeddings de texto (NLU + Second Brain):
+
+1. sentence-transformers - PyTorch FP32 (comportamiento original)
+2. onnx-int8             - ONNX Runtime con cuantización dinámica int8
+                           (sin torch en tiempo de ejecución: menos RAM y arranque rápido)
+
+Ambos exponen encode() compatible con SentenceTransformer.encode, así que
+HybridIntentClassifier y SecondBrain los usan sin cambios.
+
+Se selecciona con "nlu_backend" en la configuración (SARA_NLU_BACKEND).
+
+Verificación de precisión:
+    python encoder_backend.py --verificar onnx-int8
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = Path(__file__).parent
+CACHE_DIR = PROJECT_DIR / ".sara_models"
+ONNX_DIR = CACHE_DIR / "onnx"
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+HF_MODEL_ID = f"sentence-transformers/{MODEL_NAME}"
+MAX_SEQ_LENGTH = 256  # Igual que all-MiniLM-L6-v2 en sentence-transformers
+
+BACKEND_SENTENCE_TRANSFORMERS = "sentence-transformers"
+BACKEND_ONNX_INT8 = "onnx-int8"
+BACKENDS_DISPONIBLES = [BACKEND_SENTENCE_TRANSFORMERS, BACKEND_ONNX_INT8]
+BACKEND_DEFAULT = BACKEND_SENTENCE_TRANSFORMERS
+
+
+class EncoderBackend:
+    """Interfaz común de los backends de embeddings."""
+
+    nombre = "base"
+
+    @property
+    def encoder_id(self) -> str:
+        """Identificador usado para invalidar caches de embeddings."""
+        return f"{MODEL_NAME}:{self.nombre}"
+
+    def encode(self, sentences: Union[str, List[str]], convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Codifica uno o varios textos.
+
+        Returns:
+            Vector (D,) si sentences es str, matriz (N, D) float32 si es lista.
+        """
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EncoderBackend):
+    """Backend original: SentenceTransformer sobre PyTorch (FP32)."""
+
+    nombre = BACKEND_SENTENCE_TRANSFORMERS
+
+    def __init__(self, cache_folder: Optional[str] = None):
+        # Modelos de Sentence-Transformers DENTRO del proyecto (solo al cargar el backend)
+        carpeta = Path(cache_folder or CACHE_DIR)
+        carpeta.mkdir(parents=True, exist_ok=True)
+        os.environ.setdefault("SENTENCE_TRANSFORMERS_HOME", str(carpeta))
+        # Import diferido: torch solo se carga si se usa este backend
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(MODEL_NAME, cache_folder=str(carpeta))
+
+    def encode(self, sentences, convert_to_numpy=True, normalize_embeddings=False, batch_size=32, **kwargs):
+        return self.model.encode(
+            sentences,
+            convert_to_numpy=convert_to_numpy,
+            normalize_embeddings=normalize_embeddings,
+            batch_size=batch_size,
+            **kwargs
+        )
+
+
+class OnnxInt8Backend(EncoderBackend):
+    """
+    Backend ONNX Runtime con pesos cuantizados a int8 (cuantización dinámica).
+
+    La primera vez exporta el modelo (requiere torch + transformers, solo en
+    esa ocasión). Después solo necesita onnxruntime y tokenizers.
+    """
+
+    nombre = BACKEND_ONNX_INT8
+
+    def __init__(self, model_dir: Optional[Path] = None, num_threads: Optional[int] = None):
+        self.model_dir = Path(model_dir or ONNX_DIR / MODEL_NAME)
+        self.model_fp32 = self.model_dir / "model.onnx"
+        self.model_int8 = self.model_dir / "model_int8.onnx"
+        self.tokenizer_file = self.model_dir / "tokenizer.json"
+
+        if not (self.model_int8.exists() and self.tokenizer_file.exists()):
+            self._exportar()
+
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(str(self.tokenizer_file))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        opciones = ort.SessionOptions()
+        opciones.intra_op_num_threads = num_threads or max(1, (os.cpu_count() or 2) // 2)
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            str(self.model_int8),
+            sess_options=opciones,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        # Dimensión del embedding (última del last_hidden_state); si el grafo la
+        # deja simbólica se mide con una frase de prueba
+        dimension = self.session.get_outputs()[0].shape[-1]
+        self.dimension = dimension if isinstance(dimension, int) else self._encode_batch(["hola"]).shape[1]
+        logger.info(f"⚡ Encoder ONNX int8 listo ({self.model_int8.name}, {opciones.intra_op_num_threads} hilos)")
+
+    def _exportar(self):
+        """Exporta el transformer a ONNX y lo cuantiza a int8 (una sola vez)."""
+        logger.info("🔧 Exportando modelo NLU a ONNX int8 (solo la primera vez)...")
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_ID, cache_dir=str(CACHE_DIR))
+        model = AutoModel.from_pretrained(HF_MODEL_ID, cache_dir=str(CACHE_DIR)).eval()
+
+        muestra = tokenizer(["hola sara"], return_tensors="pt")
+        ejes = {0: "batch", 1: "secuencia"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (muestra["input_ids"], muestra["attention_mask"], muestra["token_type_ids"]),
+                str(self.model_fp32),
+                input_names=["input_ids", "attention_mask", "token_type_ids"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": ejes,
+                    "attention_mask": ejes,
+                    "token_type_ids": ejes,
+                    "last_hidden_state": ejes,
+                },
+                opset_version=14,
+            )
+
+        quantize_dynamic(str(self.model_fp32), str(self.model_int8), weight_type=QuantType.QInt8)
+        tokenizer.save_pretrained(str(self.model_dir))  # Genera tokenizer.json
+
+        # El modelo FP32 ya no se necesita
+        try:
+            self.model_fp32.unlink()
+        except OSError:
+            pass
+
+        logger.info(f"💾 Modelo ONNX int8 guardado en: {self.model_int8}")
+
+    def _encode_batch(self, textos: List[str]) -> np.ndarray:
+        """Tokeniza, ejecuta el modelo y aplica mean pooling (como sentence-transformers)."""
+        codificados = self.tokenizer.encode_batch(textos)
+        input_ids = np.asarray([c.ids for c in codificados], dtype=np.int64)
+        attention_mask = np.asarray([c.attention_mask for c in codificados], dtype=np.int64)
+
+        entradas = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            entradas["token_type_ids"] = np.zeros_like(input_ids)
+
+        hidden = self.session.run(None, entradas)[0]
+
+        mascara = attention_mask[:, :, None].astype(np.float32)
+        suma = (hidden * mascara).sum(axis=1)
+        conteo = np.clip(mascara.sum(axis=1), 1e-9, None)
+        return (suma / conteo).astype(np.float32)
+
+    def encode(self, sentences, convert_to_numpy=True, normalize_embeddings=False, batch_size=32, **kwargs):
+        unico = isinstance(sentences, str)
+        textos = [sentences] if unico else list(sentences)
+
+        if not textos:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        bloques = [self._encode_batch(textos[i:i + batch_size]) for i in range(0, len(textos), batch_size)]
+        embeddings = np.vstack(bloques)
+
+        if normalize_embeddings:
+            normas = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            normas[normas == 0] = 1.0
+            embeddings = embeddings / normas
+
+        return embeddings[0] if unico else embeddings
+
+
+def crear_backend(nombre: Optional[str] = None) -> EncoderBackend:
+    """
+    Crea el backend de embeddings indicado.
+    Si el backend pedido falla (dependencias, export), cae a sentence-transformers.
+    """
+    nombre = (nombre or BACKEND_DEFAULT).strip().lower()
+
+    if nombre == BACKEND_ONNX_INT8:
+        try:
+            return OnnxInt8Backend()
+        except Exception as e:
+            logger.warning(f"⚠️ Backend ONNX int8 no disponible ({e}). Usando sentence-transformers.")
+    elif nombre != BACKEND_SENTENCE_TRANSFORMERS:
+        logger.warning(f"⚠️ Backend NLU desconocido '{nombre}'. Usando sentence-transformers.")
+
+    return SentenceTransformerBackend()
+
+
+def _top1_leave_one_out(backend: EncoderBackend, ejemplos: Dict[str, List[str]]) -> Tuple[List[str], List[str]]:
+    """
+    Para cada ejemplo, intención del vecino más parecido excluyéndose a sí mismo
+    (máximo por intención, igual que la Capa 2 del clasificador).
+    
+    Returns:
+        (predicciones, intenciones reales)
+    """
+    intents = list(ejemplos.keys())
+    textos = []
+    etiquetas = []
+    for idx, intent in enumerate(intents):
+        for ejemplo in ejemplos[intent]:
+            textos.append(ejemplo)
+            etiquetas.append(idx)
+    etiquetas = np.asarray(etiquetas)
+
+    matriz = np.asarray(backend.encode(textos, normalize_embeddings=True), dtype=np.float32)
+    similitud = matriz @ matriz.T
+    np.fill_diagonal(similitud, -np.inf)
+
+    por_intent = np.full((len(textos), len(intents)), -np.inf, dtype=np.float32)
+    for idx in range(len(intents)):
+        columnas = etiquetas == idx
+        if columnas.any():
+            por_intent[:, idx] = similitud[:, columnas].max(axis=1)
+
+    return [intents[i] for i in por_intent.argmax(axis=1)], [intents[i] for i in etiquetas]
+
+
+def verificar_precision(candidato: EncoderBackend, referencia: Optional[EncoderBackend] = None,
+                        ejemplos: Optional[Dict[str, List[str]]] = None) -> Dict:
+    """
+    Compara el top-1 de dos backends sobre INTENT_EXAMPLES_FULL (leave-one-out).
+
+    Returns:
+        Dict con precisión de cada backend, porcentaje de acuerdo en el top-1
+        y la lista de ejemplos donde difieren.
+    """
+    if ejemplos is None:
+        from intent_examples_full import INTENT_EXAMPLES_FULL
+        ejemplos = INTENT_EXAMPLES_FULL
+    if referencia is None:
+        referencia = SentenceTransformerBackend()
+
+    pred_ref, reales = _top1_leave_one_out(referencia, ejemplos)
+    pred_cand, _ = _top1_leave_one_out(candidato, ejemplos)
+
+    textos = [t for intent in ejemplos for t in ejemplos[intent]]
+    total = len(reales)
+    diferencias = [
+        {"texto": textos[i], "real": reales[i], "referencia": pred_ref[i], "candidato": pred_cand[i]}
+        for i in range(total) if pred_ref[i] != pred_cand[i]
+    ]
+
+    return {
+        "referencia": referencia.nombre,
+        "candidato": candidato.nombre,
+        "total": total,
+        "precision_referencia": sum(p == r for p, r in zip(pred_ref, reales)) / total,
+        "precision_candidato": sum(p == r for p, r in zip(pred_cand, reales)) / total,
+        "acuerdo_top1": 1 - len(diferencias) / total,
+        "diferencias": diferencias,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Verifica un backend de embeddings contra sentence-transformers")
+    parser.add_argument("--verificar", default=BACKEND_ONNX_INT8, choices=BACKENDS_DISPONIBLES)
+    args = parser.parse_args()
+
+    reporte = verificar_precision(crear_backend(args.verificar))
+
+    print("\n🧪 VERIFICACIÓN DE BACKEND NLU\n" + "=" * 50)
+    print(f"Ejemplos:              {reporte['total']}")
+    print(f"Precisión {reporte['referencia']}: {reporte['precision_referencia']:.2%}")
+    print(f"Precisión {reporte['candidato']}: {reporte['precision_candidato']:.2%}")
+    print(f"Acuerdo top-1:         {reporte['acuerdo_top1']:.2%}")
+    for d in reporte["diferencias"][:20]:
+        print(f"  ≠ '{d['texto']}': {d['referencia']} -> {d['candidato']} (real: {d['real']})")
+
+    with open("nlu_backend_check.json", "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
@@ -3,6 +3,8 @@ import threading
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Tuple
 
+MENSAJE_DESCANSO_LARGO = "🍅 4 Pomodoros completados! Descanso largo de 15-30 minutos"
+
 class HealthMonitor:
     """Monitor de salud que rastrea sesiones de trabajo y envía recordatorios de bienestar"""
     
@@ -173,7 +175,7 @@ class HealthMonitor:
                 if self.current_profile == "pomodoro":
                     self.pomodoro_count += 1
                     if self.pomodoro_count % 4 == 0:
-                        message = "🍅 4 Pomodoros completados! Descanso largo de 15-30 minutos"
+                        message = MENSAJE_DESCANSO_LARGO
                 
                 return (emoji, f"{emoji} {interval}min", message)
         
@@ -216,3 +218,9 @@ class HealthMonitor:
         self.last_reminders = {}  # Reset recordatorios
         
         return f"✅ Perfil cambiado de {old_profile} → {new_profile}"
+    
+    def frases_voz(self) -> List[str]:
+        """Mensajes de los recordatorios (para precalentar el cache de audio del TTS)"""
+        frases = [message for reminders in self.profiles.values() for _, _, message, _ in reminders]
+        frases.append(MENSAJE_DESCANSO_LARGO)
+        return frases
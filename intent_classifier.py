@@ -14,16 +14,21 @@ Fecha: 2025-12-29
 import logging
 import difflib
 import re
-import pickle
+import json
 import hashlib
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 from pathlib import Path
-from typing import Tuple, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer, util
+from typing import Tuple, Dict, Any, Optional, List
 import numpy as np
 
 # Importar dataset completo
 from intent_examples_full import INTENT_EXAMPLES_FULL
+from encoder_backend import crear_backend, MODEL_NAME
+from intent_learning import LearnedIntentStore, ORIGEN_IA, ORIGEN_USUARIO
+from structured_output import extraer_json
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
@@ -32,7 +37,46 @@ logger = logging.getLogger(__name__)
 # Cache de embeddings (DENTRO DEL PROYECTO)
 PROJECT_DIR = Path(__file__).parent
 CACHE_DIR = PROJECT_DIR / ".sara_models"
-EMBEDDINGS_CACHE_FILE = CACHE_DIR / "intent_embeddings.pkl"
+# Formato: matriz .npy (float32, L2-normalizada, mapeable en memoria) + manifiesto JSON
+EMBEDDINGS_MATRIX_FILE = CACHE_DIR / "intent_embeddings.npy"
+EMBEDDINGS_MANIFEST_FILE = CACHE_DIR / "intent_embeddings.json"
+EMBEDDINGS_CACHE_VERSION = 1
+
+# Umbral de confianza de la Capa 2 y número de candidatos reportados
+ML_CONFIDENCE_THRESHOLD = 0.65
+ML_TOP_K = 3
+
+# Cache LRU de resultados de clasificar() (comandos repetidos por voz)
+RESULT_CACHE_SIZE = 256
+
+# Capa 3: intenciones que puede devolver la IA (y su descripción para el prompt)
+INTENCIONES_IA = {
+    "MEMORIZAR": "Guardar información",
+    "VOLUMEN_SUBIR": "Control de audio",
+    "VOLUMEN_BAJAR": "Control de audio",
+    "SILENCIO": "Control de audio",
+    "ABRIR_APP": "Abrir aplicación",
+    "BUSCAR_WEB": "Buscar en internet",
+    "LEER_DOCUMENTO": "Leer archivo/página",
+    "REPRODUCIR_MEDIA": "Reproducir música/video",
+    "ALARMA": "Programar recordatorio",
+    "CLIMA": "Consultar clima",
+    "HORA_FECHA": "Consultar hora/fecha",
+    "TRADUCIR": "Traducir texto",
+    "CALCULAR": "Operación matemática",
+    "MODO_ZEN": "Activar modo concentración",
+    "CONVERSACION": "Charla general",
+}
+
+# JSON Schema de la respuesta de la Capa 3 (modo JSON nativo del proveedor)
+ESQUEMA_INTENCION_IA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": list(INTENCIONES_IA)},
+        "params": {"type": "object"},
+    },
+    "required": ["intent"],
+}
 
 
 class HybridIntentClassifier:
@@ -41,101 +85,250 @@ class HybridIntentClassifier:
     ML local y AI fallback para máxima robustez y velocidad.
     """
     
-    def __init__(self, ia_callback=None, splash_callback=None):
+    def __init__(self, ia_callback=None, splash_callback=None, backend: Optional[str] = None,
+                 ejemplos: Optional[Dict[str, List[str]]] = None, cache_dir: Optional[Path] = None):
         """
         Inicializa el clasificador híbrido.
         
+        El modelo de embeddings (Capa 2) se carga en un hilo en segundo plano:
+        mientras tanto solo responde la Capa 1 y el resto lo resuelve la cadena
+        de keywords de SaraBrain.procesar. La Capa 2 se activa sola al terminar.
+        
         Args:
             ia_callback: Función para consultar IA (opcional, para Layer 3)
             splash_callback: Función para actualizar splash screen (opcional)
+            backend: Backend de embeddings ("sentence-transformers" u "onnx-int8")
+            ejemplos: Dataset alternativo (por defecto INTENT_EXAMPLES_FULL; lo usa el benchmark)
+            cache_dir: Directorio de cache de embeddings/aprendidos (por defecto .sara_models)
         """
         self.ia_callback = ia_callback
+        self.ia_json_callback = None  # consultar_ia_estructurada (JSON nativo); lo asigna SaraBrain
         self.splash_callback = splash_callback
-        
-        # Crear directorio de modelos si no existe
-        CACHE_DIR.mkdir(exist_ok=True)
-        
-        # Configurar cache de Sentence-Transformers DENTRO del proyecto
-        os.environ['SENTENCE_TRANSFORMERS_HOME'] = str(CACHE_DIR)
-        
-        # Cargar modelo de embeddings (Layer 2)
-        if self.splash_callback:
-            self.splash_callback(30, "Cargando modelo NLU...", "Sentence-Transformers")
-        
-        logger.info("🧠 Cargando modelo Sentence-Transformers...")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2', cache_folder=str(CACHE_DIR))
-        
-        # Cargar ejemplos de entrenamiento
-        if self.splash_callback:
-            self.splash_callback(50, "Cargando ejemplos...", "1000+ variaciones de comandos")
-        
+        self.backend_name = backend
+        self._ejemplos = ejemplos
+        
+        # Archivos de cache (separables para no pisar el cache real)
+        self.cache_dir = Path(cache_dir) if cache_dir else CACHE_DIR
+        self.matrix_file = self.cache_dir / EMBEDDINGS_MATRIX_FILE.name
+        self.manifest_file = self.cache_dir / EMBEDDINGS_MANIFEST_FILE.name
+        
+        # Estado de la Capa 2 (se llena desde el hilo de carga)
+        self.model = None
+        self.example_matrix = None
+        self.ml_listo = threading.Event()
+        self.dataset_hash = None
+        
+        # Cache LRU: comando normalizado -> (intent, params, source)
+        self._cache_resultados: "OrderedDict[str, Tuple[str, Dict[str, Any], str]]" = OrderedDict()
+        self._cache_hash = None
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_ia_ahorradas = 0
+        
+        # Ejemplos aprendidos (Capa 3 / usuario) que se suman a la Capa 2
+        self.aprendidos = LearnedIntentStore(self.cache_dir)
+        self._aprendidos_snapshot = (None, None, None)  # (matriz, etiquetas, versión) para lectura sin lock
+        self.aciertos_aprendidos = 0
+        
+        # Directorio de la instancia (embeddings y ejemplos aprendidos); el
+        # de los modelos lo prepara el backend al cargar (encoder_backend.py)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Cargar ejemplos de entrenamiento (instantáneo, solo datos)
         self.intent_examples = self._cargar_ejemplos()
         
-        # Generar embeddings de los ejemplos
         if self.splash_callback:
-            self.splash_callback(60, "Generando embeddings...", "Esto puede tardar ~3s la primera vez")
+            self.splash_callback(30, "Cargando modelo NLU...", "En segundo plano")
         
-        self.intent_embeddings = self._generar_embeddings()
+        # Cargar modelo + embeddings en segundo plano (Layer 2)
+        # model_future se comparte con Second Brain para no cargar el modelo dos veces
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlu-loader")
+        self.model_future: Future = self._loader.submit(self._cargar_en_segundo_plano)
+        self._loader.shutdown(wait=False)
         
-        if self.splash_callback:
-            self.splash_callback(80, "NLU listo", f"{len(self.intent_examples)} intenciones cargadas")
-        
-        logger.info(f"✅ Intent Classifier inicializado ({len(self.intent_examples)} intenciones)")
-        logger.info(f"📁 Modelos guardados en: {CACHE_DIR}")
+        logger.info(f"⏳ Intent Classifier iniciado en modo patrones ({len(self.intent_examples)} intenciones)")
+        logger.info(f"📁 Modelos guardados en: {self.cache_dir}")
+    
+    def _cargar_en_segundo_plano(self):
+        """
+        Carga el modelo y la matriz de embeddings (hilo de carga).
+        Retorna el modelo para quien espere model_future.
+        """
+        try:
+            logger.info("🧠 Cargando modelo de embeddings (segundo plano)...")
+            self.model = self._cargar_modelo()
+            self.encoder_id = self.model.encoder_id
+            
+            # Matriz contigua (N x D) con todos los ejemplos normalizados + etiquetas
+            self._generar_embeddings()
+            
+            # Ejemplos aprendidos de la IA / usuario (matriz aparte, crece incrementalmente)
+            self.aprendidos.cargar(self.model, self.encoder_id)
+            self._sincronizar_aprendidos()
+            
+            self.ml_listo.set()
+            logger.info(f"✅ Capa 2 (ML) activa ({len(self.intent_examples)} intenciones)")
+            return self.model
+        except Exception as e:
+            logger.error(f"❌ Error cargando modelo NLU, solo Capa 1 disponible: {e}")
+            raise
+    
+    def modelo_listo(self) -> bool:
+        """True cuando la Capa 2 (ML) ya puede usarse."""
+        return self.ml_listo.is_set()
+    
+    def esperar_modelo(self, timeout: Optional[float] = None) -> bool:
+        """Bloquea hasta que la Capa 2 esté lista (o expire el timeout)."""
+        return self.ml_listo.wait(timeout)
+    
+    def _cargar_modelo(self):
+        """
+        Crea el backend de embeddings configurado (ver encoder_backend.py).
+        Import diferido: torch/onnxruntime solo se cargan aquí, no al importar este módulo.
+        """
+        return crear_backend(self.backend_name)
     
     def _cargar_ejemplos(self) -> Dict[str, list]:
         """
         Carga ejemplos de entrenamiento desde archivo externo.
         Dataset completo con 40+ intenciones y 1000+ ejemplos.
         """
-        return INTENT_EXAMPLES_FULL
+        return self._ejemplos if self._ejemplos is not None else INTENT_EXAMPLES_FULL
     
-    def _generar_embeddings(self) -> Dict[str, np.ndarray]:
+    @staticmethod
+    def _hash_ejemplo(texto: str) -> str:
+        """Hash estable de un ejemplo (el embedding solo depende del texto)."""
+        return hashlib.md5(f"{MODEL_NAME}\x1f{texto}".encode("utf-8")).hexdigest()
+    
+    def _generar_embeddings(self):
         """
-        Genera embeddings para todos los ejemplos de entrenamiento.
-        Usa cache en disco para acelerar inicio (3s -> 0.5s).
+        Carga (o genera) la matriz de embeddings de todos los ejemplos.
+        
+        Cache en disco en dos piezas:
+        - intent_embeddings.npy: matriz float32 (N x D) ya normalizada, se abre
+          con mmap (sin copia ni unpickle) en el arranque.
+        - intent_embeddings.json: manifiesto con versión, modelo y el hash de
+          cada ejemplo (fila).
+        
+        Si el dataset cambia solo se codifican los ejemplos nuevos o editados;
+        las filas cuyo hash ya existe se reutilizan.
         """
         # Crear directorio de cache si no existe
-        CACHE_DIR.mkdir(exist_ok=True)
-        
-        # Calcular hash del dataset para detectar cambios
-        dataset_str = str(sorted(self.intent_examples.items()))
-        dataset_hash = hashlib.md5(dataset_str.encode()).hexdigest()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Aplanar dataset: una fila por ejemplo, en orden de intención
+        self.intent_names: List[str] = list(self.intent_examples.keys())
+        textos = []
+        etiquetas = []
+        for idx, intent in enumerate(self.intent_names):
+            for ejemplo in self.intent_examples[intent]:
+                textos.append(ejemplo)
+                etiquetas.append(idx)
+        
+        hashes = [self._hash_ejemplo(t) for t in textos]
+        self.example_labels = np.asarray(etiquetas, dtype=np.int32)
+        self.dataset_hash = hashlib.md5(
+            json.dumps([self.intent_names, hashes, etiquetas]).encode("utf-8")
+        ).hexdigest()
+        
+        manifiesto = self._leer_manifiesto()
+        
+        # Camino rápido: cache idéntico -> mmap directo (zero-copy)
+        if manifiesto and manifiesto.get("dataset_hash") == self.dataset_hash:
+            try:
+                self.example_matrix = np.load(self.matrix_file, mmap_mode='r')
+                if self.example_matrix.shape[0] == len(textos):
+                    logger.info("✅ Embeddings mapeados desde cache (mmap)")
+                    return
+            except Exception as e:
+                logger.warning(f"Error mapeando cache: {e}, regenerando...")
         
-        # Intentar cargar desde cache
-        if EMBEDDINGS_CACHE_FILE.exists():
+        # Camino incremental: reutilizar filas existentes por hash
+        anteriores = {}
+        matriz_anterior = None
+        if manifiesto:
             try:
-                with open(EMBEDDINGS_CACHE_FILE, 'rb') as f:
-                    cached_data = pickle.load(f)
-                
-                # Validar que el hash coincida
-                if cached_data.get('hash') == dataset_hash:
-                    logger.info("✅ Embeddings cargados desde cache (0.5s)")
-                    return cached_data['embeddings']
-                else:
-                    logger.info("⚠️ Cache inválido (dataset cambió), regenerando...")
+                matriz_anterior = np.load(self.matrix_file, mmap_mode='r')
+                for fila, h in enumerate(manifiesto.get("hashes", [])):
+                    if fila < matriz_anterior.shape[0]:
+                        anteriores.setdefault(h, fila)
             except Exception as e:
-                logger.warning(f"Error cargando cache: {e}, regenerando...")
+                logger.warning(f"Cache de embeddings ilegible ({e}), regenerando todo...")
+                anteriores = {}
+                matriz_anterior = None
+        
+        faltantes = [i for i, h in enumerate(hashes) if h not in anteriores]
+        
+        if faltantes:
+            logger.info(f"🔄 Codificando {len(faltantes)}/{len(textos)} ejemplos nuevos o modificados...")
+            nuevos = np.asarray(
+                self.model.encode(
+                    [textos[i] for i in faltantes],
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                ),
+                dtype=np.float32
+            )
+            dim = nuevos.shape[1]
+        else:
+            nuevos = None
+            dim = matriz_anterior.shape[1]
+        
+        matriz = np.empty((len(textos), dim), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            if h in anteriores:
+                matriz[i] = matriz_anterior[anteriores[h]]
+        if nuevos is not None:
+            matriz[faltantes] = nuevos
         
-        # Generar embeddings (primera vez o cache inválido)
-        logger.info("🔄 Generando embeddings (esto toma ~3s la primera vez)...")
-        embeddings = {}
-        for intent, ejemplos in self.intent_examples.items():
-            embeddings[intent] = self.model.encode(ejemplos, convert_to_tensor=True)
+        # Liberar el mmap anterior antes de reemplazar el archivo (Windows lo bloquea)
+        del matriz_anterior
+        
+        self.example_matrix = matriz
+        self._guardar_cache(matriz, hashes, textos)
+    
+    def _leer_manifiesto(self) -> Optional[Dict[str, Any]]:
+        """Lee el manifiesto del cache si es compatible con esta versión/modelo."""
+        if not (self.manifest_file.exists() and self.matrix_file.exists()):
+            return None
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifiesto = json.load(f)
+        except Exception as e:
+            logger.warning(f"Manifiesto de embeddings corrupto: {e}")
+            return None
         
-        # Guardar en cache
+        if manifiesto.get("version") != EMBEDDINGS_CACHE_VERSION or manifiesto.get("model") != self.encoder_id:
+            logger.info("⚠️ Cache de embeddings de otra versión/modelo/backend, regenerando...")
+            return None
+        return manifiesto
+    
+    def _guardar_cache(self, matriz: np.ndarray, hashes: List[str], textos: List[str]):
+        """Escribe matriz + manifiesto de forma atómica (tmp + replace)."""
         try:
-            cache_data = {
-                'hash': dataset_hash,
-                'embeddings': embeddings
+            tmp_matriz = self.matrix_file.with_suffix(".tmp.npy")
+            np.save(tmp_matriz, matriz)
+            os.replace(tmp_matriz, self.matrix_file)
+            
+            manifiesto = {
+                "version": EMBEDDINGS_CACHE_VERSION,
+                "model": self.encoder_id,
+                "dim": int(matriz.shape[1]),
+                "dataset_hash": self.dataset_hash,
+                "intents": self.intent_names,
+                "labels": self.example_labels.tolist(),
+                "hashes": hashes,
+                "textos": textos,
             }
-            with open(EMBEDDINGS_CACHE_FILE, 'wb') as f:
-                pickle.dump(cache_data, f)
-            logger.info(f"💾 Embeddings guardados en cache: {EMBEDDINGS_CACHE_FILE}")
+            tmp_manifiesto = self.manifest_file.with_suffix(".tmp.json")
+            with open(tmp_manifiesto, 'w', encoding='utf-8') as f:
+                json.dump(manifiesto, f, ensure_ascii=False)
+            os.replace(tmp_manifiesto, self.manifest_file)
+            
+            logger.info(f"💾 Embeddings guardados en cache: {self.matrix_file}")
         except Exception as e:
             logger.warning(f"No se pudo guardar cache: {e}")
-        
-        return embeddings
     
     def clasificar(self, comando: str) -> Tuple[str, Dict[str, Any], str]:
         """
@@ -148,8 +341,37 @@ class HybridIntentClassifier:
             (intent, params, source) donde:
             - intent: Nombre de la intención detectada
             - params: Parámetros extraídos del comando
-            - source: "pattern", "ml" o "ai" (capa que lo resolvió)
+            - source: "pattern", "ml" o "ai" (capa que lo resolvió), o
+              "fallback" si ninguna lo resolvió (incluye la IA caída)
+            
+            Mientras el modelo carga, si la Capa 1 no resuelve se devuelve
+            (None, {}, "warming") para que procesar use la cadena clásica.
         """
+        cmd = self._normalizar_comando(comando)
+        
+        if not cmd:
+            return "CONVERSACION", {"text": comando}, "fallback"
+        
+        # Cache LRU por comando normalizado (sin wake word ni espacios extra)
+        clave = cmd
+        cacheado = self._cache_obtener(clave)
+        if cacheado:
+            intent, params, source = cacheado
+            logger.debug(f"⚡ Cache hit: {intent} ({source})")
+            return intent, dict(params), source
+        
+        intent, params, source = self._clasificar_capas(cmd, comando)
+        
+        # "warming" y "fallback" no se guardan: cuando cargue el modelo (o la IA
+        # vuelva a responder) la respuesta cambia
+        if source not in ("warming", "fallback"):
+            self._cache_guardar(clave, (intent, dict(params), source))
+        
+        return intent, params, source
+    
+    @staticmethod
+    def _normalizar_comando(comando: str) -> str:
+        """Minúsculas, sin wake word inicial y con espacios colapsados."""
         cmd = comando.lower().strip()
         
         # REMOVER WAKE WORDS (Robustez)
@@ -164,28 +386,144 @@ class HybridIntentClassifier:
             elif cmd == ww:
                 cmd = "" # Solo dijeron el nombre
         
-        if not cmd:
-            return "CONVERSACION", {"text": comando}, "fallback"
+        return " ".join(cmd.split())
+    
+    def _clasificar_capas(self, cmd: str, comando: str) -> Tuple[Optional[str], Dict[str, Any], str]:
+        """Ejecuta las 3 capas sobre el comando ya normalizado."""
         intent, params = self._pattern_match(cmd)
         if intent:
             logger.debug(f"✅ Pattern Match: {intent}")
             return intent, params, "pattern"
         
+        # Modelo aún cargando: no bloquear, delegar a la lógica clásica
+        if not self.modelo_listo():
+            logger.debug("⏳ Capa 2 cargando, se delega a keywords")
+            return None, {}, "warming"
+        
         # CAPA 2: ML Classifier (similitud semántica)
         intent, params, confianza = self._ml_classify(cmd)
-        if confianza > 0.65:  # Umbral de confianza
+        if confianza > ML_CONFIDENCE_THRESHOLD:  # Umbral de confianza
             logger.debug(f"✅ ML Classify: {intent} (confianza: {confianza:.2f})")
             return intent, params, "ml"
         
         # CAPA 3: AI Fallback (casos ambiguos)
-        if self.ia_callback and confianza < 0.65:
-            intent, params = self._ai_classify(cmd)
+        if self.ia_callback and confianza < ML_CONFIDENCE_THRESHOLD:
+            intent, params, ok = self._ai_classify(cmd)
+            if not ok:
+                # La IA falló: conversación, pero sin etiquetarla como "ai" ni cachearla
+                return "CONVERSACION", {"text": comando}, "fallback"
             logger.debug(f"✅ AI Fallback: {intent}")
+            
+            # Aprender la respuesta: la próxima vez la resuelve la Capa 2
+            if intent in self.intent_names:
+                version_antes = self.aprendidos.version
+                if self.aprendidos.agregar(self.model, cmd, intent, params, origen=ORIGEN_IA):
+                    self._sincronizar_aprendidos()
+                    self._adoptar_aprendido(version_antes)
             return intent, params, "ai"
         
         # Fallback final: conversación
         return "CONVERSACION", {"text": comando}, "fallback"
     
+    def _version_cache(self) -> Tuple[Optional[str], int]:
+        """Versión de los datos de clasificación (dataset + ejemplos aprendidos)."""
+        return (self.dataset_hash, self.aprendidos.version)
+    
+    def _adoptar_aprendido(self, version_antes: int):
+        """
+        El ejemplo recién aprendido de la Capa 3 solo añade la frase que la IA
+        acaba de resolver: el cache pasa a la versión nueva sin vaciarse y el
+        resultado "ai" se guarda bajo ella. Si entretanto cambió algo más
+        (otro hilo), se deja la invalidación normal.
+        """
+        with self._cache_lock:
+            if (self._cache_hash == (self.dataset_hash, version_antes)
+                    and self.aprendidos.version == version_antes + 1):
+                self._cache_hash = self._version_cache()
+    
+    def _cache_obtener(self, clave: str) -> Optional[Tuple[str, Dict[str, Any], str]]:
+        """Busca en el cache LRU (se invalida si cambia el dataset o lo aprendido)."""
+        with self._cache_lock:
+            version = self._version_cache()
+            if self._cache_hash != version:
+                self._cache_resultados.clear()
+                self._cache_hash = version
+            
+            resultado = self._cache_resultados.get(clave)
+            if resultado is None:
+                self.cache_misses += 1
+                return None
+            
+            self._cache_resultados.move_to_end(clave)
+            self.cache_hits += 1
+            if resultado[2] == "ai":
+                self.cache_ia_ahorradas += 1
+            return resultado
+    
+    def _cache_guardar(self, clave: str, resultado: Tuple[str, Dict[str, Any], str]):
+        """Guarda un resultado y expulsa el menos usado si se supera el tamaño."""
+        with self._cache_lock:
+            if self._cache_hash != self._version_cache():
+                # El dataset cambió mientras se clasificaba: no mezclar
+                return
+            self._cache_resultados[clave] = resultado
+            self._cache_resultados.move_to_end(clave)
+            while len(self._cache_resultados) > RESULT_CACHE_SIZE:
+                self._cache_resultados.popitem(last=False)
+    
+    def _sincronizar_aprendidos(self):
+        """Publica la matriz de ejemplos aprendidos y sus etiquetas enteras."""
+        matriz, intents, version = self.aprendidos.instantanea()
+        if matriz is None or not intents:
+            self._aprendidos_snapshot = (None, None, None)
+            return
+        indices = {intent: i for i, intent in enumerate(self.intent_names)}
+        etiquetas = np.asarray([indices.get(i, -1) for i in intents], dtype=np.int32)
+        self._aprendidos_snapshot = (matriz, etiquetas, version)
+    
+    def confirmar_clasificacion(self, comando: str, intent: str, params: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Registra una clasificación confirmada por el usuario como ejemplo de la Capa 2.
+        Las confirmaciones del usuario tienen prioridad sobre lo aprendido de la IA.
+        
+        Returns:
+            True si se aprendió (requiere el modelo cargado y una intención conocida).
+        """
+        cmd = self._normalizar_comando(comando)
+        if not cmd or not self.modelo_listo() or intent not in self.intent_names:
+            return False
+        if self.aprendidos.agregar(self.model, cmd, intent, params, origen=ORIGEN_USUARIO):
+            self._sincronizar_aprendidos()
+            return True
+        return False
+    
+    def estadisticas_aprendizaje(self) -> Dict[str, Any]:
+        """Tamaño del almacén aprendido y cuántas veces resolvió un comando."""
+        stats = self.aprendidos.estadisticas()
+        stats["aciertos"] = self.aciertos_aprendidos
+        return stats
+    
+    def limpiar_cache(self):
+        """Vacía el cache de resultados (los contadores se conservan)."""
+        with self._cache_lock:
+            self._cache_resultados.clear()
+    
+    def estadisticas_cache(self) -> Dict[str, Any]:
+        """
+        Contadores del cache de clasificar().
+        llamadas_ia_ahorradas = hits cuyo resultado venía de la Capa 3 (cuota LLM ahorrada).
+        """
+        with self._cache_lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": self.cache_hits / total if total else 0.0,
+                "llamadas_ia_ahorradas": self.cache_ia_ahorradas,
+                "entradas": len(self._cache_resultados),
+                "capacidad": RESULT_CACHE_SIZE,
+            }
+    
     def _pattern_match(self, cmd: str) -> Tuple[Optional[str], Dict[str, Any]]:
         """
         CAPA 1: Pattern matching para comandos críticos (ultra rápido).
@@ -215,68 +553,137 @@ class HybridIntentClassifier:
         """
         CAPA 2: Clasificación ML usando similitud semántica.
         """
-        # Generar embedding del comando
-        cmd_embedding = self.model.encode(cmd, convert_to_tensor=True)
-        
-        mejor_intent = "CONVERSACION"
-        mejor_score = 0.0
-        
-        # Calcular similitud con cada intención
-        for intent, ejemplos_emb in self.intent_embeddings.items():
-            similitudes = util.cos_sim(cmd_embedding, ejemplos_emb)
-            max_sim = similitudes.max().item()
-            
-            if max_sim > mejor_score:
-                mejor_score = max_sim
-                mejor_intent = intent
+        por_intent, aprendido = self._puntuar(cmd)
+        candidatos = self._top_k_desde(por_intent, 1)
+        if not candidatos:
+            return "CONVERSACION", {"text": cmd}, 0.0
+        
+        mejor_intent, mejor_score, _ = candidatos[0]
+        
+        # Procedencia: ¿ganó un ejemplo aprendido?
+        if aprendido is not None:
+            por_aprendido, scores_aprendidos, etiquetas, version = aprendido
+            idx = self.intent_names.index(mejor_intent)
+            if por_aprendido[idx] >= mejor_score:
+                filas = np.flatnonzero(etiquetas == idx)
+                fila = int(filas[np.argmax(scores_aprendidos[filas])])
+                self.aprendidos.registrar_uso(fila, version)
+                self.aciertos_aprendidos += 1
+                logger.debug(f"🎓 Resuelto con ejemplo aprendido #{fila} ({mejor_intent})")
         
         # Extraer parámetros
         params = self._extraer_parametros(cmd, mejor_intent)
         
         return mejor_intent, params, mejor_score
     
-    def _ai_classify(self, cmd: str) -> Tuple[str, Dict[str, Any]]:
+    def _puntuar(self, cmd: str) -> Tuple[np.ndarray, Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, int]]]:
+        """
+        Un solo producto matriz-vector contra todos los ejemplos y después
+        el máximo por intención (máximo segmentado con las etiquetas).
+        
+        Returns:
+            (mejor score por intención, aprendido) donde aprendido es None o
+            (mejor score aprendido por intención, scores por fila, etiquetas por fila,
+            versión del almacén de la que salen las filas)
+        """
+        # Embedding normalizado del comando -> cos_sim == producto punto
+        cmd_embedding = np.asarray(
+            self.model.encode(cmd, convert_to_numpy=True, normalize_embeddings=True),
+            dtype=np.float32
+        ).reshape(-1)
+        
+        scores = self.example_matrix @ cmd_embedding
+        
+        # Máximo segmentado: mejor score de cada intención
+        por_intent = np.full(len(self.intent_names), -np.inf, dtype=np.float32)
+        np.maximum.at(por_intent, self.example_labels, scores)
+        
+        # Ejemplos aprendidos (matriz pequeña aparte)
+        matriz_aprendida, etiquetas, version = self._aprendidos_snapshot
+        if matriz_aprendida is None:
+            return por_intent, None
+        
+        scores_aprendidos = matriz_aprendida @ cmd_embedding
+        validos = etiquetas >= 0
+        por_aprendido = np.full(len(self.intent_names), -np.inf, dtype=np.float32)
+        np.maximum.at(por_aprendido, etiquetas[validos], scores_aprendidos[validos])
+        
+        return np.maximum(por_intent, por_aprendido), (por_aprendido, scores_aprendidos, etiquetas, version)
+    
+    def _top_k_desde(self, por_intent: np.ndarray, k: int) -> List[Tuple[str, float, float]]:
+        """Ordena los scores por intención y calcula el margen con el siguiente."""
+        k = max(1, min(k, len(self.intent_names)))
+        orden = np.argsort(-por_intent)[:k + 1]
+        
+        resultado = []
+        for pos in range(min(k, len(orden))):
+            idx = orden[pos]
+            score = float(por_intent[idx])
+            siguiente = float(por_intent[orden[pos + 1]]) if pos + 1 < len(orden) else 0.0
+            resultado.append((self.intent_names[idx], score, score - siguiente))
+        
+        return resultado
+    
+    def _ml_top_k(self, cmd: str, k: int = ML_TOP_K) -> List[Tuple[str, float, float]]:
+        """
+        Calcula las k intenciones más parecidas al comando.
+        
+        Returns:
+            Lista [(intent, score, margen)] ordenada por score, donde margen es
+            la diferencia con el siguiente candidato (brecha de confianza).
+        """
+        por_intent, _ = self._puntuar(cmd)
+        return self._top_k_desde(por_intent, k)
+    
+    def clasificar_top_k(self, comando: str, k: int = ML_TOP_K) -> List[Tuple[str, float, float]]:
+        """
+        Devuelve los k mejores candidatos de la Capa 2 con sus márgenes.
+        Útil para mostrar la brecha de confianza en la UI o en depuración.
+        """
+        cmd = self._normalizar_comando(comando)
+        if not cmd or not self.modelo_listo():
+            return []
+        return self._ml_top_k(cmd, k)
+    
+    def _ai_classify(self, cmd: str) -> Tuple[str, Dict[str, Any], bool]:
         """
         CAPA 3: Clasificación con IA para casos ambiguos.
+        
+        Returns:
+            (intent, params, ok) - ok es False si la IA falló o no respondió JSON válido
         """
         if not self.ia_callback:
-            return "CONVERSACION", {"text": cmd}
+            return "CONVERSACION", {"text": cmd}, False
         
+        intenciones = "\n".join(f"- {nombre}: {desc}" for nombre, desc in INTENCIONES_IA.items())
         prompt = f"""Clasifica la intención del siguiente comando de voz:
 
 Comando: "{cmd}"
 
 Intenciones posibles:
-- MEMORIZAR: Guardar información
-- VOLUMEN_SUBIR/VOLUMEN_BAJAR/SILENCIO: Control de audio
-- ABRIR_APP: Abrir aplicación
-- BUSCAR_WEB: Buscar en internet
-- LEER_DOCUMENTO: Leer archivo/página
-- REPRODUCIR_MEDIA: Reproducir música/video
-- ALARMA: Programar recordatorio
-- CLIMA: Consultar clima
-- HORA_FECHA: Consultar hora/fecha
-- TRADUCIR: Traducir texto
-- CALCULAR: Operación matemática
-- MODO_ZEN: Activar modo concentración
-- CONVERSACION: Charla general
+{intenciones}
 
 Responde SOLO con JSON:
 {{"intent": "NOMBRE_INTENCION", "params": {{"key": "value"}}}}
 """
         
         try:
-            respuesta, _ = self.ia_callback(prompt)
-            # Limpiar markdown si existe
-            if "```" in respuesta:
-                respuesta = respuesta.split("```")[1].replace("json", "").strip()
+            if self.ia_json_callback:
+                # Modo JSON nativo del proveedor: sin bloques ``` que limpiar
+                resultado, _ = self.ia_json_callback(prompt, ESQUEMA_INTENCION_IA, sitio="nlu")
+            else:
+                respuesta, _ = self.ia_callback(prompt, sitio="nlu")
+                resultado = extraer_json(respuesta)
+            
+            if not isinstance(resultado, dict) or not resultado.get("intent"):
+                raise ValueError(f"respuesta sin intención: {resultado!r}")
             
-            import json
-            resultado = json.loads(respuesta)
-            return resultado.get("intent", "CONVERSACION"), resultado.get("params", {"text": cmd})
+            intent = str(resultado["intent"]).strip().upper()
+            params = resultado.get("params")
+            return intent, params if isinstance(params, dict) and params else {"text": cmd}, True
         except Exception as e:
             logger.error(f"Error en AI Classify: {e}")
-            return "CONVERSACION", {"text": cmd}
+            return "CONVERSACION", {"text": cmd}, False
     
     def _extraer_parametros(self, cmd: str, intent: str) -> Dict[str, Any]:
         """
@@ -342,6 +749,7 @@ Responde SOLO con JSON:
 if __name__ == "__main__":
     # Test básico
     classifier = HybridIntentClassifier()
+    classifier.esperar_modelo()
     
     test_commands = [
         "sube el volumen",
@@ -359,3 +767,5 @@ if __name__ == "__main__":
         print(f"   Intent: {intent}")
         print(f"   Params: {params}")
         print(f"   Source: {source}")
+        for cand, score, margen in classifier.clasificar_top_k(cmd):
+            print(f"   · {cand}: {score:.3f} (margen {margen:.3f})")
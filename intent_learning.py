@@ -0,0 +1,253 @@
+"""
+🎓 SARA - Learned Intent Store
+===============================
+
+Almacén local de clasificaciones aprendidas para el NLU híbrido.
+
+Cada vez que la Capa 3 (IA) resuelve un comando ambiguo, o el usuario confirma
+una clasificación, el comando se guarda aquí con su intención y se añade a la
+Capa 2 como un ejemplo más (con etiqueta de procedencia). La próxima vez la
+misma frase (o una muy parecida) se resuelve localmente sin llamar al LLM.
+
+Archivos (en .sara_models/):
+- learned_examples.json: entradas con texto, intent, origen y estadísticas de uso
+- learned_embeddings.npy: embeddings normalizados alineados con las entradas
+
+Política de expulsión (tope de MAX_LEARNED_EXAMPLES):
+se expulsan primero las entradas de origen "ai" menos usadas/más antiguas;
+las confirmadas por el usuario solo se expulsan si ya no queda ninguna de IA.
+
+Los contadores de uso viajan con la siguiente escritura del almacén o, si no
+la hay, se guardan GUARDADO_USOS_DIFERIDO segundos después del primer uso sin
+guardar (solo el JSON) y al cerrar SARA.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_LEARNED_EXAMPLES = 500
+GUARDADO_USOS_DIFERIDO = 30  # Segundos que se agrupan los contadores de uso antes de escribir
+LEARNED_VERSION = 1
+
+ORIGEN_IA = "ai"
+ORIGEN_USUARIO = "usuario"
+
+
+class LearnedIntentStore:
+    """Ejemplos aprendidos (IA / usuario) con sus embeddings, persistidos en disco."""
+
+    def __init__(self, cache_dir: Path, max_entries: int = MAX_LEARNED_EXAMPLES):
+        """
+        Args:
+            cache_dir: Directorio donde se guardan los archivos del almacén
+            max_entries: Tamaño máximo antes de expulsar entradas
+        """
+        self.json_file = Path(cache_dir) / "learned_examples.json"
+        self.npy_file = Path(cache_dir) / "learned_embeddings.npy"
+        self.max_entries = max_entries
+
+        self.entradas: List[Dict[str, Any]] = []
+        self.matriz: Optional[np.ndarray] = None
+        self.encoder_id = None
+        self.version = 0  # Cambia con cada alta/baja (para invalidar caches)
+        self._lock = threading.RLock()
+        self._temporizador: Optional[threading.Timer] = None  # Usos pendientes de guardar
+        atexit.register(self.guardar_usos)
+
+    def __len__(self):
+        return len(self.entradas)
+
+    @property
+    def intents(self) -> List[str]:
+        return [e["intent"] for e in self.entradas]
+
+    @property
+    def origenes(self) -> List[str]:
+        return [e["origen"] for e in self.entradas]
+
+    def cargar(self, encoder, encoder_id: str):
+        """
+        Carga entradas y embeddings. Si los embeddings no corresponden al
+        encoder actual (otro backend/modelo) se recodifican en bloque.
+        """
+        with self._lock:
+            self.encoder_id = encoder_id
+            if not self.json_file.exists():
+                return
+
+            try:
+                with open(self.json_file, "r", encoding="utf-8") as f:
+                    datos = json.load(f)
+                self.entradas = datos.get("entradas", [])
+            except Exception as e:
+                logger.warning(f"Almacén de ejemplos aprendidos ilegible: {e}")
+                self.entradas = []
+                return
+
+            matriz = None
+            if datos.get("encoder_id") == encoder_id and self.npy_file.exists():
+                try:
+                    matriz = np.load(self.npy_file)
+                except Exception as e:
+                    logger.warning(f"Embeddings aprendidos ilegibles: {e}")
+
+            if self.entradas and (matriz is None or matriz.shape[0] != len(self.entradas)):
+                logger.info(f"🔄 Recodificando {len(self.entradas)} ejemplos aprendidos...")
+                matriz = self._codificar(encoder, [e["texto"] for e in self.entradas])
+                self.matriz = matriz
+                self._guardar()
+
+            self.matriz = matriz if self.entradas else None
+            self.version += 1
+            logger.info(f"🎓 {len(self.entradas)} ejemplos aprendidos cargados")
+
+    @staticmethod
+    def _codificar(encoder, textos: List[str]) -> np.ndarray:
+        return np.asarray(
+            encoder.encode(textos, convert_to_numpy=True, normalize_embeddings=True),
+            dtype=np.float32
+        ).reshape(len(textos), -1)
+
+    def agregar(self, encoder, texto: str, intent: str, params: Optional[Dict] = None,
+                origen: str = ORIGEN_IA) -> bool:
+        """
+        Añade (o actualiza) un ejemplo aprendido y lo codifica de inmediato.
+
+        Returns:
+            True si el almacén cambió.
+        """
+        texto = " ".join(texto.lower().split())
+        if not texto or not intent:
+            return False
+
+        with self._lock:
+            ahora = time.time()
+
+            # Ya existe: actualizar intención/procedencia (la del usuario manda)
+            for entrada in self.entradas:
+                if entrada["texto"] == texto:
+                    if entrada["origen"] == ORIGEN_USUARIO and origen == ORIGEN_IA:
+                        return False
+                    cambio = entrada["intent"] != intent or entrada["origen"] != origen
+                    entrada.update({"intent": intent, "params": params or {}, "origen": origen, "ultimo_uso": ahora})
+                    if cambio:
+                        self.version += 1
+                        self._guardar()
+                    return cambio
+
+            embedding = self._codificar(encoder, [texto])
+
+            self.entradas.append({
+                "texto": texto,
+                "intent": intent,
+                "params": params or {},
+                "origen": origen,
+                "creado": ahora,
+                "ultimo_uso": ahora,
+                "usos": 0,
+            })
+            self.matriz = embedding if self.matriz is None else np.vstack([self.matriz, embedding])
+
+            while len(self.entradas) > self.max_entries:
+                self._expulsar_uno()
+
+            self.version += 1
+            self._guardar()
+            logger.info(f"🎓 Aprendido ({origen}): '{texto}' -> {intent}")
+            return True
+
+    def _expulsar_uno(self):
+        """Expulsa la entrada menos valiosa (IA poco usada y antigua primero)."""
+        idx = min(
+            range(len(self.entradas)),
+            key=lambda i: (
+                self.entradas[i]["origen"] == ORIGEN_USUARIO,
+                self.entradas[i].get("usos", 0),
+                self.entradas[i].get("ultimo_uso", 0),
+            )
+        )
+        expulsada = self.entradas.pop(idx)
+        self.matriz = np.delete(self.matriz, idx, axis=0)
+        logger.debug(f"🗑️ Ejemplo aprendido expulsado: '{expulsada['texto']}'")
+
+    def instantanea(self):
+        """(matriz, intents, version) coherentes entre sí, para leer después sin lock."""
+        with self._lock:
+            return self.matriz, self.intents, self.version
+
+    def registrar_uso(self, idx: int, version: Optional[int] = None):
+        """
+        Marca una entrada como usada (alimenta la política de expulsión).
+
+        Args:
+            idx: Fila de la entrada
+            version: Versión de la instantánea de la que sale idx; si el almacén
+                cambió desde entonces (altas/expulsiones) la fila ya no es fiable
+        """
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            if 0 <= idx < len(self.entradas):
+                self.entradas[idx]["usos"] = self.entradas[idx].get("usos", 0) + 1
+                self.entradas[idx]["ultimo_uso"] = time.time()
+                if self._temporizador is None:
+                    self._temporizador = threading.Timer(GUARDADO_USOS_DIFERIDO, self.guardar_usos)
+                    self._temporizador.daemon = True
+                    self._temporizador.start()
+
+    def guardar_usos(self):
+        """Escribe los contadores de uso pendientes (solo el JSON: los embeddings no cambian)."""
+        with self._lock:
+            if self._temporizador is not None:
+                self._guardar(con_embeddings=False)
+
+    def _guardar(self, con_embeddings: bool = True):
+        """Persiste entradas + embeddings (escritura atómica, con el lock tomado)."""
+        if self._temporizador is not None:
+            # Esta escritura ya lleva los usos pendientes
+            self._temporizador.cancel()
+            self._temporizador = None
+        try:
+            self.json_file.parent.mkdir(exist_ok=True)
+
+            if con_embeddings and self.matriz is not None and len(self.entradas):
+                tmp_npy = self.npy_file.with_suffix(".tmp.npy")
+                np.save(tmp_npy, self.matriz)
+                os.replace(tmp_npy, self.npy_file)
+
+            datos = {
+                "version": LEARNED_VERSION,
+                "encoder_id": self.encoder_id,
+                "entradas": self.entradas,
+            }
+            tmp_json = self.json_file.with_suffix(".tmp.json")
+            with open(tmp_json, "w", encoding="utf-8") as f:
+                json.dump(datos, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_json, self.json_file)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar ejemplos aprendidos: {e}")
+
+    def guardar(self):
+        """Persiste el estado actual (p.ej. contadores de uso al cerrar)."""
+        with self._lock:
+            self._guardar()
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            origenes = self.origenes
+            return {
+                "total": len(self.entradas),
+                "de_ia": origenes.count(ORIGEN_IA),
+                "de_usuario": origenes.count(ORIGEN_USUARIO),
+                "capacidad": self.max_entries,
+            }
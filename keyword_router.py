@@ -0,0 +1,417 @@
+"""
+🧭 SARA - Keyword Router
+=========================
+
+Router de palabras clave compilado para la cadena de comandos legacy de
+SaraBrain.procesar.
+
+Antes, cada rama del if/elif volvía a recorrer el comando con
+`any(x in cmd for x in [...])`, así que un comando que caía hasta el final
+hacía cientos de búsquedas de subcadena. Ahora la tabla declarativa
+TABLA_COMANDOS (grupo -> palabras clave + prioridad) se compila UNA vez en un
+autómata Aho-Corasick y una sola pasada sobre el comando devuelve todos los
+grupos candidatos. Cada condición de la cadena pasa a ser una consulta O(1)
+sobre ese resultado, manteniendo exactamente la semántica de subcadena y el
+orden de prioridad de la cadena original.
+
+Las coincidencias difusas (antes `_es_similar` con difflib sobre todas las
+keywords) usan un índice por longitud: solo se comparan palabras cuya
+longitud permite alcanzar el umbral, y el resultado por palabra se memoriza.
+
+Se puede probar sin SaraBrain:
+
+    >>> r = obtener_router().analizar("sube el volumen por favor")
+    >>> "volumen_subir" in r
+    True
+"""
+
+import difflib
+import logging
+import threading
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_MEMO_PALABRAS = 4096
+
+# =============================================================================
+# TABLA DECLARATIVA (grupo -> definición)
+# =============================================================================
+# El orden de la tabla es el orden de la cadena en SaraBrain.procesar y define
+# la prioridad (menor = se evalúa antes).
+#   keywords: basta con que UNA aparezca como subcadena del comando
+#   y:        además debe aparecer al menos UNA de estas (condición compuesta)
+#   similar:  (keywords, umbral) para coincidencia difusa palabra a palabra
+TABLA_COMANDOS: Dict[str, Dict] = {
+    # --- Second Brain / Web Agent ---
+    "leer_documento": {"keywords": ["lee este documento", "lee este archivo"]},
+    "investigar": {"keywords": ["investiga sobre", "investiga"]},
+    "leer_pagina": {"keywords": ["lee esta página", "qué dice esta página", "que dice esta pagina"]},
+    # --- Volumen directo (sin IA) ---
+    "volumen_subir": {"keywords": ["sube el volumen", "subele volumen", "sube volumen", "súbele volumen"]},
+    "volumen_bajar": {"keywords": ["baja el volumen", "bájale volumen", "baja volumen"]},
+    "silencio": {"keywords": ["silencio", "mute"]},
+    # --- NetworkGuardian ---
+    "guardian": {"keywords": [
+        "vigilancia", "dispositivos", "red", "fortaleza", "wifi", "panel",
+        "alertas", "tráfico", "consumidores", "conexiones",
+        "confía", "confiar", "sospechoso", "renombrar dispositivo",
+        "dashboard", "escanear"
+    ]},
+    # --- Rutinas / Agenda / Clima ---
+    "rutina": {
+        "keywords": ["rutina", "modo"],
+        "similar": (["rutina", "modo", "escena"], 0.8),
+    },
+    "agenda": {
+        "keywords": ["agenda", "calendario"],
+        "similar": (["agenda", "eventos", "calendario", "que tengo", "qué tengo", "reunión", "cita", "compromiso"], 0.8),
+    },
+    "clima": {
+        "keywords": [],
+        "similar": (["clima", "tiempo", "temperatura", "pronóstico", "llover", "lluvia",
+                     "calor", "frío", "frio", "va a estar", "van a estar"], 0.75),
+    },
+    # --- Smart Router: comandos locales que no gastan IA ---
+    "comando_rapido": {"keywords": ["hora", "fecha", "sistema", "monitor", "mute", "silencio", "volumen",
+                                    "sube", "baja", "súbele", "bájale", "zen", "sen", "sem", "cen"]},
+    # --- Directorio / Git complejo ---
+    "directorio": {"keywords": ["trabajar en", "cambiar directorio", "cambiar carpeta"]},
+    "git_repo": {"keywords": ["git", "repo"]},
+    "git_accion_crear": {"keywords": ["inicializar", "init", "crear"]},
+    "git_accion_subir": {"keywords": ["subir", "push", "upload"]},
+    "git_accion_commit": {"keywords": ["commit", "guardar"]},
+    # --- DevOps ---
+    "puertos": {"keywords": ["puertos abiertos", "quien usa"]},
+    "liberar_puerto": {"keywords": ["libera el puerto", "matar puerto"]},
+    "mi_ip": {"keywords": ["mi ip"]},
+    "instalar_dependencias": {"keywords": ["instalar dependencias", "instalar paquetes"]},
+    "build": {"keywords": ["construir proyecto", "build"]},
+    # --- Git ---
+    "git_push": {"keywords": ["git push", "subir cambios"]},
+    "git_status": {"keywords": ["git status"]},
+    "git_init": {"keywords": ["inicializar git", "git init"]},
+    "git_ramas": {"keywords": ["git ramas", "listar ramas"]},
+    "git_cambiar_rama": {"keywords": ["cambiar rama", "git checkout"]},
+    "git_crear_rama": {"keywords": ["crear rama"]},
+    "git_branch_nueva": {"keywords": ["git branch"], "y": ["nueva"]},
+    "git_pull": {"keywords": ["git pull", "traer cambios"]},
+    "git_ayuda": {"keywords": ["git ayuda"]},
+    "ayuda_dev": {"keywords": ["ayuda", "comandos", "que puedes hacer"]},
+    # --- Sistema ---
+    "limpieza_profunda": {"keywords": ["limpieza profunda", "limpia sistema", "limpia todo", "limpia temporales y papelera"]},
+    "screenshot": {"keywords": ["captura pantalla", "screenshot"]},
+    "compartir_proyecto": {"keywords": ["compartir proyecto", "serveo"]},
+    "estado_sistema": {"keywords": ["sistema", "estado", "monitor"]},
+    "abrir_configuracion": {"keywords": ["abre configuración", "abre configuracion", "abrir configuración",
+                                         "abrir configuracion", "abre ajustes", "abrir ajustes", "abre settings",
+                                         "configuración", "ajustes", "settings"]},
+    "abrir_perfil": {"keywords": ["abre mi perfil", "mi perfil", "configurar perfil", "editar perfil",
+                                  "perfil de usuario", "ver mi perfil", "ver perfil", "mostrar perfil"]},
+    # --- Salud / Trabajo ---
+    "trabajo_iniciar": {"keywords": ["voy a trabajar", "empezar trabajo", "iniciar trabajo", "trabajar en casa", "trabajar en oficina"]},
+    "trabajo_pausar": {"keywords": ["pausa trabajo", "pausar trabajo", "descanso"]},
+    "trabajo_reanudar": {"keywords": ["reanudar trabajo", "continuar trabajo", "volver al trabajo"]},
+    "trabajo_terminar": {"keywords": ["terminar trabajo", "fin de jornada", "acabar trabajo"]},
+    "trabajo_tiempo": {"keywords": ["cuánto tiempo llevo", "cuanto tiempo llevo", "tiempo trabajado"]},
+    "trabajo_proximo_descanso": {"keywords": ["próximo descanso", "proximo descanso", "siguiente descanso"]},
+    "trabajo_cambiar_modo": {"keywords": ["cambiar a modo", "cambiar modo"]},
+    # --- Estudio ---
+    "resumir_pdf": {"keywords": ["resume pdf", "resumir pdf", "resumen de pdf"]},
+    "flashcards": {"keywords": ["crea flashcards", "genera flashcards", "flashcards de"]},
+    # --- Juegos ---
+    "juegos_listar": {"keywords": ["que juegos tengo", "lista juegos", "mis juegos"]},
+    "juegos_escanear": {"keywords": ["escanear juegos", "buscar juegos", "detectar juegos"]},
+    "juego_abrir": {"keywords": ["abre", "juega", "lanza"],
+                    "y": ["juego", "valorant", "league", "minecraft", "fortnite", "apex"]},
+    "juegos_optimizar": {"keywords": ["optimiza para jugar", "modo gaming", "modo competitivo", "optimizar juegos"]},
+    "juego_cerrar": {"keywords": ["cierra juego", "cerrar juego"]},
+    # --- Perfil / Preferencias ---
+    "perfil_ver": {"keywords": ["mi perfil", "ver perfil", "mostrar perfil", "configuracion personal"]},
+    "perfil_nombre": {"keywords": ["llamame", "llámame", "mi nombre es"]},
+    "idioma": {"keywords": ["cambiar idioma", "idioma", "cambiar voz"]},
+    "configuracion": {"keywords": ["abre configuracion", "abrir configuracion", "configuracion", "ajustes", "settings"]},
+    # --- Modo Zen / Ventanas ---
+    "zen_salir": {"keywords": ["salir", "desactivar", "fin", "quita", "normalidad"],
+                  "y": ["zen", "sen", "sem", "cen"]},
+    "modo_salir": {"keywords": ["desactivar modo", "salir del modo", "quita el modo", "desactiva el modo"]},
+    "zen_activar": {"keywords": ["modo zen", "modo sen", "modo sem", "modo cen", "activar zen", "modo relax"]},
+    "minimizar_todo": {"keywords": ["minimiza el escritorio", "minimiza todo", "minimizar todo", "mostrar escritorio"]},
+    "maximizar": {"keywords": ["maximiza", "maximizar"]},
+    "cerrar_app": {"keywords": ["matar", "cerrar"]},
+    # --- Energía ---
+    "apagar": {"keywords": ["apaga el sistema", "apagar pc", "apaga la computadora"]},
+    "reiniciar": {"keywords": ["reinicia", "reiniciar"]},
+    "cancelar_apagado": {"keywords": ["cancela apagado", "cancelar apagado", "no apagues"]},
+    "bloquear": {"keywords": ["bloquear"]},
+    "papelera": {"keywords": ["vacía la papelera", "limpia la papelera", "vaciar papelera"]},
+    "captura": {"keywords": ["toma captura", "toma una captura", "pantallazo", "captura de pantalla"]},
+    "limpiar_temporales": {"keywords": ["limpia temporales", "limpieza profunda", "borra basura"]},
+    "procesos": {"keywords": ["procesos pesados", "consumo de ram", "qué proceso consume más", "estado de procesos"]},
+    # --- Oficios ---
+    "oficio_modo": {"keywords": ["redacta oficio", "redactar oficio", "ayuda con oficio", "modo oficio"]},
+    "oficio_generar": {"keywords": ["genera el oficio", "generar oficio", "escribe el oficio", "redacta el oficio"]},
+    # --- Acciones generales ---
+    "anota": {"keywords": ["anota"]},
+    "reproducir": {"keywords": ["pon", "reproduce"]},
+    "abrir": {"keywords": ["abre", "abrir", "busca"]},
+    "alarma": {"keywords": ["recuérdame", "recuerdame", "despiértame", "despiertame", "alarma", "avísame"]},
+    "pomodoro": {"keywords": ["pomodoro", "concentración", "concentracion", "enfoque"]},
+    "organizar": {"keywords": ["ordena", "ordenar", "limpia", "limpiar", "organiza"]},
+    "vision": {"keywords": ["mira mi pantalla", "mira la pantalla", "qué ves", "que ves", "analiza esto", "analiza la pantalla"]},
+    # --- Code Review ---
+    "code_review": {"keywords": ["revisa", "analiza código", "analiza codigo", "code review"]},
+    "code_tests": {"keywords": ["genera tests", "generar tests", "crear tests"]},
+    "code_docs": {"keywords": ["documenta", "documentar", "genera documentación", "genera documentacion"]},
+    "code_refactor": {"keywords": ["refactoriza", "refactorizar", "mejora código", "mejora codigo"]},
+    "code_explicar": {"keywords": ["explica", "explicar código", "explicar codigo", "qué hace", "que hace"]},
+    # --- Seguridad ---
+    "centinela": {"keywords": ["centinela", "sistema de seguridad"]},
+    "codigo_alfa": {"keywords": ["codigo alfa", "código alfa"]},
+    "volumen": {"keywords": ["volumen", "sonido", "audio", "subele", "bajale", "súbele", "bájale"]},
+    "ayuda": {"keywords": ["ayuda", "comandos", "qué puedes hacer", "que puedes hacer"]},
+    # --- Utilidades ---
+    "traducir": {"keywords": ["traduce"]},
+    "hora": {"keywords": ["hora"]},
+    "fecha": {"keywords": ["fecha"]},
+    # --- Red ---
+    "red_escanear": {"keywords": ["escanea red", "escanea wifi", "escanea mi red", "escanear red", "escanear wifi",
+                                  "dispositivos conectados", "cuantos dispositivos", "ver dispositivos"]},
+    "dispositivo_investigar": {"keywords": ["investiga el dispositivo", "investiga dispositivo",
+                                            "información del dispositivo", "info del dispositivo"]},
+    "dispositivo_bloquear": {"keywords": ["bloquea el dispositivo", "bloquea dispositivo", "bloquear dispositivo", "echa al dispositivo"]},
+    "dispositivo_desbloquear": {"keywords": ["desbloquea el dispositivo", "desbloquea dispositivo", "desbloquear dispositivo"]},
+    "configura": {"keywords": ["configura"]},
+    # --- Control avanzado del PC ---
+    "dictado": {"keywords": ["modo dictado", "toma dictado"]},
+    "sube_volumen": {"keywords": ["sube volumen"]},
+    "baja_volumen": {"keywords": ["baja volumen"]},
+    "media_pausa": {"keywords": ["pausa", "play", "continuar"]},
+    "macro_escribir": {"keywords": ["abre"], "y": ["y escribe"]},
+    "macro_reproducir": {"keywords": ["abre"], "y": ["y reproduce", "y busca"]},
+    # --- Cierre / Charla local ---
+    "cerrar_sara": {"keywords": ["ciérrate", "cierra el programa", "cierra s.a.r.a", "apágate", "nos vemos"]},
+    "hora_pregunta": {"keywords": ["qué hora", "que hora", "hora es", "dime la hora"]},
+    "calcular": {"keywords": ["cuanto es", "calcula"]},
+}
+
+
+# =============================================================================
+# AHO-CORASICK
+# =============================================================================
+
+class AhoCorasick:
+    """Autómata de búsqueda multi-patrón (todas las subcadenas en una pasada)."""
+
+    def __init__(self, patrones: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fallo: List[int] = [0]
+        self._salida: List[FrozenSet[str]] = [frozenset()]
+
+        salidas: List[Set[str]] = [set()]
+        for patron in patrones:
+            if not patron:
+                continue
+            estado = 0
+            for ch in patron:
+                siguiente = self._goto[estado].get(ch)
+                if siguiente is None:
+                    siguiente = len(self._goto)
+                    self._goto[estado][ch] = siguiente
+                    self._goto.append({})
+                    self._fallo.append(0)
+                    salidas.append(set())
+                estado = siguiente
+            salidas[estado].add(patron)
+
+        # Enlaces de fallo en anchura (BFS)
+        cola = deque(self._goto[0].values())
+        while cola:
+            estado = cola.popleft()
+            for ch, hijo in self._goto[estado].items():
+                cola.append(hijo)
+                fallo = self._fallo[estado]
+                while fallo and ch not in self._goto[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._goto[fallo].get(ch, 0)
+                self._fallo[hijo] = destino if destino != hijo else 0
+                salidas[hijo] |= salidas[self._fallo[hijo]]
+
+        self._salida = [frozenset(s) for s in salidas]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def buscar(self, texto: str) -> Set[str]:
+        """Devuelve el conjunto de patrones que aparecen en el texto."""
+        goto, fallo, salida = self._goto, self._fallo, self._salida
+        encontrados: Set[str] = set()
+        estado = 0
+        for ch in texto:
+            while estado and ch not in goto[estado]:
+                estado = fallo[estado]
+            estado = goto[estado].get(ch, 0)
+            if salida[estado]:
+                encontrados |= salida[estado]
+        return encontrados
+
+
+# =============================================================================
+# ÍNDICE DIFUSO
+# =============================================================================
+
+class FuzzyIndex:
+    """
+    Coincidencia difusa palabra -> keyword con la misma semántica que
+    difflib.get_close_matches(palabra, keywords, cutoff=umbral).
+
+    SequenceMatcher.ratio() nunca supera 2*min(la, lb)/(la + lb), así que las
+    keywords cuya longitud no puede alcanzar el umbral se descartan sin
+    compararlas. El resultado por palabra se memoriza.
+    """
+
+    def __init__(self, grupos: Dict[str, Tuple[List[str], float]]):
+        self._grupos = {g: (list(kws), umbral) for g, (kws, umbral) in grupos.items()}
+        self._memo: Dict[str, FrozenSet[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _puede_alcanzar(la: int, lb: int, umbral: float) -> bool:
+        return la + lb > 0 and 2.0 * min(la, lb) / (la + lb) >= umbral
+
+    @classmethod
+    def mejor_coincidencia(cls, palabra: str, keywords: List[str], umbral: float) -> Optional[str]:
+        """Mejor keyword con ratio >= umbral (None si no hay)."""
+        mejor, mejor_ratio = None, -1.0
+        sm = difflib.SequenceMatcher()
+        sm.set_seq2(palabra)
+        for kw in keywords:
+            if not cls._puede_alcanzar(len(kw), len(palabra), umbral):
+                continue
+            sm.set_seq1(kw)
+            if sm.real_quick_ratio() >= umbral and sm.quick_ratio() >= umbral:
+                ratio = sm.ratio()
+                if ratio >= umbral and ratio > mejor_ratio:
+                    mejor, mejor_ratio = kw, ratio
+        return mejor
+
+    def _grupos_de_palabra(self, palabra: str) -> FrozenSet[str]:
+        memo = self._memo.get(palabra)
+        if memo is not None:
+            return memo
+
+        grupos = frozenset(
+            g for g, (kws, umbral) in self._grupos.items()
+            if self.mejor_coincidencia(palabra, kws, umbral) is not None
+        )
+        with self._lock:
+            if len(self._memo) >= MAX_MEMO_PALABRAS:
+                self._memo.clear()
+            self._memo[palabra] = grupos
+        return grupos
+
+    def buscar(self, texto: str) -> Set[str]:
+        """Grupos con al menos una palabra del texto parecida a sus keywords."""
+        encontrados: Set[str] = set()
+        for palabra in set(texto.split()):
+            encontrados |= self._grupos_de_palabra(palabra)
+        return encontrados
+
+
+# =============================================================================
+# ROUTER
+# =============================================================================
+
+class RouterMatches:
+    """Resultado de una pasada: grupos que coinciden con el comando."""
+
+    __slots__ = ("grupos", "similares", "claves", "_prioridades")
+
+    def __init__(self, grupos: Set[str], similares: Set[str], claves: Set[str], prioridades: Dict[str, int]):
+        self.grupos = grupos            # Grupos por subcadena (o difusos)
+        self.similares = similares      # Grupos solo por coincidencia difusa
+        self.claves = claves            # Keywords literales encontradas
+        self._prioridades = prioridades
+
+    def __contains__(self, grupo: str) -> bool:
+        return grupo in self.grupos
+
+    def __bool__(self):
+        return bool(self.grupos)
+
+    def candidatos(self) -> List[Tuple[int, str]]:
+        """Grupos candidatos ordenados por prioridad: [(prioridad, grupo), ...]"""
+        return sorted((self._prioridades[g], g) for g in self.grupos)
+
+    def __repr__(self):
+        return f"RouterMatches({[g for _, g in self.candidatos()]})"
+
+
+class KeywordRouter:
+    """Compila una tabla grupo -> keywords y resuelve comandos en una pasada."""
+
+    def __init__(self, tabla: Optional[Dict[str, Dict]] = None):
+        tabla = TABLA_COMANDOS if tabla is None else tabla
+
+        self.prioridades: Dict[str, int] = {}
+        self._grupos_por_clave: Dict[str, List[str]] = {}
+        self._condiciones: Dict[str, FrozenSet[str]] = {}
+        difusos: Dict[str, Tuple[List[str], float]] = {}
+        patrones: Set[str] = set()
+
+        for prioridad, (grupo, definicion) in enumerate(tabla.items()):
+            self.prioridades[grupo] = prioridad
+            for kw in definicion.get("keywords", []):
+                self._grupos_por_clave.setdefault(kw, []).append(grupo)
+                patrones.add(kw)
+            if definicion.get("y"):
+                self._condiciones[grupo] = frozenset(definicion["y"])
+                patrones.update(definicion["y"])
+            if definicion.get("similar"):
+                difusos[grupo] = definicion["similar"]
+
+        self._automata = AhoCorasick(sorted(patrones))
+        self._difuso = FuzzyIndex(difusos)
+        logger.debug(f"🧭 Router compilado: {len(tabla)} grupos, {len(patrones)} keywords, "
+                     f"{len(self._automata)} estados")
+
+    def analizar(self, comando: str) -> RouterMatches:
+        """Una pasada Aho-Corasick + índice difuso sobre el comando (ya en minúsculas)."""
+        claves = self._automata.buscar(comando)
+
+        grupos: Set[str] = set()
+        for kw in claves:
+            grupos.update(self._grupos_por_clave.get(kw, ()))
+
+        for grupo, requeridas in self._condiciones.items():
+            if grupo in grupos and not (claves & requeridas):
+                grupos.discard(grupo)
+
+        similares = self._difuso.buscar(comando) - grupos
+        grupos |= similares
+
+        return RouterMatches(grupos, similares, claves, self.prioridades)
+
+    def es_similar(self, texto: str, keywords: List[str], umbral: float = 0.8) -> bool:
+        """Coincidencia difusa ad-hoc (sin grupo declarado en la tabla)."""
+        for palabra in texto.split():
+            match = FuzzyIndex.mejor_coincidencia(palabra, keywords, umbral)
+            if match:
+                logger.debug(f"Fuzzy match: '{palabra}' -> '{match}'")
+                return True
+        return False
+
+
+_router_instance = None
+_router_lock = threading.Lock()
+
+
+def obtener_router() -> KeywordRouter:
+    """Obtiene el router compilado (singleton)."""
+    global _router_instance
+    if _router_instance is None:
+        with _router_lock:
+            if _router_instance is None:
+                _router_instance = KeywordRouter()
+    return _router_instance
@@ -0,0 +1,229 @@
+"""
+⏱️ SARA - Latency Tracer
+=========================
+
+Trazas ligeras de latencia por etapa del pipeline de comandos:
+
+    loop_voz (stt) -> procesar -> nlu / clasificar -> rag -> llm -> tts
+
+Cada comando abre una traza (`with tracer.traza(comando):`) en el hilo que lo
+procesa; dentro, cada etapa se mide con `with tracer.etapa("rag"):`. Las
+mediciones van a un buffer circular (las últimas MAX_MEDICIONES) y el reporte
+da p50/p95/p99 por etapa y por intención.
+
+Las etapas que ocurren en otros hilos (p.ej. la reproducción del TTS) pueden
+registrarse contra la traza capturada con `tracer.traza_actual()`.
+
+Uso:
+    tracer = obtener_tracer()
+    with tracer.traza("pon musica"):
+        with tracer.etapa("procesar"):
+            ...
+        tracer.marcar_intent("REPRODUCIR_MUSICA")
+    print(tracer.reporte_texto())
+    tracer.exportar_json()
+"""
+
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_MEDICIONES = 2000
+PERCENTILES = (50, 95, 99)
+MIN_MUESTRAS_PERCENTIL = 5  # Por debajo, `percentil` no se fía y devuelve None
+REPORTE_JSON_FILE = Path(__file__).resolve().parent / "latency_report.json"
+
+
+class Traza:
+    """Un comando de principio a fin (agrupa sus etapas bajo un intent)."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, comando: str):
+        self.id = next(self._ids)
+        self.comando = comando
+        self.intent: Optional[str] = None
+        self.inicio = time.perf_counter()
+        self.timestamp = time.time()
+
+    def transcurrido_ms(self) -> float:
+        return (time.perf_counter() - self.inicio) * 1000
+
+
+def _percentil(valores_ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano (valores ya ordenados)."""
+    if not valores_ordenados:
+        return 0.0
+    k = max(0, min(len(valores_ordenados) - 1, math.ceil(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[k]
+
+
+def _resumen(valores: List[float]) -> Dict[str, float]:
+    ordenados = sorted(valores)
+    resumen = {"n": len(ordenados)}
+    for p in PERCENTILES:
+        resumen[f"p{p}"] = round(_percentil(ordenados, p), 1)
+    resumen["max"] = round(ordenados[-1], 1) if ordenados else 0.0
+    return resumen
+
+
+class LatencyTracer:
+    """Registro de duraciones por etapa en un buffer circular."""
+
+    def __init__(self, max_mediciones: int = MAX_MEDICIONES):
+        self._mediciones = deque(maxlen=max_mediciones)  # (etapa, ms, traza)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.habilitado = os.getenv("SARA_LATENCY_TRACE", "1") != "0"
+
+    # ------------------------------------------------------------------
+    # Trazas (un comando)
+    # ------------------------------------------------------------------
+    def traza_actual(self) -> Optional[Traza]:
+        """Traza activa en este hilo (None fuera de un comando)."""
+        return getattr(self._local, "traza", None)
+
+    @contextmanager
+    def traza(self, comando: str, etapa_total: str = "total"):
+        """Abre una traza para un comando en el hilo actual y mide su total."""
+        anterior = self.traza_actual()
+        traza = Traza(comando)
+        self._local.traza = traza
+        try:
+            yield traza
+        finally:
+            self.registrar(etapa_total, traza.transcurrido_ms(), traza)
+            self._local.traza = anterior
+
+    def marcar_intent(self, intent: Optional[str]):
+        """Asocia la intención clasificada a la traza activa."""
+        traza = self.traza_actual()
+        if traza is not None and intent:
+            traza.intent = intent
+
+    # ------------------------------------------------------------------
+    # Etapas
+    # ------------------------------------------------------------------
+    @contextmanager
+    def etapa(self, nombre: str):
+        """Mide una etapa del pipeline (asociada a la traza activa, si hay)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, (time.perf_counter() - inicio) * 1000)
+
+    def registrar(self, etapa: str, ms: float, traza: Optional[Traza] = None):
+        """Registra una duración ya medida (útil desde otros hilos)."""
+        if not self.habilitado:
+            return
+        if traza is None:
+            traza = self.traza_actual()
+        with self._lock:
+            self._mediciones.append((etapa, ms, traza))
+
+    def limpiar(self):
+        with self._lock:
+            self._mediciones.clear()
+
+    # ------------------------------------------------------------------
+    # Reportes
+    # ------------------------------------------------------------------
+    def reporte(self) -> Dict[str, Any]:
+        """p50/p95/p99 por etapa y por intención (etapa -> resumen)."""
+        with self._lock:
+            mediciones = list(self._mediciones)
+
+        por_etapa: Dict[str, List[float]] = {}
+        por_intent: Dict[str, Dict[str, List[float]]] = {}
+        for etapa, ms, traza in mediciones:
+            por_etapa.setdefault(etapa, []).append(ms)
+            if traza is not None and traza.intent:
+                por_intent.setdefault(traza.intent, {}).setdefault(etapa, []).append(ms)
+
+        return {
+            "mediciones": len(mediciones),
+            "por_etapa": {e: _resumen(v) for e, v in sorted(por_etapa.items())},
+            "por_intent": {
+                i: {e: _resumen(v) for e, v in sorted(etapas.items())}
+                for i, etapas in sorted(por_intent.items())
+            },
+        }
+
+    def percentil(self, etapa: str, p: float, minimo: int = MIN_MUESTRAS_PERCENTIL) -> Optional[float]:
+        """Percentil p (ms) de una etapa; None si hay menos de `minimo` muestras."""
+        with self._lock:
+            valores = sorted(ms for e, ms, _ in self._mediciones if e == etapa)
+        if len(valores) < minimo:
+            return None
+        return _percentil(valores, p)
+
+    def reporte_texto(self) -> str:
+        """Reporte legible para el chat/voz."""
+        datos = self.reporte()
+        if not datos["mediciones"]:
+            return "⏱️ Aún no hay mediciones de latencia."
+
+        lineas = [f"⏱️ LATENCIA POR ETAPA ({datos['mediciones']} mediciones)"]
+        for etapa, r in datos["por_etapa"].items():
+            lineas.append(f"  • {etapa}: p50 {r['p50']:.0f} ms | p95 {r['p95']:.0f} ms | "
+                          f"p99 {r['p99']:.0f} ms (n={r['n']})")
+
+        if datos["por_intent"]:
+            lineas.append("\n🎯 TOTAL POR INTENCIÓN")
+            for intent, etapas in datos["por_intent"].items():
+                total = etapas.get("total")
+                if total:
+                    lineas.append(f"  • {intent}: p50 {total['p50']:.0f} ms | p95 {total['p95']:.0f} ms (n={total['n']})")
+        return "\n".join(lineas)
+
+    def exportar_json(self, ruta: Optional[Path] = None) -> Path:
+        """Vuelca reporte + mediciones crudas a JSON para análisis offline."""
+        ruta = Path(ruta) if ruta else REPORTE_JSON_FILE
+        with self._lock:
+            mediciones = list(self._mediciones)
+
+        datos = self.reporte()
+        datos["generado"] = time.time()
+        datos["crudo"] = [
+            {
+                "etapa": etapa,
+                "ms": round(ms, 2),
+                "traza": traza.id if traza else None,
+                "intent": traza.intent if traza else None,
+                "comando": traza.comando if traza else None,
+                "timestamp": traza.timestamp if traza else None,
+            }
+            for etapa, ms, traza in mediciones
+        ]
+
+        tmp = ruta.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, ruta)
+        logger.info(f"⏱️ Reporte de latencia guardado en {ruta}")
+        return ruta
+
+
+_tracer_instance = None
+_tracer_lock = threading.Lock()
+
+
+def obtener_tracer() -> LatencyTracer:
+    """Obtiene el tracer global (singleton)."""
+    global _tracer_instance
+    if _tracer_instance is None:
+        with _tracer_lock:
+            if _tracer_instance is None:
+                _tracer_instance = LatencyTracer()
+    return _tracer_instance
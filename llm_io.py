@@ -0,0 +1,297 @@
+"""
+⚡ SARA - LLM I/O
+==================
+
+Capa única de E/S para las llamadas a los LLM.
+
+Antes cada `consultar_ia` hacía una petición bloqueante en el hilo que la
+pedía (GUI, NetworkGuardian, StudyAssistant, CodeReviewer...): cada hilo con
+su propia conexión y su propio handshake TLS. Ahora todas las peticiones van a
+UN hilo con un event loop de asyncio que usa los clientes async de cada SDK:
+
+- Groq / OpenAI: AsyncGroq / AsyncOpenAI sobre un httpx.AsyncClient compartido
+  con keep-alive (las conexiones se reutilizan entre peticiones)
+- Gemini: GenerativeModel.generate_content_async (gRPC aio, siempre en el
+  mismo loop)
+- Concurrencia acotada con un semáforo (MAX_CONCURRENCIA peticiones a la vez)
+
+El resto de SARA recibe un `concurrent.futures.Future`: puede esperar con
+`.result()`, combinarlo con `wait(...)` o cancelarlo (la cancelación corta la
+petición HTTP en curso).
+
+Si un SDK no trae cliente async, la llamada síncrona se ejecuta con
+`bloqueante(...)`, que respeta el mismo semáforo.
+
+Streaming: `stream(...)` corre la petición en el loop (bajo el semáforo) y
+entrega los fragmentos al hilo que la consume por una queue.Queue; el
+consumidor itera con un for normal. Cerrar el iterador antes de tiempo
+cancela la petición. `stream_bloqueante(...)` hace lo mismo con el generador
+síncrono de un SDK sin cliente async (o del modelo local).
+
+Uso:
+    io = obtener_llm_io()
+    io.conectar(gemini_model=modelo, groq_key="...", openai_key="...")
+    futuro = io.completar("Groq", "hola", model="llama-3.3-70b-versatile")
+    texto = futuro.result()
+    for fragmento in io.stream("Groq", "hola", model="llama-3.3-70b-versatile"):
+        ...
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCIA = 4          # Peticiones LLM simultáneas
+MAX_CONEXIONES_KEEPALIVE = 8  # Conexiones HTTP que se mantienen abiertas
+KEEPALIVE_SEGUNDOS = 90       # Tiempo que una conexión ociosa sigue viva
+TIMEOUT_PETICION = 60         # Segundos máximos por petición (y entre fragmentos de un stream)
+
+_FIN_STREAM = object()
+
+
+def _crear_http_client():
+    """httpx.AsyncClient con pool keep-alive (None si httpx no está disponible)."""
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONCURRENCIA * 2,
+            max_keepalive_connections=MAX_CONEXIONES_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_SEGUNDOS,
+        ),
+        timeout=TIMEOUT_PETICION,
+    )
+
+
+class LLMIOLoop:
+    """Event loop dedicado a las peticiones LLM (un solo hilo para toda SARA)."""
+
+    def __init__(self, max_concurrencia: int = MAX_CONCURRENCIA):
+        self.max_concurrencia = max_concurrencia
+        self._clientes: Dict[str, Any] = {}
+        self._http = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+
+        self.loop = asyncio.new_event_loop()
+        self._hilo = threading.Thread(target=self._correr, name="sara-llm-io", daemon=True)
+        self._hilo.start()
+        self._ejecutar(self._preparar()).result()
+
+    def _correr(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _preparar(self):
+        # El semáforo se crea dentro del loop que lo va a usar
+        self._semaforo = asyncio.Semaphore(self.max_concurrencia)
+
+    def _ejecutar(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    # ------------------------------------------------------------------
+    # Clientes
+    # ------------------------------------------------------------------
+    def conectar(self, gemini_model=None, groq_key: str = "", openai_key: str = ""):
+        """(Re)crea los clientes async. Se llama desde conectar_ias."""
+        self._ejecutar(self._conectar(gemini_model, groq_key, openai_key)).result(timeout=30)
+        logger.info(f"⚡ LLM I/O listo ({', '.join(self._clientes) or 'sin clientes async'})")
+
+    async def _conectar(self, gemini_model, groq_key, openai_key):
+        await self._cerrar_http()
+        self._http = _crear_http_client()
+        extra = {"http_client": self._http} if self._http is not None else {}
+        clientes = {}
+
+        if gemini_model is not None and hasattr(gemini_model, "generate_content_async"):
+            clientes["Gemini"] = gemini_model
+
+        if groq_key:
+            try:
+                from groq import AsyncGroq
+                clientes["Groq"] = AsyncGroq(api_key=groq_key, **extra)
+            except Exception as e:
+                logger.warning(f"AsyncGroq no disponible, se usará el cliente síncrono: {e}")
+
+        if openai_key:
+            try:
+                from openai import AsyncOpenAI
+                clientes["ChatGPT"] = AsyncOpenAI(api_key=openai_key, **extra)
+            except Exception as e:
+                logger.warning(f"AsyncOpenAI no disponible, se usará el cliente síncrono: {e}")
+
+        self._clientes = clientes
+
+    async def _cerrar_http(self):
+        if self._http is not None:
+            try:
+                await self._http.aclose()
+            except Exception:
+                pass
+            self._http = None
+
+    def reemplazar_cliente(self, proveedor: str, cliente):
+        """Cambia en caliente el cliente de un proveedor (p.ej. otro modelo Gemini)."""
+        self.loop.call_soon_threadsafe(self._clientes.__setitem__, proveedor, cliente)
+
+    def disponible(self, proveedor: str) -> bool:
+        """¿Hay cliente async para este proveedor?"""
+        return proveedor in self._clientes
+
+    # ------------------------------------------------------------------
+    # Peticiones
+    # ------------------------------------------------------------------
+    def completar(self, proveedor: str, prompt: str, model: Optional[str] = None,
+                  system: Optional[str] = None, response_format: Optional[Dict] = None) -> Future:
+        """
+        Lanza una petición y devuelve un Future con el texto de la respuesta.
+
+        Args:
+            proveedor: "Gemini", "Groq" o "ChatGPT"
+            prompt: Prompt completo (mensaje del usuario)
+            model: Modelo (solo Groq/OpenAI; Gemini ya lo trae el GenerativeModel)
+            system: Mensaje de sistema (solo Groq/OpenAI)
+            response_format: p.ej. {"type": "json_object"} (solo Groq/OpenAI)
+        """
+        return self._ejecutar(self._completar(proveedor, prompt, model, system, response_format))
+
+    async def _completar(self, proveedor, prompt, model, system, response_format):
+        cliente = self._clientes[proveedor]
+        async with self._semaforo:
+            if proveedor == "Gemini":
+                resp = await asyncio.wait_for(cliente.generate_content_async(prompt), TIMEOUT_PETICION)
+                return resp.text
+
+            mensajes = [{"role": "user", "content": prompt}]
+            if system:
+                mensajes.insert(0, {"role": "system", "content": system})
+            resp = await asyncio.wait_for(
+                cliente.chat.completions.create(
+                    messages=mensajes,
+                    model=model,
+                    response_format=response_format
+                ),
+                TIMEOUT_PETICION
+            )
+            return resp.choices[0].message.content
+
+    def bloqueante(self, funcion: Callable, *args) -> Future:
+        """Ejecuta una llamada síncrona (SDK sin cliente async) bajo el mismo semáforo."""
+        return self._ejecutar(self._bloqueante(funcion, *args))
+
+    async def _bloqueante(self, funcion, *args):
+        async with self._semaforo:
+            return await self.loop.run_in_executor(None, funcion, *args)
+
+    # ------------------------------------------------------------------
+    # Streaming
+    # ------------------------------------------------------------------
+    def stream(self, proveedor: str, prompt: str, model: Optional[str] = None,
+               system: Optional[str] = None, **nativo) -> Iterator[str]:
+        """
+        Fragmentos de texto de la respuesta según van llegando.
+
+        Args:
+            proveedor: "Gemini", "Groq" o "ChatGPT" (con cliente async, ver disponible())
+            model / system: Como en completar() (solo Groq/OpenAI)
+            **nativo: kwargs extra de la llamada (p.ej. modo JSON nativo, ver structured_output.py)
+        """
+        return self._iterar(lambda cola: self._stream(proveedor, prompt, model, system, nativo, cola))
+
+    def stream_bloqueante(self, generador: Callable, *args) -> Iterator[str]:
+        """Como stream(), para un generador síncrono (SDK sin cliente async) bajo el mismo semáforo."""
+        return self._iterar(lambda cola: self._stream_bloqueante(generador, args, cola))
+
+    def _iterar(self, crear):
+        """Lado consumidor: lee la cola hasta el fin del stream y propaga el error del proveedor."""
+        cola = queue.Queue()
+        futuro = self._ejecutar(crear(cola))
+        futuro.add_done_callback(lambda f: cola.put(_FIN_STREAM))
+        try:
+            while True:
+                try:
+                    fragmento = cola.get(timeout=TIMEOUT_PETICION)
+                except queue.Empty:
+                    raise TimeoutError(f"sin fragmentos en {TIMEOUT_PETICION} s")
+                if fragmento is _FIN_STREAM:
+                    break
+                yield fragmento
+            futuro.result()
+        finally:
+            futuro.cancel()  # Consumidor que abandona (o timeout): se corta la petición
+
+    async def _stream(self, proveedor, prompt, model, system, nativo, cola):
+        cliente = self._clientes[proveedor]
+        async with self._semaforo:
+            if proveedor == "Gemini":
+                respuesta = await asyncio.wait_for(
+                    cliente.generate_content_async(prompt, stream=True, **nativo), TIMEOUT_PETICION
+                )
+                async for chunk in respuesta:
+                    try:
+                        texto = chunk.text
+                    except ValueError:
+                        # Chunk sin texto (p.ej. solo metadatos de seguridad)
+                        continue
+                    if texto:
+                        cola.put(texto)
+                return
+
+            mensajes = [{"role": "user", "content": prompt}]
+            if system:
+                mensajes.insert(0, {"role": "system", "content": system})
+            stream = await asyncio.wait_for(
+                cliente.chat.completions.create(messages=mensajes, model=model, stream=True, **nativo),
+                TIMEOUT_PETICION
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        cola.put(chunk.choices[0].delta.content)
+            finally:
+                cerrar = getattr(stream, "close", None)
+                if cerrar is not None:
+                    await cerrar()
+
+    async def _stream_bloqueante(self, generador, args, cola):
+        cancelado = threading.Event()
+
+        def consumir():
+            for fragmento in generador(*args):
+                if cancelado.is_set():
+                    break
+                cola.put(fragmento)
+
+        async with self._semaforo:
+            try:
+                await self.loop.run_in_executor(None, consumir)
+            finally:
+                cancelado.set()  # Cancelado: el hilo deja el generador en el próximo fragmento
+
+    def cerrar(self):
+        """Cierra las conexiones y detiene el loop."""
+        try:
+            self._ejecutar(self._cerrar_http()).result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_io_instance = None
+_io_lock = threading.Lock()
+
+
+def obtener_llm_io() -> LLMIOLoop:
+    """Obtiene la capa de E/S LLM global (singleton)."""
+    global _io_instance
+    if _io_instance is None:
+        with _io_lock:
+            if _io_instance is None:
+                _io_instance = LLMIOLoop()
+    return _io_instance
@@ -0,0 +1,141 @@
+"""
+🖥️ SARA - Local LLM
+====================
+
+Cuarto proveedor de IA ("Local") junto a Gemini/Groq/ChatGPT: un modelo
+pequeño cuantizado (GGUF) ejecutado en CPU con llama.cpp
+(`pip install llama-cpp-python`).
+
+- Pesos mapeados en memoria (mmap): arranque rápido y el SO comparte las
+  páginas entre procesos
+- Número de hilos configurable (local_threads / SARA_LOCAL_THREADS)
+- Una sola instancia cargada, compartida por todas las llamadas (llama.cpp no
+  es thread-safe: las peticiones se serializan con un lock)
+- Carga en segundo plano: no frena el arranque de SARA
+
+Se activa configurando la ruta del modelo (local_model_path /
+SARA_LOCAL_MODEL), p.ej. un Qwen2.5-1.5B-Instruct Q4_K_M. SaraBrain lo usa
+primero para las tareas estructuradas baratas (JSON de intención, routers,
+mensajes de commit) y como último recurso cuando no hay nube.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+CONTEXTO_LOCAL = 4096          # n_ctx del modelo local
+MAX_TOKENS_RESPUESTA = 512
+TEMPERATURA = 0.2              # Tareas estructuradas: respuestas deterministas
+
+Llama = None
+
+
+def _lazy_import_llama():
+    """Importa llama_cpp solo cuando se necesita"""
+    global Llama
+    if Llama is None:
+        try:
+            from llama_cpp import Llama as L
+            Llama = L
+        except ImportError:
+            logger.warning("llama-cpp-python no disponible (modelo local desactivado)")
+    return Llama
+
+
+def hilos_por_defecto() -> int:
+    """La mitad de los núcleos: deja CPU libre para la GUI, el STT y el TTS."""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+class LocalLLM:
+    """Modelo GGUF local con la misma forma de uso que los clientes de la nube."""
+
+    def __init__(self, model_path: str, n_threads: Optional[int] = None, n_ctx: int = CONTEXTO_LOCAL):
+        self.model_path = model_path
+        self.n_threads = n_threads or hilos_por_defecto()
+        self.n_ctx = n_ctx
+        self._llm = None
+        self._lock = threading.Lock()
+        self.model_future: Future = Future()
+        threading.Thread(target=self._cargar, name="sara-local-llm", daemon=True).start()
+
+    def _cargar(self):
+        try:
+            llama_cls = _lazy_import_llama()
+            if llama_cls is None:
+                raise ImportError("llama-cpp-python no instalado")
+            self._llm = llama_cls(
+                model_path=self.model_path,
+                n_ctx=self.n_ctx,
+                n_threads=self.n_threads,
+                use_mmap=True,
+                verbose=False,
+            )
+            logger.info(f"✅ Modelo local cargado ({os.path.basename(self.model_path)}, {self.n_threads} hilos)")
+            self.model_future.set_result(self._llm)
+        except Exception as e:
+            logger.error(f"❌ No se pudo cargar el modelo local {self.model_path}: {e}")
+            self.model_future.set_exception(e)
+
+    def listo(self) -> bool:
+        """True si el modelo ya está cargado (sin bloquear)."""
+        return self.model_future.done() and self.model_future.exception() is None
+
+    def fallido(self) -> bool:
+        return self.model_future.done() and self.model_future.exception() is not None
+
+    def _mensajes(self, prompt: str, system: Optional[str]):
+        mensajes = [{"role": "user", "content": prompt}]
+        if system:
+            mensajes.insert(0, {"role": "system", "content": system})
+        return mensajes
+
+    def generar(self, prompt: str, system: Optional[str] = None, json_mode: bool = False,
+                max_tokens: int = MAX_TOKENS_RESPUESTA) -> str:
+        """Respuesta completa (espera a que el modelo termine de cargar)."""
+        llm = self.model_future.result()
+        kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        with self._lock:
+            resp = llm.create_chat_completion(
+                messages=self._mensajes(prompt, system),
+                max_tokens=max_tokens,
+                temperature=TEMPERATURA,
+                **kwargs
+            )
+        return resp["choices"][0]["message"]["content"]
+
+    def generar_stream(self, prompt: str, system: Optional[str] = None,
+                       max_tokens: int = MAX_TOKENS_RESPUESTA,
+                       response_format: Optional[dict] = None) -> Iterator[str]:
+        """Fragmentos de texto según se generan (response_format: JSON con gramática)."""
+        llm = self.model_future.result()
+        kwargs = {"response_format": response_format} if response_format else {}
+        with self._lock:
+            for chunk in llm.create_chat_completion(
+                messages=self._mensajes(prompt, system),
+                max_tokens=max_tokens,
+                temperature=TEMPERATURA,
+                stream=True,
+                **kwargs
+            ):
+                texto = chunk["choices"][0].get("delta", {}).get("content")
+                if texto:
+                    yield texto
+
+
+_local_instance = None
+_local_lock = threading.Lock()
+
+
+def obtener_local_llm(model_path: str, n_threads: Optional[int] = None) -> LocalLLM:
+    """Obtiene el modelo local global (singleton; se recarga si cambia la ruta o los hilos)."""
+    global _local_instance
+    with _local_lock:
+        if (_local_instance is None or _local_instance.model_path != model_path
+                or (n_threads and _local_instance.n_threads != n_threads)):
+            _local_instance = LocalLLM(model_path, n_threads)
+    return _local_instance
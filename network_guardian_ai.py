@@ -62,7 +62,7 @@ Por favor:
 3. Sugiere acciones de seguridad si es necesario
 4. Sé conciso (máximo 3-4 líneas)"""
 
-            respuesta, _ = self.ia_callback(prompt)
+            respuesta, _ = self.ia_callback(prompt, sitio="guardian")
             return f"🤖 Análisis IA:\n{respuesta}"
             
         except Exception as e:
@@ -120,7 +120,7 @@ Detalles: {details}
 
 ¿Es una amenaza real o falso positivo? Responde en 2 líneas máximo."""
 
-            respuesta, _ = self.ia_callback(prompt)
+            respuesta, _ = self.ia_callback(prompt, sitio="guardian")
             return respuesta
             
         except Exception as e:
@@ -147,7 +147,7 @@ Detalles: {details}
 
 Dame 2-3 acciones concretas que puedo tomar. Sé breve y directo."""
 
-            respuesta, _ = self.ia_callback(prompt)
+            respuesta, _ = self.ia_callback(prompt, sitio="guardian")
             return f"💡 Recomendación IA:\n{respuesta}"
             
         except Exception as e:
@@ -178,7 +178,8 @@ Mensaje: {message}
 
 Explica qué significa y si debe preocuparse. Máximo 2 líneas."""
 
-            respuesta, _ = self.ia_callback(prompt)
+            # Alertas del mismo tipo se explican igual: cache semántico por tipo + mensaje
+            respuesta, _ = self.ia_callback(prompt, sitio="guardian", clave_semantica=f"{alert_type}: {message}")
             return respuesta
             
         except Exception as e:
@@ -221,7 +222,7 @@ Dame:
 2. Principal recomendación
 3. Máximo 4 líneas"""
 
-            respuesta, _ = self.ia_callback(prompt)
+            respuesta, _ = self.ia_callback(prompt, sitio="guardian")
             return f"🤖 Análisis Inteligente:\n{respuesta}"
             
         except Exception as e:
@@ -253,7 +254,7 @@ Si es un comando relacionado con seguridad de red, responde SOLO con JSON:
 
 Si NO es comando de red, responde: {{"accion": "ninguna"}}"""
 
-            respuesta, _ = self.ia_callback(prompt)
+            respuesta, _ = self.ia_callback(prompt, sitio="guardian")
             
             # Intentar parsear JSON
             import json
@@ -6,7 +6,8 @@ Gestión de alertas de seguridad con notificaciones de escritorio y voz.
 import logging
 from typing import Optional, Callable
 from datetime import datetime
-import threading
+
+from speech_scheduler import PRIORIDAD_INFO, PRIORIDAD_NORMAL, PRIORIDAD_CRITICA
 
 try:
     from plyer import notification
@@ -119,17 +120,16 @@ class AlertSystem:
             # Mensaje simplificado para voz
             if severity == self.SEVERITY_CRITICAL:
                 voz_msg = f"Alerta crítica. {title}. {message}"
+                prioridad = PRIORIDAD_CRITICA  # Corta lo que se esté diciendo
             elif severity == self.SEVERITY_WARNING:
                 voz_msg = f"Atención. {title}."
+                prioridad = PRIORIDAD_NORMAL
             else:
                 voz_msg = f"{title}."
+                prioridad = PRIORIDAD_INFO  # Espera a que SARA termine de hablar
             
-            # Ejecutar en thread separado para no bloquear
-            threading.Thread(
-                target=self.voice_callback,
-                args=(voz_msg,),
-                daemon=True
-            ).start()
+            # hablar() no bloquea: el planificador de voz decide cuándo suena
+            self.voice_callback(voz_msg, prioridad=prioridad)
         except Exception as e:
             logging.error(f"Error en notificación de voz: {e}")
     
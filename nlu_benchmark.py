@@ -0,0 +1,300 @@
+"""
+📊 SARA - NLU Benchmark
+========================
+
+Benchmark offline (sin LLM) del clasificador híbrido sobre INTENT_EXAMPLES_FULL.
+
+- Divide el dataset en entrenamiento / prueba (held-out, reproducible por semilla).
+- Entrena HybridIntentClassifier solo con el split de entrenamiento (cache de
+  embeddings propio en .sara_models/benchmark/, no toca el cache real).
+- Evalúa los ejemplos de prueba y variantes ruidosas: sin acentos, palabra
+  omitida, errores típicos de STT y wake word delante.
+- Reporta precisión top-1 (global, por tipo de variante y por intención),
+  confusiones por intención, reparto por capa (pattern/ml/ai/fallback) y
+  comandos/segundo con cache frío y caliente.
+
+El resultado va a un JSON con claves estables para poder comparar dos corridas:
+
+    python nlu_benchmark.py --salida antes.json
+    python nlu_benchmark.py --salida despues.json
+    python nlu_benchmark.py --comparar antes.json despues.json
+"""
+
+import json
+import logging
+import random
+import re
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from intent_examples_full import INTENT_EXAMPLES_FULL
+from intent_classifier import HybridIntentClassifier, CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_VERSION = 1
+BENCHMARK_CACHE_DIR = CACHE_DIR / "benchmark"
+FRACCION_TEST = 0.2
+SEMILLA = 42
+MAX_ERRORES_REPORTE = 200
+
+TIPO_ORIGINAL = "original"
+
+# Confusiones típicas del reconocimiento de voz en español (origen, reemplazo)
+ERRORES_STT = [
+    ("v", "b"), ("b", "v"), ("ll", "y"), ("y", "ll"), ("ce", "se"), ("ci", "si"),
+    ("z", "s"), ("s", "z"), ("h", ""), ("qu", "k"), ("x", "j"), ("g", "j"),
+    ("rr", "r"), ("ñ", "n"), ("que", "ke"), ("por", "po"),
+]
+
+
+# =============================================================================
+# DATASET
+# =============================================================================
+
+def dividir_dataset(ejemplos: Dict[str, List[str]], fraccion_test: float = FRACCION_TEST,
+                    semilla: int = SEMILLA) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """
+    Divide cada intención en entrenamiento/prueba de forma reproducible.
+    Siempre deja al menos un ejemplo de entrenamiento por intención.
+    """
+    rng = random.Random(semilla)
+    train, test = {}, {}
+    for intent, textos in ejemplos.items():
+        textos = list(textos)
+        rng.shuffle(textos)
+        n_test = min(int(round(len(textos) * fraccion_test)), len(textos) - 1)
+        test[intent] = textos[:n_test]
+        train[intent] = textos[n_test:]
+    return train, test
+
+
+def _quitar_acentos(texto: str) -> str:
+    # Igual que loop_voz: NFD y sin marcas diacríticas
+    return "".join(c for c in unicodedata.normalize("NFD", texto) if unicodedata.category(c) != "Mn")
+
+
+def generar_variantes(texto: str, semilla: int = SEMILLA) -> Dict[str, str]:
+    """
+    Variantes ruidosas de un comando (deterministas por texto + semilla).
+    Solo se incluyen las que cambian el texto.
+    """
+    rng = random.Random(f"{semilla}:{texto}")
+    base = texto.lower()
+    variantes = {}
+
+    sin_acentos = _quitar_acentos(base)
+    if sin_acentos != base:
+        variantes["sin_acentos"] = sin_acentos
+
+    palabras = base.split()
+    if len(palabras) > 2:
+        idx = rng.randrange(len(palabras))
+        variantes["palabra_omitida"] = " ".join(palabras[:idx] + palabras[idx + 1:])
+
+    aplicables = [(a, b) for a, b in ERRORES_STT if a in base]
+    if aplicables:
+        origen, reemplazo = rng.choice(aplicables)
+        posiciones = [m.start() for m in re.finditer(re.escape(origen), base)]
+        pos = rng.choice(posiciones)
+        variantes["error_stt"] = base[:pos] + reemplazo + base[pos + len(origen):]
+
+    variantes["wake_word"] = f"{rng.choice(['oye sara', 'sara', 'hey sara'])} {base}"
+    return variantes
+
+
+def construir_casos(test: Dict[str, List[str]], variantes: bool = True,
+                    semilla: int = SEMILLA) -> List[Dict[str, str]]:
+    """Lista de casos {texto, tipo, real} a evaluar."""
+    casos = []
+    for intent, textos in test.items():
+        for texto in textos:
+            casos.append({"texto": texto, "tipo": TIPO_ORIGINAL, "real": intent})
+            if variantes:
+                for tipo, variante in generar_variantes(texto, semilla).items():
+                    casos.append({"texto": variante, "tipo": tipo, "real": intent})
+    return casos
+
+
+# =============================================================================
+# EJECUCIÓN
+# =============================================================================
+
+def _pasada(classifier: HybridIntentClassifier, casos: List[Dict[str, str]]) -> Tuple[List[Tuple], float]:
+    inicio = time.perf_counter()
+    resultados = [classifier.clasificar(c["texto"]) for c in casos]
+    return resultados, time.perf_counter() - inicio
+
+
+def _precision(aciertos: int, total: int) -> float:
+    return round(aciertos / total, 4) if total else 0.0
+
+
+def ejecutar_benchmark(backend: Optional[str] = None, fraccion_test: float = FRACCION_TEST,
+                       semilla: int = SEMILLA, variantes: bool = True,
+                       ejemplos: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+    """
+    Corre el benchmark completo y devuelve el reporte (dict serializable).
+    No usa la Capa 3: el clasificador se crea sin ia_callback.
+    """
+    ejemplos = ejemplos or INTENT_EXAMPLES_FULL
+    train, test = dividir_dataset(ejemplos, fraccion_test, semilla)
+    casos = construir_casos(test, variantes, semilla)
+
+    t_carga = time.perf_counter()
+    classifier = HybridIntentClassifier(
+        ia_callback=None,
+        backend=backend,
+        ejemplos=train,
+        cache_dir=BENCHMARK_CACHE_DIR / (backend or "default"),
+    )
+    classifier.esperar_modelo()
+    carga_s = time.perf_counter() - t_carga
+    if not classifier.modelo_listo():
+        raise RuntimeError("No se pudo cargar el modelo de embeddings (Capa 2)")
+
+    # Cache frío y luego caliente (mismos casos, resultados ya cacheados)
+    classifier.limpiar_cache()
+    resultados, t_frio = _pasada(classifier, casos)
+    _, t_caliente = _pasada(classifier, casos)
+
+    por_tipo: Dict[str, Dict[str, int]] = {}
+    por_intent: Dict[str, Dict[str, Any]] = {
+        i: {"total": 0, "aciertos": 0, "confusiones": {}} for i in test if test[i]
+    }
+    capas: Dict[str, int] = {}
+    errores = []
+    aciertos_total = 0
+
+    for caso, (pred, _params, source) in zip(casos, resultados):
+        acierto = pred == caso["real"]
+        aciertos_total += acierto
+        capas[source] = capas.get(source, 0) + 1
+
+        tipo = por_tipo.setdefault(caso["tipo"], {"total": 0, "aciertos": 0})
+        tipo["total"] += 1
+        tipo["aciertos"] += acierto
+
+        entrada = por_intent[caso["real"]]
+        entrada["total"] += 1
+        entrada["aciertos"] += acierto
+        if not acierto:
+            entrada["confusiones"][str(pred)] = entrada["confusiones"].get(str(pred), 0) + 1
+            errores.append({**caso, "prediccion": pred, "capa": source})
+
+    total = len(casos)
+    for datos in list(por_tipo.values()) + list(por_intent.values()):
+        datos["precision"] = _precision(datos["aciertos"], datos["total"])
+    for datos in por_intent.values():
+        datos["confusiones"] = dict(sorted(datos["confusiones"].items(), key=lambda kv: (-kv[1], kv[0])))
+
+    return {
+        "meta": {
+            "version": BENCHMARK_VERSION,
+            "backend": classifier.backend_name or "default",
+            "encoder_id": getattr(classifier, "encoder_id", None),
+            "dataset_hash": classifier.dataset_hash,
+            "semilla": semilla,
+            "fraccion_test": fraccion_test,
+            "variantes": variantes,
+            "ejemplos_train": sum(len(v) for v in train.values()),
+            "ejemplos_test": sum(len(v) for v in test.values()),
+            "casos": total,
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "precision_top1": _precision(aciertos_total, total),
+        "por_tipo": dict(sorted(por_tipo.items())),
+        "capas": {s: _precision(n, total) for s, n in sorted(capas.items())},
+        "rendimiento": {
+            "carga_modelo_s": round(carga_s, 3),
+            "frio": {"segundos": round(t_frio, 4), "comandos_por_segundo": round(total / t_frio, 1) if t_frio else None},
+            "caliente": {"segundos": round(t_caliente, 4), "comandos_por_segundo": round(total / t_caliente, 1) if t_caliente else None},
+        },
+        "por_intent": dict(sorted(por_intent.items())),
+        "errores": errores[:MAX_ERRORES_REPORTE],
+    }
+
+
+def guardar_reporte(reporte: Dict[str, Any], ruta: Path):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def comparar(antes: Dict[str, Any], despues: Dict[str, Any]) -> Dict[str, Any]:
+    """Diferencias entre dos reportes (despues - antes)."""
+    def delta(a, b):
+        if a is None or b is None:
+            return None  # Métrica ausente en una de las corridas
+        return round(b - a, 4)
+
+    cambios_intent = {}
+    for intent in sorted(set(antes["por_intent"]) | set(despues["por_intent"])):
+        a = antes["por_intent"].get(intent, {}).get("precision")
+        b = despues["por_intent"].get(intent, {}).get("precision")
+        if a != b:
+            cambios_intent[intent] = {"antes": a, "despues": b, "delta": delta(a, b)}
+
+    return {
+        "precision_top1": delta(antes["precision_top1"], despues["precision_top1"]),
+        "por_tipo": {
+            t: delta(antes["por_tipo"].get(t, {}).get("precision"), despues["por_tipo"].get(t, {}).get("precision"))
+            for t in sorted(set(antes["por_tipo"]) | set(despues["por_tipo"]))
+        },
+        "capas": {
+            c: delta(antes["capas"].get(c), despues["capas"].get(c))
+            for c in sorted(set(antes["capas"]) | set(despues["capas"]))
+        },
+        "comandos_por_segundo": {
+            cache: delta(antes["rendimiento"][cache]["comandos_por_segundo"],
+                         despues["rendimiento"][cache]["comandos_por_segundo"])
+            for cache in ("frio", "caliente")
+        },
+        "por_intent": cambios_intent,
+    }
+
+
+def _imprimir_reporte(reporte: Dict[str, Any]):
+    meta = reporte["meta"]
+    print("\n📊 BENCHMARK NLU\n" + "=" * 50)
+    print(f"Backend:        {meta['backend']} ({meta['encoder_id']})")
+    print(f"Train / test:   {meta['ejemplos_train']} / {meta['ejemplos_test']} (casos: {meta['casos']})")
+    print(f"Precisión top-1: {reporte['precision_top1']:.2%}")
+    for tipo, datos in reporte["por_tipo"].items():
+        print(f"   · {tipo}: {datos['precision']:.2%} ({datos['aciertos']}/{datos['total']})")
+    print("Capas:          " + ", ".join(f"{c} {p:.1%}" for c, p in reporte["capas"].items()))
+    rend = reporte["rendimiento"]
+    print(f"Cache frío:     {rend['frio']['comandos_por_segundo']} cmd/s")
+    print(f"Cache caliente: {rend['caliente']['comandos_por_segundo']} cmd/s")
+    peores = sorted(reporte["por_intent"].items(), key=lambda kv: kv[1]["precision"])[:5]
+    print("Peores intenciones:")
+    for intent, datos in peores:
+        top = next(iter(datos["confusiones"]), "-")
+        print(f"   · {intent}: {datos['precision']:.2%} (confunde con {top})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Benchmark offline del clasificador NLU de SARA")
+    parser.add_argument("--backend", default=None, help="sentence-transformers u onnx-int8")
+    parser.add_argument("--test", type=float, default=FRACCION_TEST, help="Fracción held-out por intención")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--sin-variantes", action="store_true", help="Solo ejemplos originales")
+    parser.add_argument("--salida", default="nlu_benchmark.json")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DESPUES"), help="Compara dos reportes JSON")
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as f:
+            antes = json.load(f)
+        with open(args.comparar[1], encoding="utf-8") as f:
+            despues = json.load(f)
+        print(json.dumps(comparar(antes, despues), ensure_ascii=False, indent=2))
+    else:
+        reporte = ejecutar_benchmark(args.backend, args.test, args.semilla, not args.sin_variantes)
+        _imprimir_reporte(reporte)
+        guardar_reporte(reporte, Path(args.salida))
+        print(f"\n💾 Reporte guardado en {args.salida}")
@@ -8,9 +8,17 @@ import time
 import json
 import os
 from datetime import datetime, timedelta
-from typing import Callable, Optional, Dict
+from typing import Callable, Optional, Dict, List
 import logging
 
+from speech_scheduler import PRIORIDAD_INFO
+
+# Avisos de voz (fijos: el TTS los precalienta en su cache de audio)
+VOZ_POMODORO_INICIADO = "🍅 Pomodoro iniciado. 25 minutos de enfoque total."
+VOZ_DESCANSO_INICIADO = "☕ Descanso {tipo} iniciado. Relájate."
+VOZ_POMODORO_COMPLETADO = "🎉 ¡Pomodoro completado! Llevas {completados} hoy. Toma un descanso."
+VOZ_DESCANSO_TERMINADO = "✅ Descanso terminado. ¿Listo para otro pomodoro?"
+
 class PomodoroManager:
     """Gestor de sesiones Pomodoro con estadísticas persistentes."""
     
@@ -19,7 +27,7 @@ class PomodoroManager:
         Inicializa el gestor de Pomodoro.
         
         Args:
-            voice_callback: Función para notificaciones de voz
+            voice_callback: Función para notificaciones de voz (texto, prioridad=...)
         """
         self.voice_callback = voice_callback
         self.stats_file = "pomodoro_stats.json"
@@ -99,7 +107,7 @@ class PomodoroManager:
         
         # Notificación de voz
         if self.voice_callback:
-            self.voice_callback("🍅 Pomodoro iniciado. 25 minutos de enfoque total.")
+            self.voice_callback(VOZ_POMODORO_INICIADO, prioridad=PRIORIDAD_INFO)
         
         logging.info(f"🍅 Sesión de trabajo iniciada: {self.work_duration // 60} minutos")
         return f"✅ Pomodoro iniciado: {self.work_duration // 60} minutos de trabajo"
@@ -129,7 +137,7 @@ class PomodoroManager:
         # Notificación de voz
         break_type = "largo" if long_break else "corto"
         if self.voice_callback:
-            self.voice_callback(f"☕ Descanso {break_type} iniciado. Relájate.")
+            self.voice_callback(VOZ_DESCANSO_INICIADO.format(tipo=break_type), prioridad=PRIORIDAD_INFO)
         
         logging.info(f"☕ Descanso iniciado: {duration // 60} minutos")
         return f"✅ Descanso {break_type}: {duration // 60} minutos"
@@ -199,7 +207,7 @@ class PomodoroManager:
             
             # Notificación de voz
             if self.voice_callback:
-                self.voice_callback(f"🎉 ¡Pomodoro completado! Llevas {self.pomodoros_completed} hoy. Toma un descanso.")
+                self.voice_callback(VOZ_POMODORO_COMPLETADO.format(completados=self.pomodoros_completed), prioridad=PRIORIDAD_INFO)
             
             # Auto-iniciar descanso si es cada 4 pomodoros
             if self.pomodoros_completed % 4 == 0:
@@ -209,7 +217,7 @@ class PomodoroManager:
             self._record_break_time()
             
             if self.voice_callback:
-                self.voice_callback("✅ Descanso terminado. ¿Listo para otro pomodoro?")
+                self.voice_callback(VOZ_DESCANSO_TERMINADO, prioridad=PRIORIDAD_INFO)
         
         # Resetear estado
         self.is_running = False
@@ -346,6 +354,16 @@ class PomodoroManager:
         self.pomodoros_completed = 0
         logging.info("🔄 Contador diario reseteado")
         return "🔄 Contador de hoy reseteado"
+    
+    def frases_voz(self) -> List[str]:
+        """Avisos de voz fijos (para precalentar el cache de audio del TTS)."""
+        return [
+            VOZ_POMODORO_INICIADO,
+            VOZ_DESCANSO_INICIADO.format(tipo="corto"),
+            VOZ_DESCANSO_INICIADO.format(tipo="largo"),
+            VOZ_POMODORO_COMPLETADO.format(completados=self.pomodoros_completed + 1),
+            VOZ_DESCANSO_TERMINADO,
+        ]
 
 
 # Singleton para acceso global
@@ -0,0 +1,292 @@
+"""
+🚦 SARA - Rate Limiter de proveedores IA
+=========================================
+
+Token bucket por proveedor (límite por minuto) + contador diario persistido
+en disco (límite por día). `consultar_ia` reserva un turno ANTES de llamar:
+si el proveedor no tiene margen se salta directamente al siguiente, en vez
+de gastar una petición que va a volver con un 429 y varios segundos perdidos.
+
+Cuando aun así llega un 429 (la misma API key usada desde otro sitio, un
+límite que cambió...) el proveedor queda bloqueado un rato con `penalizar`.
+
+Límites por defecto = planes gratuitos conocidos; se pueden sobrescribir
+desde config.json con la clave "limites_ia":
+    {"Groq": {"por_minuto": 30, "por_dia": 14400}}
+
+Archivo: rate_limits.json (uso del día por proveedor). Las reservas no lo
+reescriben cada vez: se guarda GUARDADO_DIFERIDO segundos después de la
+primera reserva sin guardar, al cambiar de día y al cerrar SARA. Un 429
+diario (`penalizar`) se guarda al momento.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITS_FILE = Path(__file__).resolve().parent / "rate_limits.json"
+
+# None = sin límite conocido (depende del plan de pago)
+LIMITES_PROVEEDOR = {
+    "Gemini": {"por_minuto": 15, "por_dia": 1500, "plan": "Gemini Free"},
+    "Groq": {"por_minuto": 30, "por_dia": 14400, "plan": "Groq Free"},
+    "ChatGPT": {"por_minuto": None, "por_dia": None, "plan": "OpenAI (según tu plan de pago)"},
+}
+
+ESPERA_TRAS_429 = 60  # Segundos que un proveedor queda fuera tras un 429 por minuto
+GUARDADO_DIFERIDO = 5  # Segundos que se agrupan las reservas antes de escribir el JSON
+
+
+class TokenBucket:
+    """Cubo de fichas: `capacidad` peticiones de ráfaga, recarga continua."""
+
+    def __init__(self, por_minuto: int):
+        self.capacidad = float(por_minuto)
+        self.recarga_por_seg = por_minuto / 60.0
+        self.fichas = self.capacidad
+        self.ultimo = time.monotonic()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.fichas = min(self.capacidad, self.fichas + (ahora - self.ultimo) * self.recarga_por_seg)
+        self.ultimo = ahora
+
+    def disponibles(self) -> int:
+        self._recargar()
+        return int(self.fichas)
+
+    def consumir(self) -> bool:
+        self._recargar()
+        if self.fichas >= 1:
+            self.fichas -= 1
+            return True
+        return False
+
+    def vaciar(self):
+        self._recargar()
+        self.fichas = 0.0
+
+    def segundos_para_ficha(self) -> float:
+        self._recargar()
+        if self.fichas >= 1:
+            return 0.0
+        return (1 - self.fichas) / self.recarga_por_seg
+
+
+class ProviderRateLimiter:
+    """Cuotas por minuto y por día de cada proveedor IA."""
+
+    def __init__(self, limites: Optional[Dict[str, Dict]] = None, archivo: Path = RATE_LIMITS_FILE):
+        """
+        Args:
+            limites: Sobrescribe LIMITES_PROVEEDOR (por proveedor, claves
+                "por_minuto"/"por_dia")
+            archivo: JSON donde se guarda el uso del día
+        """
+        self.limites = {p: dict(v) for p, v in LIMITES_PROVEEDOR.items()}
+        for p, v in (limites or {}).items():
+            self.limites.setdefault(p, {"plan": p}).update(v)
+
+        self.archivo = Path(archivo)
+        self._lock = threading.Lock()
+        self._buckets = {
+            p: TokenBucket(v["por_minuto"])
+            for p, v in self.limites.items() if v.get("por_minuto")
+        }
+        self._bloqueado_hasta: Dict[str, float] = {}
+        self._fecha = self._hoy()
+        self._uso_dia: Dict[str, int] = {}
+        self._temporizador: Optional[threading.Timer] = None  # Guardado diferido pendiente
+        self._cargar()
+        atexit.register(self.guardar)
+
+    # ------------------------------------------------------------------
+    # Persistencia del contador diario
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _hoy() -> str:
+        return datetime.date.today().isoformat()
+
+    def _cargar(self):
+        if not self.archivo.exists():
+            return
+        try:
+            with open(self.archivo, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+            if datos.get("fecha") == self._fecha:
+                self._uso_dia = {p: int(n) for p, n in datos.get("uso", {}).items()}
+        except Exception as e:
+            logger.warning(f"Contadores de cuota ilegibles: {e}")
+
+    def _guardar(self):
+        """Escribe el uso del día (con el lock tomado); anula el guardado diferido pendiente."""
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        try:
+            tmp = self.archivo.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"fecha": self._fecha, "uso": self._uso_dia}, f)
+            os.replace(tmp, self.archivo)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar contadores de cuota: {e}")
+
+    def _programar_guardado(self):
+        """Guarda dentro de GUARDADO_DIFERIDO segundos (una escritura por ráfaga de reservas)."""
+        if self._temporizador is None:
+            self._temporizador = threading.Timer(GUARDADO_DIFERIDO, self.guardar)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+    def guardar(self):
+        """Escribe ya el uso pendiente de guardar (temporizador y cierre de SARA)."""
+        with self._lock:
+            if self._temporizador is not None:
+                self._guardar()
+
+    def _rotar_dia(self):
+        """Reinicia los contadores al cambiar de día."""
+        hoy = self._hoy()
+        if hoy != self._fecha:
+            self._fecha = hoy
+            self._uso_dia = {}
+            self._guardar()
+
+    # ------------------------------------------------------------------
+    # Consulta / reserva
+    # ------------------------------------------------------------------
+    def _restante_dia(self, proveedor: str) -> Optional[int]:
+        limite = self.limites.get(proveedor, {}).get("por_dia")
+        if not limite:
+            return None
+        return max(0, limite - self._uso_dia.get(proveedor, 0))
+
+    def _motivo_sin_margen(self, proveedor: str) -> Optional[str]:
+        """None si hay margen; si no, "dia" / "minuto"."""
+        if self._restante_dia(proveedor) == 0:
+            return "dia"
+        if self._bloqueado_hasta.get(proveedor, 0) > time.monotonic():
+            return "minuto"
+        bucket = self._buckets.get(proveedor)
+        if bucket is not None and bucket.disponibles() < 1:
+            return "minuto"
+        return None
+
+    def tiene_margen(self, proveedor: str) -> bool:
+        """¿Se puede llamar ahora sin pasarse del límite? (no consume)"""
+        with self._lock:
+            self._rotar_dia()
+            return self._motivo_sin_margen(proveedor) is None
+
+    def reservar(self, proveedor: str) -> bool:
+        """Consume un turno del proveedor. False = sin margen, no llamar."""
+        with self._lock:
+            self._rotar_dia()
+            if self._motivo_sin_margen(proveedor) is not None:
+                return False
+            bucket = self._buckets.get(proveedor)
+            if bucket is not None:
+                bucket.consumir()
+            self._uso_dia[proveedor] = self._uso_dia.get(proveedor, 0) + 1
+            self._programar_guardado()
+            return True
+
+    def penalizar(self, proveedor: str, error_str: str = ""):
+        """El proveedor devolvió un 429: sacarlo de la rotación hasta que haya margen."""
+        error_str = error_str.lower()
+        with self._lock:
+            limite_dia = self.limites.get(proveedor, {}).get("por_dia")
+            if limite_dia and any(x in error_str for x in ["per day", "perday", "daily", "por día"]):
+                self._uso_dia[proveedor] = limite_dia
+                self._guardar()
+                logger.warning(f"🚦 {proveedor}: límite diario agotado")
+                return
+            self._bloqueado_hasta[proveedor] = time.monotonic() + ESPERA_TRAS_429
+            bucket = self._buckets.get(proveedor)
+            if bucket is not None:
+                bucket.vaciar()
+
+    def ordenar(self, proveedores: Iterable[str]) -> List[str]:
+        """Mismo orden de preferencia, pero primero los que tienen margen."""
+        proveedores = list(proveedores)
+        with self._lock:
+            self._rotar_dia()
+            con_margen = [p for p in proveedores if self._motivo_sin_margen(p) is None]
+        return con_margen + [p for p in proveedores if p not in con_margen]
+
+    # ------------------------------------------------------------------
+    # Estado para la UI / mensajes
+    # ------------------------------------------------------------------
+    def segundos_para_reintento(self, proveedor: str) -> Optional[float]:
+        """Espera estimada hasta el próximo turno (None si es límite diario)."""
+        with self._lock:
+            self._rotar_dia()
+            if self._restante_dia(proveedor) == 0:
+                return None
+            espera = max(0.0, self._bloqueado_hasta.get(proveedor, 0) - time.monotonic())
+            bucket = self._buckets.get(proveedor)
+            if bucket is not None:
+                espera = max(espera, bucket.segundos_para_ficha())
+            return espera
+
+    def cuota_restante(self, proveedor: str) -> Dict[str, Optional[int]]:
+        """Turnos que quedan (None = sin límite conocido)."""
+        with self._lock:
+            self._rotar_dia()
+            limites = self.limites.get(proveedor, {})
+            bucket = self._buckets.get(proveedor)
+            minuto = None
+            if bucket is not None:
+                minuto = 0 if self._bloqueado_hasta.get(proveedor, 0) > time.monotonic() else bucket.disponibles()
+            return {
+                "minuto": minuto,
+                "limite_minuto": limites.get("por_minuto"),
+                "dia": self._restante_dia(proveedor),
+                "limite_dia": limites.get("por_dia"),
+                "usadas_hoy": self._uso_dia.get(proveedor, 0),
+            }
+
+    def texto_cuota(self, proveedor: str) -> str:
+        """Resumen corto para el header: '14/15 min · 1480/1500 día'."""
+        c = self.cuota_restante(proveedor)
+        partes = []
+        if c["limite_minuto"]:
+            partes.append(f"{c['minuto']}/{c['limite_minuto']} min")
+        if c["limite_dia"]:
+            partes.append(f"{c['dia']}/{c['limite_dia']} día")
+        return " · ".join(partes) if partes else f"{c['usadas_hoy']} hoy"
+
+    def descripcion_limites(self, proveedor: str) -> str:
+        """'Gemini Free: 15 requests/minuto, 1500/día' (para mensajes de límite)."""
+        limites = self.limites.get(proveedor, {})
+        plan = limites.get("plan", proveedor)
+        if not limites.get("por_minuto") and not limites.get("por_dia"):
+            return plan
+        partes = []
+        if limites.get("por_minuto"):
+            partes.append(f"{limites['por_minuto']} requests/minuto")
+        if limites.get("por_dia"):
+            partes.append(f"{limites['por_dia']:,}/día")
+        return f"{plan}: {', '.join(partes)}"
+
+
+_limiter_instance = None
+_limiter_lock = threading.Lock()
+
+
+def obtener_rate_limiter(limites: Optional[Dict[str, Dict]] = None) -> ProviderRateLimiter:
+    """Obtiene el rate limiter global (singleton)."""
+    global _limiter_instance
+    if _limiter_instance is None:
+        with _limiter_lock:
+            if _limiter_instance is None:
+                _limiter_instance = ProviderRateLimiter(limites)
+    return _limiter_instance
@@ -0,0 +1,313 @@
+"""
+🗄️ SARA - Response Cache
+=========================
+
+Cache persistente de respuestas del LLM delante de SaraBrain.consultar_ia.
+
+Cada llamada indica su "sitio" (router, resumen, guardian, estudio...) y la
+política de ese sitio define:
+- ttl: segundos que vive una respuesta (None = no se cachea: turnos de conversación)
+- semantica: si además de la clave exacta se busca por similitud de embeddings
+
+Búsqueda:
+1. Exacta: hash(sitio + prompt + contexto) -> respuesta
+2. Semántica (opcional): embedding de la `clave_semantica` que pasa el llamador
+   (la parte variable del prompt, p.ej. el tema de las flashcards, NO la
+   plantilla entera) contra las entradas del mismo sitio; acierto si el coseno
+   supera el umbral y los números coinciden ("al 50" != "al 30").
+
+Las entradas se guardan en SQLite (response_cache.db) con su embedding; al
+superar MAX_ENTRADAS se expulsan las menos usadas recientemente.
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_DB_FILE = Path(__file__).resolve().parent / "response_cache.db"
+MAX_ENTRADAS = 1000
+UMBRAL_SIMILITUD = 0.92
+MAX_CHARS_CLAVE_SEMANTICA = 300  # MiniLM trunca textos largos: solo claves cortas
+
+HORA = 3600
+DIA = 24 * HORA
+
+# sitio -> política (ttl en segundos; None = sin cache)
+POLITICAS_CACHE: Dict[str, Dict] = {
+    "conversacion": {"ttl": None, "semantica": False},
+    "router": {"ttl": 7 * DIA, "semantica": False},
+    "nlu": {"ttl": 30 * DIA, "semantica": False},
+    "abrir_web": {"ttl": 30 * DIA, "semantica": False},
+    "resumen": {"ttl": 1 * DIA, "semantica": False},
+    "traduccion": {"ttl": 30 * DIA, "semantica": False},
+    "guardian": {"ttl": 1 * DIA, "semantica": True},
+    "estudio": {"ttl": 7 * DIA, "semantica": True},
+    "code": {"ttl": 1 * DIA, "semantica": False},
+}
+
+
+def _normalizar(texto: str) -> str:
+    return " ".join((texto or "").split())
+
+
+def _numeros(texto: str) -> Tuple[str, ...]:
+    return tuple(re.findall(r"\d+", texto or ""))
+
+
+class ResponseCache:
+    """Cache exacto + semántico de respuestas del LLM, persistido en SQLite."""
+
+    def __init__(self, db_file: Path = CACHE_DB_FILE, max_entradas: int = MAX_ENTRADAS,
+                 embedder_fn: Optional[Callable] = None, umbral: float = UMBRAL_SIMILITUD):
+        """
+        Args:
+            db_file: Archivo SQLite del cache
+            max_entradas: Tope de entradas antes de expulsar (LRU)
+            embedder_fn: Función sin argumentos que devuelve el encoder (o None si
+                aún no está cargado). Se usa el modelo MiniLM ya compartido del NLU.
+            umbral: Similitud coseno mínima para un acierto semántico
+        """
+        self.db_file = Path(db_file)
+        self.max_entradas = max_entradas
+        self.embedder_fn = embedder_fn
+        self.umbral = umbral
+
+        self.hits_exactos = 0
+        self.hits_semanticos = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # sitio -> (matriz N x D normalizada, [claves]) para la búsqueda semántica
+        self._indices: Dict[str, Tuple[Optional[np.ndarray], list]] = {}
+
+        self.conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                sitio TEXT NOT NULL,
+                clave_semantica TEXT,
+                respuesta TEXT NOT NULL,
+                creado REAL NOT NULL,
+                expira REAL NOT NULL,
+                ultimo_uso REAL NOT NULL,
+                usos INTEGER DEFAULT 0,
+                embedding BLOB
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_sitio ON respuestas(sitio)")
+        self.conn.commit()
+
+        self.purgar_expirados()
+        self._cargar_indices()
+
+    # ------------------------------------------------------------------
+    # Políticas
+    # ------------------------------------------------------------------
+    @staticmethod
+    def politica(sitio: Optional[str]) -> Optional[Dict]:
+        """Política del sitio, o None si no se cachea (bypass)."""
+        if not sitio:
+            return None
+        politica = POLITICAS_CACHE.get(sitio)
+        if politica is None or politica.get("ttl") is None:
+            return None
+        return politica
+
+    @staticmethod
+    def clave_exacta(sitio: str, prompt: str, contexto: str = "") -> str:
+        return hashlib.sha1(f"{sitio}\x1f{_normalizar(prompt)}\x1f{_normalizar(contexto)}".encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Embeddings
+    # ------------------------------------------------------------------
+    def _embedding(self, texto: str) -> Optional[np.ndarray]:
+        if not texto or len(texto) > MAX_CHARS_CLAVE_SEMANTICA or self.embedder_fn is None:
+            return None
+        try:
+            encoder = self.embedder_fn()
+            if encoder is None:
+                return None
+            vec = encoder.encode([_normalizar(texto).lower()], convert_to_numpy=True, normalize_embeddings=True)
+            return np.asarray(vec, dtype=np.float32).reshape(-1)
+        except Exception as e:
+            logger.debug(f"Sin embedding para cache semántico: {e}")
+            return None
+
+    def _cargar_indices(self):
+        """Carga a memoria los embeddings vigentes, agrupados por sitio."""
+        filas = self.conn.execute(
+            "SELECT clave, sitio, embedding FROM respuestas WHERE embedding IS NOT NULL AND expira > ?",
+            (time.time(),)
+        ).fetchall()
+        por_sitio: Dict[str, Tuple[list, list]] = {}
+        for clave, sitio, blob in filas:
+            vectores, claves = por_sitio.setdefault(sitio, ([], []))
+            vectores.append(np.frombuffer(blob, dtype=np.float32))
+            claves.append(clave)
+        self._indices = {}
+        for sitio, (vectores, claves) in por_sitio.items():
+            try:
+                self._indices[sitio] = (np.vstack(vectores), claves)
+            except ValueError:
+                # Dimensiones distintas (cambió el backend de embeddings): descartar
+                logger.info(f"Embeddings de cache incompatibles en '{sitio}', se ignoran")
+
+    def _indexar(self, sitio: str, clave: str, vec: np.ndarray):
+        matriz, claves = self._indices.get(sitio, (None, []))
+        if clave in claves:
+            return
+        if matriz is not None and matriz.shape[1] != vec.shape[0]:
+            matriz, claves = None, []
+        matriz = vec[None, :] if matriz is None else np.vstack([matriz, vec])
+        self._indices[sitio] = (matriz, claves + [clave])
+
+    def _desindexar(self, claves_borradas):
+        borradas = set(claves_borradas)
+        for sitio, (matriz, claves) in list(self._indices.items()):
+            conservar = [i for i, c in enumerate(claves) if c not in borradas]
+            if len(conservar) != len(claves):
+                self._indices[sitio] = (matriz[conservar] if conservar else None, [claves[i] for i in conservar])
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def obtener(self, sitio: Optional[str], prompt: str, contexto: str = "",
+                clave_semantica: Optional[str] = None) -> Optional[str]:
+        """Respuesta cacheada (exacta o semántica) o None."""
+        politica = self.politica(sitio)
+        if politica is None:
+            return None
+
+        ahora = time.time()
+        clave = self.clave_exacta(sitio, prompt, contexto)
+        with self._lock:
+            fila = self.conn.execute(
+                "SELECT respuesta FROM respuestas WHERE clave = ? AND expira > ?", (clave, ahora)
+            ).fetchone()
+            if fila:
+                self._marcar_uso(clave, ahora)
+                self.hits_exactos += 1
+                logger.info(f"🗄️ Cache IA (exacto, {sitio})")
+                return fila[0]
+
+        if politica.get("semantica") and clave_semantica:
+            respuesta = self._buscar_semantica(sitio, clave_semantica, ahora)
+            if respuesta is not None:
+                return respuesta
+
+        self.misses += 1
+        return None
+
+    def _buscar_semantica(self, sitio: str, clave_semantica: str, ahora: float) -> Optional[str]:
+        matriz, claves = self._indices.get(sitio, (None, []))
+        if matriz is None or not claves:
+            return None
+        vec = self._embedding(clave_semantica)
+        if vec is None or vec.shape[0] != matriz.shape[1]:
+            return None
+
+        similitudes = matriz @ vec
+        numeros = _numeros(clave_semantica)
+        with self._lock:
+            for idx in np.argsort(-similitudes):
+                if similitudes[idx] < self.umbral:
+                    break
+                fila = self.conn.execute(
+                    "SELECT respuesta, clave_semantica FROM respuestas WHERE clave = ? AND expira > ?",
+                    (claves[idx], ahora)
+                ).fetchone()
+                # Mismos números o no es la misma petición ("5 flashcards" vs "10")
+                if fila and _numeros(fila[1]) == numeros:
+                    self._marcar_uso(claves[idx], ahora)
+                    self.hits_semanticos += 1
+                    logger.info(f"🗄️ Cache IA (semántico {similitudes[idx]:.2f}, {sitio})")
+                    return fila[0]
+        return None
+
+    def guardar(self, sitio: Optional[str], prompt: str, respuesta: str, contexto: str = "",
+                clave_semantica: Optional[str] = None):
+        """Guarda una respuesta correcta según la política del sitio."""
+        politica = self.politica(sitio)
+        if politica is None or not respuesta:
+            return
+
+        ahora = time.time()
+        clave = self.clave_exacta(sitio, prompt, contexto)
+        vec = self._embedding(clave_semantica) if politica.get("semantica") and clave_semantica else None
+
+        with self._lock:
+            try:
+                self.conn.execute(
+                    """INSERT OR REPLACE INTO respuestas
+                       (clave, sitio, clave_semantica, respuesta, creado, expira, ultimo_uso, usos, embedding)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)""",
+                    (clave, sitio, clave_semantica, respuesta, ahora, ahora + politica["ttl"], ahora,
+                     vec.tobytes() if vec is not None else None)
+                )
+                self.conn.commit()
+                if vec is not None:
+                    self._indexar(sitio, clave, vec)
+                self._expulsar_exceso()
+            except Exception as e:
+                logger.warning(f"No se pudo guardar en cache IA: {e}")
+
+    def _marcar_uso(self, clave: str, ahora: float):
+        self.conn.execute("UPDATE respuestas SET usos = usos + 1, ultimo_uso = ? WHERE clave = ?", (ahora, clave))
+        self.conn.commit()
+
+    def _expulsar_exceso(self):
+        """Expulsa las entradas menos usadas recientemente por encima del tope (con lock)."""
+        total = self.conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+        exceso = total - self.max_entradas
+        if exceso <= 0:
+            return
+        claves = [c for (c,) in self.conn.execute(
+            "SELECT clave FROM respuestas ORDER BY ultimo_uso ASC LIMIT ?", (exceso,)
+        ).fetchall()]
+        self.conn.executemany("DELETE FROM respuestas WHERE clave = ?", [(c,) for c in claves])
+        self.conn.commit()
+        self._desindexar(claves)
+
+    def purgar_expirados(self):
+        with self._lock:
+            claves = [c for (c,) in self.conn.execute(
+                "SELECT clave FROM respuestas WHERE expira <= ?", (time.time(),)
+            ).fetchall()]
+            if claves:
+                self.conn.executemany("DELETE FROM respuestas WHERE clave = ?", [(c,) for c in claves])
+                self.conn.commit()
+                self._desindexar(claves)
+                logger.info(f"🗑️ {len(claves)} respuestas caducadas eliminadas del cache IA")
+
+    def limpiar(self, sitio: Optional[str] = None):
+        """Vacía el cache (todo o un sitio)."""
+        with self._lock:
+            if sitio:
+                self.conn.execute("DELETE FROM respuestas WHERE sitio = ?", (sitio,))
+                self._indices.pop(sitio, None)
+            else:
+                self.conn.execute("DELETE FROM respuestas")
+                self._indices = {}
+            self.conn.commit()
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            total = self.conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+        consultas = self.hits_exactos + self.hits_semanticos + self.misses
+        return {
+            "entradas": total,
+            "capacidad": self.max_entradas,
+            "hits_exactos": self.hits_exactos,
+            "hits_semanticos": self.hits_semanticos,
+            "misses": self.misses,
+            "hit_rate": (self.hits_exactos + self.hits_semanticos) / consultas if consultas else 0.0,
+        }
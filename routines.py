@@ -8,6 +8,10 @@ import time
 from datetime import datetime
 from typing import Dict, List, Any
 
+from speech_scheduler import PRIORIDAD_INFO
+
+MAX_ESPERA_FRASE = 60  # Segundos máximos esperando a que suene una frase de la rutina
+
 class RoutineManager:
     """Gestiona rutinas y automatizaciones"""
     
@@ -91,19 +95,25 @@ class RoutineManager:
         
         return f"Ejecutando rutina {routine['name']}..."
     
+    def _user_name(self) -> str:
+        """Nombre preferido del usuario (para las frases de las rutinas)"""
+        if hasattr(self.brain, 'perfil') and self.brain.perfil:
+            return self.brain.perfil.profile["user"]["preferred_name"] or "Usuario"
+        return "Usuario"
+    
     def _execute_actions(self, routine: Dict):
         """Ejecuta las acciones de una rutina secuencialmente"""
-        user_name = "Usuario"
-        if hasattr(self.brain, 'perfil') and self.brain.perfil:
-            user_name = self.brain.perfil.profile["user"]["preferred_name"] or "Usuario"
+        user_name = self._user_name()
             
         for action in routine["actions"]:
             try:
                 if action["type"] == "speak":
                     text = action["text"].format(user_name=user_name)
-                    self.brain.voz.hablar(text)
-                    # Esperar un poco (estimado)
-                    time.sleep(len(text) * 0.08 + 1)
+                    # INFO: una respuesta al usuario no la corta, la deja para después;
+                    # la rutina sigue cuando la frase ha sonado de verdad
+                    terminado = self.brain.voz.hablar(text, prioridad=PRIORIDAD_INFO)
+                    if terminado is not None:
+                        terminado.wait(MAX_ESPERA_FRASE)
                     
                 elif action["type"] == "command":
                     cmd = action["cmd"]
@@ -119,6 +129,16 @@ class RoutineManager:
         
         logging.info(f"Rutina {routine['name']} finalizada")
 
+    def frases_voz(self) -> List[str]:
+        """Frases que dicen las rutinas (para precalentar el cache de audio del TTS)"""
+        user_name = self._user_name()
+        return [
+            action["text"].format(user_name=user_name)
+            for routine in self.routines.values()
+            for action in routine["actions"]
+            if action["type"] == "speak"
+        ]
+
     def get_available_routines(self) -> str:
         """Devuelve lista de rutinas disponibles"""
         names = [r["name"] for r in self.routines.values()]
@@ -674,8 +674,12 @@ class SaraUltimateGUI(ctk.CTk):
     def actualizar_estado_global(self):
         """Actualiza el indicador de estado en el header"""
         if self.brain.ia_online:
-            estado = f"🟢 Online | {self.brain.preferred_provider}"
+            provider = self.brain.preferred_provider
+            estado = f"🟢 Online | {provider} | {self.brain.rate_limiter.texto_cuota(provider)}"
             color = self.COLORS["success"]
+            if not self.brain.rate_limiter.tiene_margen(provider):
+                estado = f"🟡 Sin cuota | {provider} | {self.brain.rate_limiter.texto_cuota(provider)}"
+                color = self.COLORS["warning"]
         else:
             estado = "🔴 Offline"
             color = self.COLORS["error"]
@@ -734,20 +738,30 @@ class SaraUltimateGUI(ctk.CTk):
         thread = threading.Thread(target=self.procesar_hilo, args=(cmd,), daemon=True)
         thread.start()
 
-    def procesar_hilo(self, texto):
+    def procesar_hilo(self, texto, stt_ms=None):
         with open("debug_trace.txt", "a", encoding="utf-8") as f:
             f.write(f"DEBUG_FILE: procesar_hilo called with '{texto}'\n")
         print(f"DEBUG SARA: procesar_hilo called with '{texto}'")
-        t = threading.Thread(target=self._procesar_comando, args=(texto,))
+        t = threading.Thread(target=self._procesar_comando, args=(texto, stt_ms))
         t.start()
         print("DEBUG SARA: Thread started")
         
-    def _procesar_comando(self, texto):
+    def _procesar_comando(self, texto, stt_ms=None):
+        # Una traza por comando: stt -> procesar -> (nlu, rag, llm) -> tts
+        with self.brain.tracer.traza(texto) as traza:
+            if stt_ms is not None:
+                self.brain.tracer.registrar("stt", stt_ms, traza)
+            self._procesar_comando_trazado(texto)
+        # Refrescar la cuota restante del proveedor en el header
+        self.after(0, self.actualizar_estado_global)
+
+    def _procesar_comando_trazado(self, texto):
         try:
             with open("debug_trace.txt", "a", encoding="utf-8") as f:
                 f.write(f"DEBUG_FILE: Inside _procesar_comando with '{texto}'\n")
             print(f"DEBUG SARA: Inside _procesar_comando with '{texto}'")
-            resp, origen = self.brain.procesar(texto)
+            with self.brain.tracer.etapa("procesar"):
+                resp, origen = self.brain.procesar(texto)
             
             # --- MANEJO DE COMANDOS UI ESPECIALES ---
             if origen == "ui_command":
@@ -765,7 +779,8 @@ class SaraUltimateGUI(ctk.CTk):
             self.log("SARA", resp, "sara")
             
             # Hablar respuesta (solo si no es muy larga o es local)
-            if origen == "sara" or origen == "exit" or (len(resp) < MAX_CHARS_VOZ and origen != "code"):
+            # "ai_stream" ya se fue hablando mientras llegaba la respuesta
+            if origen == "sara" or origen == "exit" or (len(resp) < MAX_CHARS_VOZ and origen not in ("code", "ai_stream")):
                 self.brain.voz.hablar(resp)
             
             # --- MANEJO DE ESTADOS ESPECIALES ---
@@ -809,7 +824,9 @@ class SaraUltimateGUI(ctk.CTk):
                     try:
                         # phrase_time_limit=15 para frases largas
                         audio = r.listen(source, timeout=VOICE_TIMEOUT, phrase_time_limit=15)
+                        t_stt = time.perf_counter()
                         txt = r.recognize_google(audio, language="es-ES").lower()
+                        stt_ms = (time.perf_counter() - t_stt) * 1000
                         
                         # Normalizar acentos para evitar problemas con Google Speech
                         import unicodedata
@@ -849,7 +866,7 @@ class SaraUltimateGUI(ctk.CTk):
                         
                         if any(txt.strip() == c for c in comandos_directos): # Coincidencia exacta o muy cercana
                             self.log("VOZ (Directo)", txt, "tu")
-                            self.procesar_hilo(txt)
+                            self.procesar_hilo(txt, stt_ms)
                             continue
 
                         # Debug: Ver qué llega realmente
@@ -893,7 +910,7 @@ class SaraUltimateGUI(ctk.CTk):
                             
                             if cmd:
                                 self.log("VOZ", cmd, "tu")
-                                self.procesar_hilo(cmd)
+                                self.procesar_hilo(cmd, stt_ms)
                             else:
                                 self.brain.voz.hablar("Dime.")
                         else:
@@ -1,12 +1,37 @@
 import os
 import logging
+import threading
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import Future
 import PyPDF2
 
+# Sitio de consultar_ia -> ¿buscar memorias? (None = turno de conversación)
+# Los prompts internos (clasificación JSON, routers, resúmenes de un texto dado)
+# no ganan nada con memorias personales: ni se codifican ni se consulta Chroma.
+POLITICAS_RECUPERACION = {
+    None: True,
+    "conversacion": True,
+    "estudio": True,       # Flashcards: los apuntes ingestados ayudan
+    "router": False,
+    "nlu": False,
+    "abrir_web": False,
+    "resumen": False,
+    "traduccion": False,
+    "guardian": False,
+    "code": False,
+}
+UMBRAL_DISTANCIA = 0.6      # Distancia coseno máxima para considerar relevante una memoria
+MAX_CHARS_CONSULTA = 500    # MiniLM trunca igual: no codificar prompts enteros
+LOTE_RECODIFICAR = 256      # Memorias por lote al recodificar una colección con otro encoder
+
+
+def usa_memoria(sitio):
+    """¿El sitio de llamada quiere memorias del Second Brain? (sitios desconocidos: no)"""
+    return POLITICAS_RECUPERACION.get(sitio, False)
+
 class SecondBrain:
-    def __init__(self, db_path="sara_memory_db", shared_model=None):
+    def __init__(self, db_path="sara_memory_db", shared_model=None, backend=None):
         """
         Inicializa Second Brain con ChromaDB.
         
@@ -14,8 +39,16 @@ class SecondBrain:
             db_path: Ruta a la base de datos ChromaDB
             shared_model: Modelo SentenceTransformer compartido (opcional).
                          Si se proporciona, se reutiliza en lugar de cargar uno nuevo.
+                         También acepta un Future (carga en segundo plano del NLU):
+                         el modelo se resuelve la primera vez que se necesita.
+            backend: Backend de embeddings si hay que cargar uno propio
+                     ("sentence-transformers" u "onnx-int8", ver encoder_backend.py)
         """
         self.db_path = db_path
+        self._embedder = None
+        self._embedder_future = None
+        self._colecciones_alineadas = False
+        self._lock_alinear = threading.Lock()
         
         logging.info("🧠 Inicializando Second Brain (ChromaDB)...")
         try:
@@ -23,14 +56,18 @@ class SecondBrain:
             self.client = chromadb.PersistentClient(path=db_path)
             
             # Usar modelo compartido si está disponible, sino crear uno nuevo
-            if shared_model is not None:
+            if isinstance(shared_model, Future):
+                logging.info("🔄 Second Brain esperará el modelo compartido (carga en segundo plano)")
+                self._embedder_future = shared_model
+            elif shared_model is not None:
                 logging.info("🔄 Reutilizando modelo compartido para Second Brain")
-                self.embedder = shared_model
+                self._embedder = shared_model
             else:
                 logging.info("📥 Cargando nuevo modelo para Second Brain")
                 # Inicializar modelo de embeddings (local, rápido)
                 # all-MiniLM-L6-v2 es ideal para CPU (rápido y ligero)
-                self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+                from encoder_backend import crear_backend
+                self._embedder = crear_backend(backend)
             
             # Crear o recuperar colecciones
             self.short_term = self.client.get_or_create_collection(
@@ -43,12 +80,87 @@ class SecondBrain:
                 metadata={"hnsw:space": "cosine"}
             )
             
+            if self._embedder_future is not None:
+                # Al terminar la carga, la recodificación (si hace falta) corre en el hilo de carga
+                self._embedder_future.add_done_callback(lambda _: self.embedder)
+            else:
+                self._alinear_colecciones()
+            
             logging.info("✅ Second Brain listo y cargado.")
             
         except Exception as e:
             logging.error(f"❌ Error crítico en Second Brain: {e}")
             self.client = None
 
+    @property
+    def embedder(self):
+        """Modelo de embeddings (espera la carga en segundo plano si hace falta)."""
+        if self._embedder is None and self._embedder_future is not None:
+            try:
+                self._embedder = self._embedder_future.result()
+            except Exception as e:
+                logging.error(f"❌ Modelo compartido no disponible para Second Brain: {e}")
+                self._embedder_future = None
+        if self._embedder is not None and not self._colecciones_alineadas:
+            self._alinear_colecciones()
+        return self._embedder
+
+    def _alinear_colecciones(self):
+        """
+        Cada colección guarda en sus metadatos el encoder_id con el que se
+        generaron sus vectores. Si el backend cambió (sentence-transformers y
+        onnx-int8 dan vectores de la misma dimensión pero no intercambiables)
+        o la colección es anterior a este registro, se recodifican sus
+        documentos con el encoder actual antes de usarla.
+        """
+        with self._lock_alinear:
+            if self._colecciones_alineadas or self.client is None:
+                return
+            encoder_id = getattr(self._embedder, "encoder_id", None)
+            if encoder_id is None:
+                # Modelo externo sin identificador: no hay con qué comparar
+                self._colecciones_alineadas = True
+                return
+            
+            for coleccion in (self.short_term, self.long_term):
+                metadata = dict(coleccion.metadata or {})
+                if metadata.get("encoder_id") == encoder_id:
+                    continue
+                try:
+                    self._recodificar(coleccion, metadata.get("encoder_id"), encoder_id)
+                    metadata["encoder_id"] = encoder_id
+                    self._guardar_metadata(coleccion, metadata)
+                except Exception as e:
+                    logging.error(f"❌ No se pudo recodificar {coleccion.name}: {e}")
+            self._colecciones_alineadas = True
+
+    @staticmethod
+    def _guardar_metadata(coleccion, metadata):
+        try:
+            coleccion.modify(metadata=metadata)
+        except ValueError:
+            # Chroma >= 1.0 guarda el espacio hnsw en la configuración y no deja reenviarlo
+            coleccion.modify(metadata={k: v for k, v in metadata.items() if not k.startswith("hnsw:")})
+
+    def _recodificar(self, coleccion, anterior, encoder_id):
+        total = coleccion.count()
+        if not total:
+            return
+        logging.info(f"🔄 Second Brain: recodificando {total} memorias de {coleccion.name} "
+                     f"({anterior or 'encoder sin registrar'} -> {encoder_id})")
+        for inicio in range(0, total, LOTE_RECODIFICAR):
+            lote = coleccion.get(include=["documents"], limit=LOTE_RECODIFICAR, offset=inicio)
+            if not lote["ids"]:
+                break
+            vectores = self._embedder.encode([doc or "" for doc in lote["documents"]])
+            coleccion.update(ids=lote["ids"], embeddings=[v.tolist() for v in vectores])
+
+    def embedder_listo(self):
+        """True si el modelo ya está cargado (no bloquea)."""
+        if self._embedder is not None:
+            return True
+        return self._embedder_future is not None and self._embedder_future.done()
+
     def memorizar(self, texto, metadata=None, coleccion="long_term"):
         """Guarda un texto en la memoria vectorial"""
         if not self.client: return "Error: Cerebro desconectado"
@@ -77,24 +189,41 @@ class SecondBrain:
 
     def recordar(self, query, n_results=3, coleccion="long_term"):
         """Recupera información relevante basada en similitud semántica"""
+        return [memoria for memoria, _ in self.recordar_puntuado(query, n_results, coleccion)]
+
+    def recordar_puntuado(self, query, n_results=3, coleccion="long_term", max_distancia=UMBRAL_DISTANCIA):
+        """
+        Como recordar, pero con la relevancia de cada memoria (1 - distancia coseno).
+        Las memorias más lejanas que max_distancia se descartan.
+        """
         if not self.client: return []
         
+        # No frenar consultas mientras el modelo sigue cargando en segundo plano
+        if not self.embedder_listo():
+            logging.debug("⏳ Second Brain: modelo cargando, se omite la búsqueda")
+            return []
+        
         try:
             target_col = self.short_term if coleccion == "short_term" else self.long_term
             
-            embedding = self.embedder.encode(query).tolist()
+            embedding = self.embedder.encode(query[:MAX_CHARS_CONSULTA]).tolist()
             
             results = target_col.query(
                 query_embeddings=[embedding],
-                n_results=n_results
+                n_results=n_results,
+                include=["documents", "metadatas", "distances"]
             )
             
             # Formatear resultados
             memories = []
             if results['documents']:
+                distancias = (results.get('distances') or [[]])[0]
                 for i, doc in enumerate(results['documents'][0]):
+                    distancia = distancias[i] if i < len(distancias) else 1.0
+                    if max_distancia is not None and distancia > max_distancia:
+                        continue
                     meta = results['metadatas'][0][i]
-                    memories.append(f"{doc} (Fuente: {meta.get('source', 'unknown')})")
+                    memories.append((f"{doc} (Fuente: {meta.get('source', 'unknown')})", 1.0 - distancia))
             
             return memories
         except Exception as e:
@@ -0,0 +1,74 @@
+"""
+🛬 SARA - Single Flight
+========================
+
+Coalescencia de peticiones duplicadas en vuelo.
+
+Si dos hilos piden lo mismo a la vez (el loop de voz y la caja de texto con
+el mismo comando, el dashboard de NetworkGuardian y la voz explicando la
+misma alerta...), solo el primero hace la llamada real; los demás esperan
+su resultado (o su excepción). Al terminar la clave se libera: no es un
+cache, solo evita trabajo duplicado simultáneo.
+
+Uso:
+    vuelos = SingleFlight()
+    resultado, compartido = vuelos.ejecutar(clave, funcion, arg1, arg2)
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Una sola ejecución en curso por clave; los duplicados comparten el resultado."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vuelos: Dict[Hashable, Future] = {}
+        self.ejecuciones = 0
+        self.duplicados = 0
+
+    def ejecutar(self, clave: Hashable, funcion: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        Ejecuta funcion(*args, **kwargs) o espera la ejecución idéntica en curso.
+
+        Returns:
+            (resultado, compartido): compartido=True si se reutilizó otra ejecución
+        """
+        with self._lock:
+            futuro = self._vuelos.get(clave)
+            lider = futuro is None
+            if lider:
+                futuro = Future()
+                self._vuelos[clave] = futuro
+                self.ejecuciones += 1
+            else:
+                self.duplicados += 1
+
+        if not lider:
+            logger.debug("🛬 Petición duplicada en vuelo: esperando la original")
+            return futuro.result(), True
+
+        try:
+            resultado = funcion(*args, **kwargs)
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado, False
+        finally:
+            with self._lock:
+                self._vuelos.pop(clave, None)
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "en_vuelo": len(self._vuelos),
+                "ejecuciones": self.ejecuciones,
+                "duplicados": self.duplicados,
+            }
@@ -0,0 +1,216 @@
+"""
+📢 SARA - Speech Scheduler
+===========================
+
+Planificador único de todo lo que SARA dice.
+
+Antes cada `hablar()` cortaba lo que sonaba y vaciaba la cola: una alerta
+crítica de NetworkGuardian, una alarma de CronosManager, un recordatorio de
+salud y un aviso del Pomodoro se pisaban a media frase (y cada llamada
+arrancaba dos hilos nuevos). Ahora los mensajes entran a una cola con
+prioridad y UN hilo los reproduce de uno en uno:
+
+- Prioridades: INFO < NORMAL < ALARMA < CRITICA
+- Interrupción: un mensaje corta al actual si tiene MÁS prioridad (la
+  alerta crítica corta la respuesta) o si ambos son NORMAL (una respuesta
+  nueva sustituye a la anterior, como siempre). Si no, espera su turno:
+  un recordatorio INFO nunca corta nada
+- El mensaje cortado por otro de más prioridad vuelve a la cola y se repite
+  entero después (salvo los de streaming, que ya se consumieron)
+- Coalescencia: el mismo texto ya en cola (o sonando) no se repite; se queda
+  una sola copia, con la prioridad mayor
+- Una respuesta NORMAL nueva descarta las NORMAL que aún no habían empezado
+
+Cada mensaje recibe un número de sesión al empezar; interrumpir cambia la
+sesión, así quien reproduce sabe que debe parar (`vigente(sesion)`).
+
+`encolar` devuelve el mensaje que lo representa en la cola (el ya existente
+si se coalesció); su evento `terminado` se activa cuando sale del
+planificador para siempre: reproducido, cortado sin volver a la cola o
+descartado. Así quien necesita secuenciar (rutinas) espera a que termine
+de sonar en lugar de estimar la duración con un sleep.
+
+Uso:
+    planificador = SpeechScheduler(reproducir=fn_bloqueante, interrumpir=fn_cortar)
+    mensaje = planificador.encolar(Mensaje(frases, PRIORIDAD_ALARMA, clave="..."))
+    mensaje.terminado.wait()
+"""
+
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRIORIDAD_INFO = 0      # Recordatorios de salud, Pomodoro: esperan su turno
+PRIORIDAD_NORMAL = 1    # Respuestas al usuario: la nueva sustituye a la anterior
+PRIORIDAD_ALARMA = 2    # Alarmas y recordatorios programados (CronosManager)
+PRIORIDAD_CRITICA = 3   # Alertas críticas de seguridad (NetworkGuardian)
+
+MAX_PENDIENTES = 20     # Tope de la cola: se descartan los menos prioritarios y más viejos
+
+
+class Mensaje:
+    """Algo que decir: frases (lista o iterable en streaming) + prioridad."""
+
+    def __init__(self, frases, prioridad: int = PRIORIDAD_NORMAL, clave: Optional[str] = None,
+                 stream: bool = False, **extra):
+        self.frases = frases
+        self.prioridad = prioridad
+        self.clave = clave            # Texto normalizado para coalescer (None = no se coalesce)
+        self.stream = stream
+        self.extra = extra            # Datos de quien reproduce (traza, preferir_local...)
+        self.sesion = None
+        self.orden = 0
+        self.creado = time.perf_counter()
+        self.terminado = threading.Event()  # Ya sonó, se cortó del todo o se descartó
+
+
+class SpeechScheduler:
+    """Cola de voz con prioridades, coalescencia e interrupciones; un solo hilo consumidor."""
+
+    def __init__(self, reproducir: Callable[[Mensaje], None], interrumpir: Callable[[], None]):
+        """
+        Args:
+            reproducir: Reproduce un mensaje completo (bloqueante; debe parar
+                cuando vigente(mensaje.sesion) sea False)
+            interrumpir: Corta en seco lo que esté sonando (se llama con el lock tomado)
+        """
+        self._reproducir = reproducir
+        self._interrumpir = interrumpir
+        self._cond = threading.Condition()
+        self._pendientes: List[Mensaje] = []
+        self._actual: Optional[Mensaje] = None
+        self._orden = itertools.count()
+        self.sesion = 0
+        self.coalescidos = 0
+        self.interrupciones = 0
+        self._hilo = threading.Thread(target=self._bucle, name="sara-voz", daemon=True)
+        self._hilo.start()
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def vigente(self, sesion) -> bool:
+        """True mientras el mensaje de esa sesión no haya sido interrumpido."""
+        return sesion is not None and sesion == self.sesion
+
+    def ocupado(self) -> bool:
+        """Hay algo sonando o esperando."""
+        with self._cond:
+            return self._actual is not None or bool(self._pendientes)
+
+    def encolar(self, mensaje: Mensaje) -> Mensaje:
+        """Encola el mensaje; devuelve el que lo representa (el existente si se coalesció)."""
+        with self._cond:
+            existente = self._coalescer(mensaje)
+            if existente is not None:
+                return existente
+
+            if mensaje.prioridad == PRIORIDAD_NORMAL:
+                # La respuesta nueva deja obsoletas las que no habían empezado
+                obsoletas = [p for p in self._pendientes if p.prioridad == PRIORIDAD_NORMAL]
+                self._pendientes = [p for p in self._pendientes if p.prioridad != PRIORIDAD_NORMAL]
+                for obsoleta in obsoletas:
+                    obsoleta.terminado.set()
+
+            mensaje.orden = next(self._orden)
+            self._pendientes.append(mensaje)
+            self._recortar_cola()
+
+            actual = self._actual
+            if actual is not None and self._desplaza(mensaje, actual):
+                if mensaje.prioridad > actual.prioridad and not actual.stream and actual.clave != mensaje.clave:
+                    # Se repetirá entero después (conserva su puesto entre los de su prioridad)
+                    self._pendientes.append(actual)
+                logger.info(f"📢 Voz interrumpida por mensaje de prioridad {mensaje.prioridad}")
+                self.interrupciones += 1
+                self._cortar()
+            self._cond.notify()
+            return mensaje
+
+    def detener(self):
+        """Calla lo que suena y descarta todo lo pendiente."""
+        with self._cond:
+            for pendiente in self._pendientes:
+                pendiente.terminado.set()
+            self._pendientes.clear()
+            if self._actual is not None:
+                self._cortar()
+
+    def estadisticas(self):
+        with self._cond:
+            return {
+                "pendientes": len(self._pendientes),
+                "coalescidos": self.coalescidos,
+                "interrupciones": self.interrupciones,
+            }
+
+    # ------------------------------------------------------------------
+    # Reglas
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _desplaza(nuevo: Mensaje, actual: Mensaje) -> bool:
+        return (nuevo.prioridad > actual.prioridad
+                or nuevo.prioridad == actual.prioridad == PRIORIDAD_NORMAL)
+
+    def _coalescer(self, mensaje: Mensaje) -> Optional[Mensaje]:
+        """El mensaje igual que ya está sonando o en cola, o None (se queda la prioridad mayor)."""
+        if mensaje.clave is None:
+            return None
+        for pendiente in self._pendientes:
+            if pendiente.clave == mensaje.clave:
+                self.coalescidos += 1
+                if mensaje.prioridad > pendiente.prioridad:
+                    # Lo sustituye la copia nueva, que puede interrumpir (y hereda quien la esperaba)
+                    self._pendientes.remove(pendiente)
+                    mensaje.terminado = pendiente.terminado
+                    return None
+                return pendiente
+        actual = self._actual
+        if actual is not None and actual.clave == mensaje.clave and mensaje.prioridad <= actual.prioridad:
+            self.coalescidos += 1
+            return actual
+        return None
+
+    def _recortar_cola(self):
+        while len(self._pendientes) > MAX_PENDIENTES:
+            descartado = min(self._pendientes, key=lambda m: (m.prioridad, m.orden))
+            self._pendientes.remove(descartado)
+            descartado.terminado.set()
+            logger.warning(f"📢 Cola de voz llena: descartado mensaje de prioridad {descartado.prioridad}")
+
+    def _cortar(self):
+        self.sesion += 1
+        self._interrumpir()
+
+    # ------------------------------------------------------------------
+    # Hilo consumidor
+    # ------------------------------------------------------------------
+    def _siguiente(self) -> Mensaje:
+        with self._cond:
+            while not self._pendientes:
+                self._cond.wait()
+            # Mayor prioridad primero; a igual prioridad, el más antiguo
+            mensaje = max(self._pendientes, key=lambda m: (m.prioridad, -m.orden))
+            self._pendientes.remove(mensaje)
+            self.sesion += 1
+            mensaje.sesion = self.sesion
+            self._actual = mensaje
+            return mensaje
+
+    def _bucle(self):
+        while True:
+            mensaje = self._siguiente()
+            try:
+                self._reproducir(mensaje)
+            except Exception as e:
+                logger.error(f"Error reproduciendo voz: {e}")
+            finally:
+                with self._cond:
+                    if self._actual is mensaje:
+                        self._actual = None
+                    if mensaje not in self._pendientes:  # Si volvió a la cola, aún no terminó
+                        mensaje.terminado.set()
@@ -0,0 +1,265 @@
+"""
+🧩 SARA - Structured Output
+============================
+
+Salida estructurada (JSON) de los LLM sin "raspar" texto libre.
+
+- Esquema tipado de las acciones del Smart Intent Router (volume, open_app,
+  search_web, timer...) -> JSON Schema para el modo nativo de cada proveedor:
+    · OpenAI: response_format json_schema
+    · Groq: response_format json_object
+    · Gemini: response_mime_type application/json
+    · Local (llama.cpp): json_object con schema (gramática)
+- `validar_accion`: normaliza y tipa cada acción (int("50") -> 50, alias
+  antiguos como "value" en media); las inválidas se descartan.
+- `ParserIncremental`: recibe el texto en streaming y entrega cada elemento
+  de un array en cuanto su objeto se cierra, para ejecutar "sube volumen al
+  50" antes de que llegue "pon rock".
+- `extraer_json`: parseo tolerante de una respuesta completa (bloques ```,
+  texto alrededor, comas finales).
+"""
+
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# acción -> parámetros tipados. "requeridos": todos obligatorios;
+# "alguno_de": al menos uno. Una tupla como tipo = enumeración de strings.
+ACCIONES_ROUTER: Dict[str, Dict[str, Any]] = {
+    "volume": {"params": {"level": int, "change": int}, "alguno_de": ["level", "change"]},
+    "brightness": {"params": {"level": int}, "requeridos": ["level"]},
+    "media": {"params": {"operation": ("play_pause", "next", "prev", "mute")}, "requeridos": ["operation"]},
+    "open_app": {"params": {"app_name": str}, "requeridos": ["app_name"]},
+    "search_web": {"params": {"query": str, "site": ("google", "youtube")}, "requeridos": ["query"]},
+    "timer": {"params": {"minutes": int, "message": str}, "requeridos": ["minutes"]},
+    "zen_mode": {"params": {"enable": bool}},
+    "chat": {"params": {"response": str}, "requeridos": ["response"]},
+}
+
+# Alias que los modelos usan a veces -> nombre canónico del parámetro
+_ALIAS_PARAMS = {"value": "operation", "app": "app_name", "text": "response", "message_text": "response"}
+
+_TIPOS_JSON = {int: "integer", str: "string", bool: "boolean", float: "number"}
+
+
+# ----------------------------------------------------------------------
+# Esquemas
+# ----------------------------------------------------------------------
+def _esquema_tipo(tipo) -> Dict[str, Any]:
+    if isinstance(tipo, tuple):
+        return {"type": "string", "enum": list(tipo)}
+    return {"type": _TIPOS_JSON[tipo]}
+
+
+def esquema_acciones(acciones: Dict[str, Dict] = ACCIONES_ROUTER) -> Dict[str, Any]:
+    """JSON Schema: {"actions": [{"action": ..., <params>}, ...]}."""
+    propiedades = {"action": {"type": "string", "enum": list(acciones)}}
+    for definicion in acciones.values():
+        for nombre, tipo in definicion["params"].items():
+            propiedades.setdefault(nombre, _esquema_tipo(tipo))
+    return {
+        "type": "object",
+        "properties": {
+            "actions": {
+                "type": "array",
+                "items": {"type": "object", "properties": propiedades, "required": ["action"]},
+            }
+        },
+        "required": ["actions"],
+    }
+
+
+def describir_acciones(acciones: Dict[str, Dict] = ACCIONES_ROUTER) -> str:
+    """Lista legible de acciones y parámetros para el prompt."""
+    lineas = []
+    for nombre, definicion in acciones.items():
+        params = []
+        for param, tipo in definicion["params"].items():
+            tipo_txt = "/".join(tipo) if isinstance(tipo, tuple) else _TIPOS_JSON[tipo]
+            params.append(f'"{param}": {tipo_txt}')
+        lineas.append(f'- "{nombre}": {{ {", ".join(params)} }}')
+    return "\n".join(lineas)
+
+
+def parametros_nativos(proveedor: str, esquema: Dict[str, Any], nombre: str = "respuesta") -> Dict[str, Any]:
+    """kwargs del modo JSON nativo de cada proveedor para la llamada de generación."""
+    if proveedor == "Gemini":
+        return {"generation_config": {"response_mime_type": "application/json"}}
+    if proveedor == "ChatGPT":
+        return {"response_format": {"type": "json_schema",
+                                    "json_schema": {"name": nombre, "schema": esquema}}}
+    if proveedor == "Local":
+        return {"response_format": {"type": "json_object", "schema": esquema}}
+    # Groq y cualquier otro compatible con OpenAI
+    return {"response_format": {"type": "json_object"}}
+
+
+# ----------------------------------------------------------------------
+# Validación
+# ----------------------------------------------------------------------
+def _coaccionar(valor, tipo):
+    if isinstance(tipo, tuple):
+        valor = str(valor).strip().lower()
+        return valor if valor in tipo else None
+    if tipo is bool:
+        if isinstance(valor, str):
+            return valor.strip().lower() in ("true", "si", "sí", "1", "on")
+        return bool(valor)
+    if tipo is int:
+        if isinstance(valor, str):
+            m = re.search(r"[-+]?\d+", valor)
+            return int(m.group()) if m else None
+        return int(valor)
+    return tipo(valor)
+
+
+def validar_accion(accion: Any, acciones: Dict[str, Dict] = ACCIONES_ROUTER) -> Optional[Dict[str, Any]]:
+    """Acción normalizada y tipada, o None si no cumple el esquema."""
+    if not isinstance(accion, dict):
+        return None
+    nombre = str(accion.get("action", "")).strip().lower()
+    definicion = acciones.get(nombre)
+    if definicion is None:
+        logger.debug(f"Acción desconocida descartada: {accion}")
+        return None
+
+    normalizada = {"action": nombre}
+    for clave, valor in accion.items():
+        clave = _ALIAS_PARAMS.get(clave, clave)
+        tipo = definicion["params"].get(clave)
+        if tipo is None or valor is None:
+            continue
+        try:
+            valor = _coaccionar(valor, tipo)
+        except (TypeError, ValueError):
+            valor = None
+        if valor is not None:
+            normalizada[clave] = valor
+
+    faltan = [p for p in definicion.get("requeridos", []) if p not in normalizada]
+    alguno = definicion.get("alguno_de")
+    if faltan or (alguno and not any(p in normalizada for p in alguno)):
+        logger.debug(f"Acción incompleta descartada: {accion}")
+        return None
+    return normalizada
+
+
+# ----------------------------------------------------------------------
+# Parseo
+# ----------------------------------------------------------------------
+def _sin_comas_finales(texto: str) -> str:
+    return re.sub(r",\s*([\]}])", r"\1", texto)
+
+
+def extraer_json(texto: str) -> Any:
+    """
+    Parseo tolerante de una respuesta completa: ignora bloques ``` y texto
+    alrededor, acepta comas finales. Lanza ValueError si no hay JSON.
+    """
+    texto = (texto or "").strip()
+    for candidato in (texto, _sin_comas_finales(texto)):
+        try:
+            return json.loads(candidato)
+        except ValueError:
+            pass
+
+    inicio = min((i for i in (texto.find("{"), texto.find("[")) if i != -1), default=-1)
+    if inicio == -1:
+        raise ValueError("La respuesta no contiene JSON")
+    fin = max(texto.rfind("}"), texto.rfind("]"))
+    fragmento = texto[inicio:fin + 1]
+    try:
+        return json.loads(_sin_comas_finales(fragmento))
+    except ValueError as e:
+        raise ValueError(f"JSON inválido: {e}")
+
+
+class ParserIncremental:
+    """
+    Entrega los objetos de cualquier array en cuanto se cierran, mientras el
+    texto sigue llegando. Funciona con `[...]`, con `{"actions": [...]}` y
+    con texto/``` alrededor. Un objeto suelto en la raíz se entrega al final.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self._pila: List[str] = []
+        self._inicio_objeto: List[int] = []
+        self._en_string = False
+        self._escape = False
+        self._pos = 0
+        self.entregados = 0
+
+    def alimentar(self, fragmento: str) -> Iterator[Any]:
+        """Añade texto y devuelve los elementos de array completados."""
+        for caracter in fragmento:
+            self.buffer.append(caracter)
+            elemento = self._procesar(caracter)
+            self._pos += 1
+            if elemento is not None:
+                yield elemento
+
+    def _procesar(self, c: str):
+        if self._en_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._en_string = False
+            return None
+
+        if c == '"':
+            if self._pila:
+                self._en_string = True
+        elif c in "[{":
+            self._pila.append(c)
+            if c == "{":
+                self._inicio_objeto.append(self._pos)
+        elif c in "]}" and self._pila:
+            abierto = self._pila.pop()
+            if c == "}" and abierto == "{":
+                inicio = self._inicio_objeto.pop()
+                if self._pila and self._pila[-1] == "[":
+                    texto = "".join(self.buffer[inicio:self._pos + 1])
+                    try:
+                        objeto = json.loads(_sin_comas_finales(texto))
+                    except ValueError:
+                        logger.debug(f"Elemento JSON ilegible: {texto[:80]}")
+                        return None
+                    self.entregados += 1
+                    return objeto
+        return None
+
+    def texto(self) -> str:
+        return "".join(self.buffer)
+
+    def resultado(self) -> Any:
+        """JSON completo al terminar el stream (None si no se puede parsear)."""
+        try:
+            return extraer_json(self.texto())
+        except ValueError:
+            return None
+
+
+def acciones_de(datos: Any) -> List[Any]:
+    """Lista de acciones de una respuesta completa ([...], {"actions": [...]} o una sola)."""
+    if isinstance(datos, list):
+        return datos
+    if isinstance(datos, dict):
+        if isinstance(datos.get("actions"), list):
+            return datos["actions"]
+        if "action" in datos:
+            return [datos]
+    return []
+
+
+def solo_acciones(datos: Any) -> bool:
+    """True si la respuesta trae acciones y ninguna es "chat" (la conversación no se cachea)."""
+    acciones = acciones_de(datos)
+    return bool(acciones) and all(
+        isinstance(accion, dict) and accion.get("action") not in (None, "chat") for accion in acciones
+    )
@@ -1,6 +1,7 @@
 import os
 import logging
 from typing import Optional, List, Tuple
+from context_budget import obtener_context_budget
 try:
     import PyPDF2
 except ImportError:
@@ -31,22 +32,22 @@ class StudyAssistant:
             if not text.strip():
                 return "❌ No se pudo extraer texto del PDF (puede estar protegido o ser imagen)"
             
-            # Limitar texto si es muy largo (max 4000 caracteres para IA)
-            if len(text) > 4000:
-                text = text[:4000] + "..."
-            
             # Resumir con IA
             if self.ia_callback:
-                prompt = f"""Resume el siguiente documento de forma concisa y estructurada.
+                instrucciones = """Resume el siguiente documento de forma concisa y estructurada.
 Incluye:
 - Tema principal
 - Puntos clave (máximo 5)
 - Conclusión
 
 Documento:
-{text}"""
+"""
+                # Documentos largos: trozos más representativos (inicio y final incluidos) en vez de cortar
+                budget = obtener_context_budget()
+                text = budget.recortar_documento(text, budget.presupuesto_documento(instrucciones))
+                prompt = instrucciones + text
                 
-                summary, _ = self.ia_callback(prompt)
+                summary, _ = self.ia_callback(prompt, sitio="resumen")
                 return f"📄 Resumen del PDF:\n\n{summary}"
             else:
                 return f"📄 Texto extraído ({len(text)} caracteres):\n\n{text[:500]}..."
@@ -69,7 +70,7 @@ A: [Respuesta concisa]
 
 Asegúrate de que las preguntas sean variadas (definiciones, ejemplos, aplicaciones, etc.)"""
             
-            flashcards, _ = self.ia_callback(prompt)
+            flashcards, _ = self.ia_callback(prompt, sitio="estudio", clave_semantica=f"{count} flashcards {topic}")
             
             return f"🃏 Flashcards sobre '{topic}':\n\n{flashcards}\n\n💡 Úsalas para estudiar y memorizar conceptos clave."
             
@@ -92,22 +93,21 @@ Asegúrate de que las preguntas sean variadas (definiciones, ejemplos, aplicacio
             if not text.strip():
                 return "❌ No se pudo extraer texto del PDF"
             
-            # Limitar texto
-            if len(text) > 3000:
-                text = text[:3000] + "..."
-            
             # Generar flashcards con IA
             if self.ia_callback:
-                prompt = f"""Basándote en el siguiente documento, genera {count} flashcards educativas.
+                instrucciones = f"""Basándote en el siguiente documento, genera {count} flashcards educativas.
 
 Formato:
 Q: [Pregunta]
 A: [Respuesta]
 
 Documento:
-{text}"""
+"""
+                budget = obtener_context_budget()
+                text = budget.recortar_documento(text, budget.presupuesto_documento(instrucciones))
+                prompt = instrucciones + text
                 
-                flashcards, _ = self.ia_callback(prompt)
+                flashcards, _ = self.ia_callback(prompt, sitio="estudio")
                 return f"🃏 Flashcards del PDF:\n\n{flashcards}"
             else:
                 return "❌ IA no disponible"
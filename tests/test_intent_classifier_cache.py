@@ -0,0 +1,106 @@
+"""
+Cache de resultados del clasificador híbrido: una Capa 3 (IA) caída no se
+etiqueta como "ai" ni se cachea, así que el siguiente intento vuelve a la IA.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import intent_classifier  # noqa: E402
+
+
+class EncoderPalabras:
+    """Encoder de prueba: bolsa de palabras con hash (sin modelos)."""
+
+    encoder_id = "test:palabras"
+
+    def encode(self, sentences, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        unico = isinstance(sentences, str)
+        textos = [sentences] if unico else list(sentences)
+        matriz = np.zeros((len(textos), 64), dtype=np.float32)
+        for fila, texto in enumerate(textos):
+            for palabra in texto.lower().split():
+                matriz[fila, hash(palabra) % 64] += 1.0
+        if normalize_embeddings:
+            normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+            normas[normas == 0] = 1.0
+            matriz = matriz / normas
+        return matriz[0] if unico else matriz
+
+
+@pytest.fixture
+def clasificador(tmp_path, monkeypatch):
+    monkeypatch.setattr(intent_classifier, "crear_backend", lambda nombre=None: EncoderPalabras())
+    respuestas = []
+
+    def ia_callback(prompt, sitio=None):
+        respuesta = respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta, "Test"
+
+    clasificador = intent_classifier.HybridIntentClassifier(
+        ia_callback=ia_callback,
+        ejemplos={"CLIMA": ["qué tiempo hace"], "CONVERSACION": ["hola qué tal"]},
+        cache_dir=tmp_path,
+    )
+    assert clasificador.esperar_modelo(timeout=10)
+    clasificador.respuestas = respuestas
+    return clasificador
+
+
+def test_fallo_de_ia_no_se_cachea_y_se_reintenta(clasificador):
+    clasificador.respuestas.extend([RuntimeError("proveedor caído"), '{"intent": "CLIMA"}'])
+
+    intent, _, source = clasificador.clasificar("xyzzy plugh")
+    assert (intent, source) == ("CONVERSACION", "fallback")
+
+    intent, _, source = clasificador.clasificar("xyzzy plugh")
+    assert (intent, source) == ("CLIMA", "ai")
+    assert clasificador.respuestas == []  # La IA se consultó las dos veces
+    assert clasificador.estadisticas_cache()["llamadas_ia_ahorradas"] == 0
+
+
+def test_respuesta_de_ia_valida_se_sirve_del_cache(clasificador):
+    clasificador.respuestas.append('{"intent": "CLIMA"}')
+
+    assert clasificador.clasificar("xyzzy plugh")[2] == "ai"
+    hits = clasificador.estadisticas_cache()["hits"]
+
+    assert clasificador.clasificar("xyzzy plugh")[2] == "ai"
+    estadisticas = clasificador.estadisticas_cache()
+    assert estadisticas["hits"] == hits + 1
+    assert estadisticas["llamadas_ia_ahorradas"] == 1
+    assert clasificador.respuestas == []
+
+
+def test_aprender_de_la_ia_no_vacia_el_cache(clasificador):
+    clasificador.respuestas.append('{"intent": "CLIMA"}')
+
+    assert clasificador.clasificar("qué tiempo hace")[2] == "ml"
+    assert clasificador.clasificar("xyzzy plugh")[2] == "ai"
+    assert clasificador.estadisticas_cache()["entradas"] == 2
+
+    hits = clasificador.estadisticas_cache()["hits"]
+    assert clasificador.clasificar("qué tiempo hace")[2] == "ml"
+    assert clasificador.estadisticas_cache()["hits"] == hits + 1
+
+
+def test_cache_dir_propio_no_toca_el_directorio_de_modelos(tmp_path, monkeypatch):
+    monkeypatch.setattr(intent_classifier, "crear_backend", lambda nombre=None: EncoderPalabras())
+    monkeypatch.setattr(intent_classifier, "CACHE_DIR", tmp_path / "modelos")
+    monkeypatch.delenv("SENTENCE_TRANSFORMERS_HOME", raising=False)
+
+    clasificador = intent_classifier.HybridIntentClassifier(
+        ejemplos={"CLIMA": ["qué tiempo hace"]}, cache_dir=tmp_path / "instancia"
+    )
+    assert clasificador.esperar_modelo(timeout=10)
+    assert (tmp_path / "instancia").is_dir()
+    assert not (tmp_path / "modelos").exists()
+    assert "SENTENCE_TRANSFORMERS_HOME" not in os.environ
@@ -0,0 +1,84 @@
+"""
+Connectors de tts_io: la ClientSession de edge-tts es dueña del connector que
+recibe y lo cierra al terminar, así que varias frases a la vez no pueden
+compartir uno. Cada frase recibe el suyo y comparten la resolución DNS.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+aiohttp = pytest.importorskip("aiohttp")
+pytest.importorskip("edge_tts")
+from aiohttp import web  # noqa: E402
+
+import tts_io  # noqa: E402
+
+
+class ComunicadorFalso:
+    """Imita edge_tts.Communicate: una ClientSession por frase que cierra su connector."""
+
+    def __init__(self, texto, voz, rate="+0%", volume="+0%", connector=None):
+        self.texto = texto
+        self.connector = connector
+
+    async def stream(self):
+        retardo = float(self.texto)
+        async with aiohttp.ClientSession(connector=self.connector) as sesion:
+            for _ in range(3):
+                await asyncio.sleep(retardo)
+                async with sesion.get(ComunicadorFalso.url) as respuesta:
+                    yield {"type": "audio", "data": await respuesta.read()}
+
+
+@pytest.fixture
+def io(monkeypatch):
+    monkeypatch.setattr(tts_io.edge_tts, "Communicate", ComunicadorFalso)
+    servicio = tts_io.TTSIOLoop(max_paralelas=3)
+
+    async def audio(request):
+        return web.Response(body=b"mp3")
+
+    async def arrancar_servidor():
+        app = web.Application()
+        app.router.add_get("/", audio)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        sitio = web.TCPSite(runner, "localhost", 0)
+        await sitio.start()
+        return runner, sitio._server.sockets[0].getsockname()[1]
+
+    runner, puerto = servicio.programar(arrancar_servidor()).result(timeout=5)
+    ComunicadorFalso.url = f"http://localhost:{puerto}/"
+    yield servicio
+    servicio.programar(runner.cleanup()).result(timeout=5)
+    servicio.cerrar()
+
+
+def test_tres_sintesis_concurrentes_con_connectors_propios(io):
+    consultas_dns = []
+    resolver_real = io._resolver._resolver.resolve
+
+    async def resolver_contando(host, port=0, family=0):
+        consultas_dns.append(host)
+        return await resolver_real(host, port, family=family)
+
+    io._resolver._resolver.resolve = resolver_contando
+    connectors = []
+
+    async def sintetizar(retardo):
+        communicate = io.comunicador(str(retardo), "voz", "+0%", "+0%")
+        connectors.append(communicate.connector)
+        return b"".join([chunk["data"] async for chunk in communicate.stream()])
+
+    # Distintas duraciones: la primera en terminar cierra su connector con las otras en vuelo
+    futuros = [io.ejecutar(sintetizar(retardo)) for retardo in (0.01, 0.05, 0.1)]
+
+    assert [f.result(timeout=10) for f in futuros] == [b"mp3mp3mp3"] * 3
+    assert len({id(c) for c in connectors}) == 3
+    assert all(c.closed for c in connectors)  # Cada sesión cerró solo el suyo
+    assert consultas_dns == ["localhost"]  # Una sola consulta DNS compartida
@@ -0,0 +1,42 @@
+"""
+Cortes de segmentos MP3 en voice: solo en límites de frame reales, recorriendo
+las cabeceras; un 0xFF seguido de bits de sync dentro del audio no es un corte.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+pytest.importorskip("pygame")
+import voice  # noqa: E402
+
+CABECERA = b"\xff\xf3\x64\xc4"  # MPEG-2 Layer III, 48 kbps, 24 kHz, mono (formato de edge-tts)
+
+
+def frame(relleno=b"\x00", padding=False):
+    """Frame de 144 bytes (145 con padding) con un falso sync en mitad del audio"""
+    cabecera = CABECERA[:2] + bytes([CABECERA[2] | 0x02 if padding else CABECERA[2]]) + CABECERA[3:]
+    longitud = 145 if padding else 144
+    cuerpo = bytearray(relleno * (longitud - 4))
+    cuerpo[70:72] = b"\xff\xf3"
+    return cabecera + bytes(cuerpo)
+
+
+def test_longitud_de_frame_de_edge_tts():
+    assert voice._longitud_frame_mp3(frame(), 0) == 144
+    assert voice._longitud_frame_mp3(frame(padding=True), 0) == 145
+    assert voice._longitud_frame_mp3(b"\xff\xf3\xf4\xc4", 0) == 0  # Bitrate inválido
+
+
+def test_corte_ignora_sync_falso_dentro_del_frame():
+    datos = frame() + frame(padding=True) + frame() + frame()[:100]
+    assert voice._corte_frames_mp3(datos, 0) == 144 + 145 + 144
+    assert voice._corte_frames_mp3(datos, 144 + 145 + 145) == -1
+
+
+def test_corte_se_sincroniza_tras_basura_inicial():
+    datos = b"ID3\x00\xff\xf3" + frame() + frame()
+    assert voice._corte_frames_mp3(datos, 0) == len(datos)
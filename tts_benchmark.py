@@ -0,0 +1,159 @@
+"""
+📊 SARA - TTS Benchmark
+========================
+
+Compara la latencia de los backends de voz sobre las mismas frases:
+
+- edge-tts (neural, en la nube) por el loop de tts_io, con el resolver DNS
+  compartido, igual que en NeuralVoiceEngine
+- voz local (Piper o pyttsx3, ver tts_local.py)
+
+Por backend y frase mide el tiempo hasta el primer audio (lo que percibe el
+usuario) y el tiempo total de síntesis; el reporte resume medianas y p90 por
+backend. El cache de audio NO interviene: se mide siempre la síntesis real.
+
+    python tts_benchmark.py
+    python tts_benchmark.py --repeticiones 5 --salida tts_benchmark.json
+    python tts_benchmark.py --modelo-local voces/es_ES-davefx-medium.onnx
+"""
+
+import asyncio
+import json
+import logging
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from tts_io import obtener_tts_io
+from tts_local import obtener_tts_local
+from voice import VOIZ_NEURAL, VOICE_RATE, VOICE_VOLUME, FRASES_SISTEMA
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_VERSION = 1
+TIMEOUT_FRASE = 30
+
+# Confirmaciones cortas + frases típicas de respuesta
+FRASES_BENCHMARK = list(FRASES_SISTEMA) + [
+    "Volumen al cincuenta por ciento.",
+    "Alerta crítica. Nuevo dispositivo desconocido conectado a la red.",
+    "Según tu calendario, hoy tienes tres reuniones y la primera empieza a las diez de la mañana.",
+]
+
+
+async def _medir_edge(texto: str) -> Dict[str, float]:
+    inicio = time.perf_counter()
+    primer_audio = None
+    communicate = obtener_tts_io().comunicador(texto, VOIZ_NEURAL, VOICE_RATE, VOICE_VOLUME)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio" and primer_audio is None:
+            primer_audio = time.perf_counter() - inicio
+    total = time.perf_counter() - inicio
+    return {"primer_audio_ms": (primer_audio or total) * 1000, "total_ms": total * 1000}
+
+
+def medir_edge(texto: str) -> Dict[str, float]:
+    return obtener_tts_io().ejecutar(_medir_edge(texto)).result(timeout=TIMEOUT_FRASE)
+
+
+def medir_local(backend, texto: str) -> Dict[str, float]:
+    # Sin streaming: el primer audio llega con la frase completa
+    inicio = time.perf_counter()
+    backend.sintetizar(texto).result(timeout=TIMEOUT_FRASE)
+    total = (time.perf_counter() - inicio) * 1000
+    return {"primer_audio_ms": total, "total_ms": total}
+
+
+def _p90(valores: List[float]) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(0.9 * (len(ordenados) - 1))))]
+
+
+def _resumir(medidas: List[Dict[str, float]], errores: int) -> Dict[str, Any]:
+    if not medidas:
+        return {"muestras": 0, "errores": errores}
+    primer = [m["primer_audio_ms"] for m in medidas]
+    total = [m["total_ms"] for m in medidas]
+    return {
+        "muestras": len(medidas),
+        "errores": errores,
+        "primer_audio_ms": {"mediana": round(statistics.median(primer), 1), "p90": round(_p90(primer), 1)},
+        "total_ms": {"mediana": round(statistics.median(total), 1), "p90": round(_p90(total), 1)},
+    }
+
+
+def ejecutar_benchmark(repeticiones: int = 3, modelo_local: str = "",
+                       frases: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Mide cada backend disponible sobre las frases (con una pasada de calentamiento)."""
+    frases = frases or FRASES_BENCHMARK
+    backends = {"edge-tts": medir_edge}
+
+    local = obtener_tts_local(modelo_local)
+    if local is not None:
+        try:
+            local.listo_future.result(timeout=TIMEOUT_FRASE)
+            backends[f"local:{local.nombre}"] = lambda texto: medir_local(local, texto)
+        except Exception as e:
+            logger.warning(f"Voz local no disponible para el benchmark: {e}")
+
+    reporte = {
+        "meta": {
+            "version": BENCHMARK_VERSION,
+            "frases": len(frases),
+            "repeticiones": repeticiones,
+            "voz_neural": VOIZ_NEURAL,
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "backends": {},
+    }
+    for nombre, medir in backends.items():
+        try:
+            medir(frases[0])  # Calentamiento (DNS, TLS, carga del modelo)
+        except Exception as e:
+            logger.warning(f"{nombre}: calentamiento fallido ({e})")
+        medidas, errores = [], 0
+        for _ in range(repeticiones):
+            for frase in frases:
+                try:
+                    medidas.append(medir(frase))
+                except Exception as e:
+                    errores += 1
+                    logger.debug(f"{nombre}: error en '{frase}': {e}")
+        reporte["backends"][nombre] = _resumir(medidas, errores)
+    return reporte
+
+
+def guardar_reporte(reporte: Dict[str, Any], ruta: Path):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _imprimir_reporte(reporte: Dict[str, Any]):
+    meta = reporte["meta"]
+    print("\n📊 BENCHMARK TTS\n" + "=" * 50)
+    print(f"Frases x repeticiones: {meta['frases']} x {meta['repeticiones']}")
+    for nombre, datos in reporte["backends"].items():
+        if not datos["muestras"]:
+            print(f"{nombre:<18} sin muestras ({datos['errores']} errores)")
+            continue
+        primer, total = datos["primer_audio_ms"], datos["total_ms"]
+        print(f"{nombre:<18} primer audio {primer['mediana']:>7.1f} ms (p90 {primer['p90']:.1f})"
+              f" | total {total['mediana']:>7.1f} ms (p90 {total['p90']:.1f})"
+              f" | errores {datos['errores']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Benchmark de latencia de los backends de voz de SARA")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--modelo-local", default="", help="Modelo Piper .onnx (si no, voz del sistema)")
+    parser.add_argument("--salida", default="tts_benchmark.json")
+    args = parser.parse_args()
+
+    reporte = ejecutar_benchmark(args.repeticiones, args.modelo_local)
+    _imprimir_reporte(reporte)
+    guardar_reporte(reporte, Path(args.salida))
+    print(f"\n💾 Reporte guardado en {args.salida}")
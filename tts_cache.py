@@ -0,0 +1,152 @@
+"""
+🔊 SARA - TTS Cache
+====================
+
+Cache persistente del audio de las frases que SARA repite constantemente
+("Dime.", "Dictado finalizado.", avisos del Pomodoro, recordatorios de salud,
+plantillas de alertas...).
+
+- Direccionado por contenido: la clave es el hash de (texto limpio, voz,
+  velocidad, volumen); cambiar la voz no reutiliza audio de otra
+- Un archivo MP3 por frase en .sara_tts_cache/
+- Tope de tamaño total con expulsión LRU (la fecha de modificación del
+  archivo hace de "último uso", así el orden sobrevive a los reinicios)
+- Las frases cacheadas suenan sin ir a la red: latencia casi nula y
+  funcionan sin conexión
+
+Uso:
+    cache = obtener_tts_cache()
+    audio = cache.obtener(texto, voz, rate, volumen)   # bytes MP3 o None
+    cache.guardar(texto, voz, rate, volumen, audio)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(__file__).resolve().parent / ".sara_tts_cache"
+MAX_BYTES_CACHE = 50 * 1024 * 1024   # ~2000 frases cortas a 48 kbps
+MAX_CHARS_FRASE_CACHE = 160           # Las respuestas largas del LLM no se repiten: no se guardan
+
+
+def clave_audio(texto: str, voz: str, rate: str, volumen: str) -> str:
+    """Hash de contenido de una frase sintetizada."""
+    return hashlib.sha256(f"{voz}|{rate}|{volumen}|{texto}".encode("utf-8")).hexdigest()
+
+
+class PhraseAudioCache:
+    """Audio MP3 por frase en disco, con tope de tamaño LRU."""
+
+    def __init__(self, directorio: Path = CACHE_DIR, max_bytes: int = MAX_BYTES_CACHE):
+        self.directorio = Path(directorio)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._indice: "OrderedDict[str, int]" = OrderedDict()  # clave -> tamaño, del más antiguo al más reciente
+        self._total = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._cargar_indice()
+
+    def _cargar_indice(self):
+        try:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            archivos = []
+            for ruta in self.directorio.glob("*.mp3"):
+                info = ruta.stat()
+                archivos.append((info.st_mtime, ruta.stem, info.st_size))
+            for _, clave, tamano in sorted(archivos):
+                self._indice[clave] = tamano
+                self._total += tamano
+            logger.info(f"🔊 Cache de audio TTS: {len(self._indice)} frases ({self._total // 1024} KB)")
+        except Exception as e:
+            logger.error(f"Error cargando cache de audio TTS: {e}")
+
+    def _ruta(self, clave: str) -> Path:
+        return self.directorio / f"{clave}.mp3"
+
+    @staticmethod
+    def cacheable(texto: str) -> bool:
+        return bool(texto) and len(texto) <= MAX_CHARS_FRASE_CACHE
+
+    def contiene(self, texto: str, voz: str, rate: str, volumen: str) -> bool:
+        with self._lock:
+            return clave_audio(texto, voz, rate, volumen) in self._indice
+
+    def obtener(self, texto: str, voz: str, rate: str, volumen: str) -> Optional[bytes]:
+        """Audio de la frase o None si no está cacheada."""
+        clave = clave_audio(texto, voz, rate, volumen)
+        with self._lock:
+            if clave not in self._indice:
+                self.fallos += 1
+                return None
+            self._indice.move_to_end(clave)
+        ruta = self._ruta(clave)
+        try:
+            datos = ruta.read_bytes()
+            os.utime(ruta)  # Último uso (orden LRU tras reiniciar)
+        except OSError:
+            with self._lock:
+                self._total -= self._indice.pop(clave, 0)
+                self.fallos += 1
+            return None
+        with self._lock:
+            self.aciertos += 1
+        return datos
+
+    def guardar(self, texto: str, voz: str, rate: str, volumen: str, audio: bytes):
+        """Guarda el audio de una frase y expulsa las menos usadas si se supera el tope."""
+        if not audio or not self.cacheable(texto):
+            return
+        clave = clave_audio(texto, voz, rate, volumen)
+        ruta = self._ruta(clave)
+        temporal = ruta.with_suffix(".tmp")
+        try:
+            temporal.write_bytes(audio)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.debug(f"No se pudo guardar audio TTS: {e}")
+            return
+
+        with self._lock:
+            self._total += len(audio) - self._indice.pop(clave, 0)
+            self._indice[clave] = len(audio)
+            expulsadas = []
+            while self._total > self.max_bytes and len(self._indice) > 1:
+                vieja, tamano = self._indice.popitem(last=False)
+                self._total -= tamano
+                expulsadas.append(vieja)
+
+        for vieja in expulsadas:
+            try:
+                self._ruta(vieja).unlink()
+            except OSError:
+                pass
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "frases": len(self._indice),
+                "bytes": self._total,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+            }
+
+
+_tts_cache_instance = None
+_tts_cache_lock = threading.Lock()
+
+
+def obtener_tts_cache() -> PhraseAudioCache:
+    """Obtiene el cache de audio TTS global (singleton)."""
+    global _tts_cache_instance
+    if _tts_cache_instance is None:
+        with _tts_cache_lock:
+            if _tts_cache_instance is None:
+                _tts_cache_instance = PhraseAudioCache()
+    return _tts_cache_instance
@@ -0,0 +1,156 @@
+"""
+🗣️ SARA - TTS I/O
+==================
+
+Servicio de síntesis de voz con UN event loop de larga vida.
+
+Antes cada frase hacía `asyncio.run(...)` en un ThreadPoolExecutor: un event
+loop nuevo (y destruido) por frase, más un hilo del pool ocupado mientras
+duraba el websocket. Ahora hay un solo hilo con su loop y la síntesis de cada
+frase es una corrutina:
+
+- Paralelismo acotado con un semáforo (max_paralelas frases a la vez)
+- Un resolver DNS con cache compartido por todas las frases. edge-tts abre su
+  propia aiohttp.ClientSession por frase y la cierra junto con el connector
+  que reciba (es dueña de él), así que cada frase recibe un TCPConnector
+  nuevo: compartir uno solo rompía las síntesis concurrentes en cuanto la
+  primera terminaba. Lo que sí se reutiliza entre frases es la resolución
+  DNS (una sola consulta aunque arranquen varias frases a la vez) y el
+  contexto TLS, que edge-tts ya mantiene a nivel de módulo. Si la versión
+  instalada de edge-tts no acepta `connector`, se usa sin él
+- `ejecutar(...)` devuelve un `concurrent.futures.Future`: cancelarlo cancela
+  la tarea y cierra su websocket (hablar() y detener() cortan lo que esté en
+  vuelo)
+
+Uso:
+    io = obtener_tts_io()
+    futuro = io.ejecutar(corrutina_de_sintesis)
+    comunicador = io.comunicador(texto, voz, rate, volumen)  # dentro del loop
+"""
+
+import asyncio
+import inspect
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+import aiohttp
+import edge_tts
+from aiohttp.abc import AbstractResolver
+
+logger = logging.getLogger(__name__)
+
+MAX_SINTESIS_PARALELAS = 3   # Frases sintetizándose a la vez
+TTL_DNS_SEGUNDOS = 300       # Cache DNS del servicio de voz
+
+
+class _ResolverCompartido(AbstractResolver):
+    """Resolver DNS con cache y consultas en vuelo compartidas entre los connectors de cada frase."""
+
+    def __init__(self, ttl: float = TTL_DNS_SEGUNDOS):
+        self._resolver = aiohttp.DefaultResolver()
+        self._ttl = ttl
+        self._cache = {}      # (host, puerto, familia) -> (expira, direcciones)
+        self._en_curso = {}   # (host, puerto, familia) -> Task
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET):
+        clave = (host, port, family)
+        entrada = self._cache.get(clave)
+        if entrada is not None and entrada[0] > time.monotonic():
+            return entrada[1]
+        if clave not in self._en_curso:
+            self._en_curso[clave] = asyncio.ensure_future(self._consultar(clave))
+        # shield: cancelar una frase no cancela la consulta que esperan las demás
+        return await asyncio.shield(self._en_curso[clave])
+
+    async def _consultar(self, clave):
+        host, port, family = clave
+        try:
+            direcciones = await self._resolver.resolve(host, port, family=family)
+            self._cache[clave] = (time.monotonic() + self._ttl, direcciones)
+            return direcciones
+        finally:
+            self._en_curso.pop(clave, None)
+
+    async def close(self):
+        # Los connectors de cada frase no son dueños del resolver: vive lo que el loop
+        pass
+
+    async def cerrar(self):
+        await self._resolver.close()
+
+
+class TTSIOLoop:
+    """Event loop dedicado a la síntesis de voz (un solo hilo para toda SARA)."""
+
+    def __init__(self, max_paralelas: int = MAX_SINTESIS_PARALELAS):
+        self.max_paralelas = max_paralelas
+        self._semaforo = None
+        self._resolver = None
+        self._acepta_connector = "connector" in inspect.signature(edge_tts.Communicate).parameters
+        if not self._acepta_connector:
+            logger.info("edge-tts sin soporte de connector: cada frase resolverá DNS por su cuenta")
+
+        self.loop = asyncio.new_event_loop()
+        self._hilo = threading.Thread(target=self._correr, name="sara-tts-io", daemon=True)
+        self._hilo.start()
+        asyncio.run_coroutine_threadsafe(self._preparar(), self.loop).result()
+
+    def _correr(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _preparar(self):
+        # Semáforo y resolver se crean dentro del loop que los va a usar
+        self._semaforo = asyncio.Semaphore(self.max_paralelas)
+        self._resolver = _ResolverCompartido()
+
+    def programar(self, coro) -> Future:
+        """Programa una corrutina auxiliar sin ocupar plaza del semáforo (productores)."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def ejecutar(self, coro) -> Future:
+        """Programa una corrutina de síntesis (acotada por el semáforo)."""
+        return asyncio.run_coroutine_threadsafe(self._acotada(coro), self.loop)
+
+    async def _acotada(self, coro):
+        try:
+            async with self._semaforo:
+                return await coro
+        finally:
+            coro.close()  # Cancelada antes de empezar: evita el aviso de corrutina sin await
+
+    def comunicador(self, texto: str, voz: str, rate: str, volumen: str):
+        """edge_tts.Communicate con su propio connector sobre el resolver compartido (llamar dentro del loop)."""
+        if self._acepta_connector:
+            # Connector nuevo por frase: la ClientSession de edge-tts lo cierra al terminar
+            connector = aiohttp.TCPConnector(resolver=self._resolver)
+            return edge_tts.Communicate(texto, voz, rate=rate, volume=volumen, connector=connector)
+        return edge_tts.Communicate(texto, voz, rate=rate, volume=volumen)
+
+    def cerrar(self):
+        """Cierra el resolver y detiene el loop."""
+        async def _cerrar():
+            if self._resolver is not None:
+                await self._resolver.cerrar()
+        try:
+            asyncio.run_coroutine_threadsafe(_cerrar(), self.loop).result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_tts_io_instance = None
+_tts_io_lock = threading.Lock()
+
+
+def obtener_tts_io(max_paralelas: int = MAX_SINTESIS_PARALELAS) -> TTSIOLoop:
+    """Obtiene el servicio de síntesis global (singleton)."""
+    global _tts_io_instance
+    if _tts_io_instance is None:
+        with _tts_io_lock:
+            if _tts_io_instance is None:
+                _tts_io_instance = TTSIOLoop(max_paralelas)
+    return _tts_io_instance
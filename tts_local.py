@@ -0,0 +1,179 @@
+"""
+🔈 SARA - TTS Local
+====================
+
+Síntesis de voz sin red, como respaldo de edge-tts.
+
+Backends (el primero disponible):
+- Piper (`pip install piper-tts`): TTS neural en CPU con un modelo .onnx
+  (tts_local_model / SARA_TTS_LOCAL_MODEL, p.ej. es_ES-davefx-medium.onnx).
+  Genera el WAV directamente en memoria.
+- pyttsx3 (`pip install pyttsx3`): motor de voz del sistema (SAPI5 en
+  Windows, espeak en Linux, NSSpeech en macOS). No tiene API en memoria:
+  escribe en un único WAV temporal del directorio temporal del sistema.
+
+Cada backend tiene su propio hilo (pyttsx3/COM exige usar el motor desde el
+hilo que lo creó) y carga en segundo plano. `sintetizar(texto)` devuelve un
+Future con el audio WAV; NeuralVoiceEngine lo reproduce igual que el MP3 de
+edge-tts.
+
+Uso:
+    local = obtener_tts_local(model_path)   # None si no hay backend
+    wav = local.sintetizar("Hecho.").result()
+"""
+
+import io
+import logging
+import os
+import tempfile
+import threading
+import wave
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+VELOCIDAD_PYTTSX3 = 185  # Palabras por minuto (por defecto ~200: algo rápido en español)
+
+pyttsx3 = None
+PiperVoice = None
+
+
+def _lazy_import_pyttsx3():
+    """Importa pyttsx3 solo cuando se necesita"""
+    global pyttsx3
+    if pyttsx3 is None:
+        try:
+            import pyttsx3 as p
+            pyttsx3 = p
+        except ImportError:
+            logger.debug("pyttsx3 no disponible")
+    return pyttsx3
+
+
+def _lazy_import_piper():
+    """Importa piper solo cuando se necesita"""
+    global PiperVoice
+    if PiperVoice is None:
+        try:
+            from piper import PiperVoice as P
+            PiperVoice = P
+        except ImportError:
+            logger.debug("piper-tts no disponible")
+    return PiperVoice
+
+
+class LocalTTSBackend:
+    """Base de los backends locales: un hilo propio y carga en segundo plano."""
+
+    nombre = "local"
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sara-tts-{self.nombre}")
+        self.listo_future: Future = self._executor.submit(self._cargar)
+
+    def _cargar(self):
+        try:
+            self._iniciar()
+            logger.info(f"✅ Voz local lista ({self.nombre})")
+        except Exception as e:
+            logger.warning(f"⚠️ Voz local {self.nombre} no disponible: {e}")
+            raise
+
+    def _iniciar(self):
+        raise NotImplementedError
+
+    def _sintetizar(self, texto: str) -> bytes:
+        raise NotImplementedError
+
+    def listo(self) -> bool:
+        """True si el backend ya cargó (sin bloquear)."""
+        return self.listo_future.done() and self.listo_future.exception() is None
+
+    def sintetizar(self, texto: str) -> Future:
+        """Audio WAV de la frase (en el hilo del backend)."""
+        return self._executor.submit(self._sintetizar, texto)
+
+
+class PiperBackend(LocalTTSBackend):
+    """TTS neural en CPU (Piper, modelo ONNX)."""
+
+    nombre = "piper"
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self._voz = None
+        super().__init__()
+
+    def _iniciar(self):
+        piper_cls = _lazy_import_piper()
+        if piper_cls is None:
+            raise ImportError("piper-tts no instalado")
+        self._voz = piper_cls.load(self.model_path)
+
+    def _sintetizar(self, texto: str) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            # piper-tts >= 1.3 renombró synthesize(texto, wav) a synthesize_wav
+            if hasattr(self._voz, "synthesize_wav"):
+                self._voz.synthesize_wav(texto, wav)
+            else:
+                self._voz.synthesize(texto, wav)
+        return buffer.getvalue()
+
+
+class Pyttsx3Backend(LocalTTSBackend):
+    """Motor de voz del sistema operativo (pyttsx3)."""
+
+    nombre = "pyttsx3"
+
+    def __init__(self):
+        self._engine = None
+        self._ruta = os.path.join(tempfile.gettempdir(), f"sara_tts_local_{os.getpid()}.wav")
+        super().__init__()
+
+    def _iniciar(self):
+        modulo = _lazy_import_pyttsx3()
+        if modulo is None:
+            raise ImportError("pyttsx3 no instalado")
+        engine = modulo.init()
+        for voz in engine.getProperty("voices") or []:
+            idiomas = " ".join(str(l) for l in (getattr(voz, "languages", None) or [])).lower()
+            if "es" in idiomas or "spanish" in (voz.name or "").lower() or "español" in (voz.name or "").lower():
+                engine.setProperty("voice", voz.id)
+                break
+        engine.setProperty("rate", VELOCIDAD_PYTTSX3)
+        self._engine = engine
+
+    def _sintetizar(self, texto: str) -> bytes:
+        self._engine.save_to_file(texto, self._ruta)
+        self._engine.runAndWait()
+        with open(self._ruta, "rb") as f:
+            return f.read()
+
+
+def crear_backend_local(model_path: str = "") -> Optional[LocalTTSBackend]:
+    """Piper si hay modelo y está instalado; si no pyttsx3; si no None."""
+    if model_path and os.path.exists(model_path) and _lazy_import_piper() is not None:
+        return PiperBackend(model_path)
+    if model_path:
+        logger.warning(f"Modelo Piper no utilizable ({model_path}); se prueba la voz del sistema")
+    if _lazy_import_pyttsx3() is not None:
+        return Pyttsx3Backend()
+    logger.info("Sin voz local (instala piper-tts o pyttsx3 para hablar sin conexión)")
+    return None
+
+
+_local_tts_instance = None
+_local_tts_path = None
+_local_tts_lock = threading.Lock()
+
+
+def obtener_tts_local(model_path: str = "") -> Optional[LocalTTSBackend]:
+    """Obtiene el backend de voz local global (singleton; se recrea si cambia el modelo)."""
+    global _local_tts_instance, _local_tts_path
+    with _local_tts_lock:
+        if _local_tts_path != model_path:
+            _local_tts_instance = crear_backend_local(model_path)
+            _local_tts_path = model_path
+    return _local_tts_instance
@@ -1,45 +1,158 @@
-import os
+import io
 import threading
 import pygame
 import asyncio
-import edge_tts
 import logging
 import re
-import uuid
 import queue
 import time
-from concurrent.futures import ThreadPoolExecutor
+from latency_tracer import obtener_tracer
+from tts_cache import obtener_tts_cache
+from tts_io import obtener_tts_io
+from tts_local import obtener_tts_local
+from speech_scheduler import SpeechScheduler, Mensaje, PRIORIDAD_NORMAL
 
 # Constantes de configuración de voz OPTIMIZADAS
 VOIZ_NEURAL = "es-ES-ElviraNeural" 
 VOICE_RATE = "+10%"  # ⚡ Balance entre velocidad y claridad
 VOICE_VOLUME = "+0%"
 PYGAME_CLOCK_TICK = 20  # ⚡ Más responsivo (antes 10)
-MAX_WORKERS = 3  # ⚡ Generación paralela
+MAX_WORKERS = 3  # ⚡ Frases sintetizándose en paralelo (semáforo del servicio TTS)
+TTS_CHUNK_TIMEOUT = 15  # Segundos máximos esperando un chunk
+MAX_CHARS_FRASE_STREAM = 220  # Corte forzado de frases largas sin puntuación (streaming)
+PRIMER_SEGMENTO_BYTES = 6 * 1024  # ~1 s de MP3 a 48 kbps: la frase empieza a sonar sin esperar al resto
+SEGMENTO_BYTES = 24 * 1024  # Segmentos siguientes más largos (menos cortes entre decodificaciones)
+CANAL_VOZ = 0  # Canal del mixer reservado para la voz
+LATENCIA_MAX_NEURAL = 1.5  # Segundos sin audio de edge-tts antes de pasar a la voz local
+REINTENTO_NEURAL = 60  # Segundos con voz local tras un fallo o lentitud de la red
+MAX_CHARS_CONFIRMACION_LOCAL = 40  # hablar() de menos caracteres = confirmación: voz local
+
+# Voz neural y velocidad según las preferencias del perfil (idioma, tipo de voz, velocidad)
+VOCES_NEURALES = {
+    ("es-ES", "female"): VOIZ_NEURAL,
+    ("es-ES", "male"): "es-ES-AlvaroNeural",
+    ("en-US", "female"): "en-US-JennyNeural",
+    ("en-US", "male"): "en-US-GuyNeural",
+}
+RATES_PERFIL = {"slow": "-10%", "normal": VOICE_RATE, "fast": "+25%"}
+
+# Confirmaciones cortas del sistema (se precalientan en el cache de audio)
+FRASES_SISTEMA = (
+    "Dime.", "Dictado finalizado.", "Modo discontinuo activado",
+    "Minimizando a segundo plano.", "Modo Zen activado.",
+)
+
+FIN_DE_FRASE = re.compile(r'(?<=[.!?])\s+')
+FIN_DE_FRASE_STREAM = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+# Cabeceras MP3 Layer III (edge-tts entrega audio-24khz-48kbitrate-mono-mp3: MPEG-2, 144 bytes/frame)
+BITRATES_MP3 = {  # kbps por índice, según versión MPEG
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),  # MPEG-2
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),  # MPEG-2.5
+}
+MUESTREOS_MP3 = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _longitud_frame_mp3(datos, pos):
+    """Longitud en bytes del frame MP3 Layer III con cabecera en datos[pos], o 0 si no es una cabecera válida"""
+    if pos + 4 > len(datos) or datos[pos] != 0xFF or datos[pos + 1] & 0xE0 != 0xE0:
+        return 0
+    version = (datos[pos + 1] >> 3) & 0x03
+    capa = (datos[pos + 1] >> 1) & 0x03
+    indice_bitrate = datos[pos + 2] >> 4
+    indice_muestreo = (datos[pos + 2] >> 2) & 0x03
+    if version not in BITRATES_MP3 or capa != 1 or indice_bitrate in (0, 15) or indice_muestreo == 3:
+        return 0
+    bitrate = BITRATES_MP3[version][indice_bitrate] * 1000
+    muestreo = MUESTREOS_MP3[version][indice_muestreo]
+    padding = (datos[pos + 2] >> 1) & 0x01
+    return (144 if version == 3 else 72) * bitrate // muestreo + padding
+
+
+def _inicio_frames_mp3(datos):
+    """Primer punto de sincronía: una cabecera válida seguida de otra (o del final de los datos)"""
+    pos = datos.find(b"\xff")
+    while pos != -1:
+        longitud = _longitud_frame_mp3(datos, pos)
+        if longitud and (pos + longitud >= len(datos) or _longitud_frame_mp3(datos, pos + longitud)):
+            return pos
+        pos = datos.find(b"\xff", pos + 1)
+    return -1
+
+
+def _corte_frames_mp3(datos, desde):
+    """
+    Último límite de frame MP3 en datos a partir de desde, o -1.
+    
+    Recorre las cabeceras frame a frame desde el punto de sincronía (bitrate,
+    muestreo y padding dan la longitud de cada una): un 0xFF dentro del audio
+    de un frame nunca se toma por cabecera. Solo cuenta un frame completo.
+    """
+    pos = 0 if _longitud_frame_mp3(datos, 0) else _inicio_frames_mp3(datos)
+    corte = -1
+    while pos != -1:
+        longitud = _longitud_frame_mp3(datos, pos)
+        if not longitud or pos + longitud > len(datos):
+            break
+        pos += longitud
+        if pos >= desde:
+            corte = pos
+    return corte
+
+
+def parametros_de_perfil(preferencias):
+    """(voz, rate) de edge-tts para las preferencias de voz del perfil de usuario"""
+    voz = VOCES_NEURALES.get((preferencias.get("language"), preferencias.get("type")), VOIZ_NEURAL)
+    return voz, RATES_PERFIL.get(preferencias.get("speed"), VOICE_RATE)
+
+
+class TTSSinAudio(Exception):
+    """La síntesis neural falló (o tardó demasiado) antes de entregar audio"""
+
 
 class NeuralVoiceEngine:
-    def __init__(self):
+    def __init__(self, config=None):
         # OPTIMIZACIÓN: 24kHz Mono (Nativo Edge-TTS) para evitar resampling y overhead
         # Buffer 1024 para evitar crackling pero mantener baja latencia
         pygame.mixer.init(frequency=24000, size=-16, channels=1, buffer=1024)
-        self.cola_audio = queue.Queue()
-        self.stop_event = threading.Event()
-        self.is_speaking = False
-        self.executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        # La voz suena en su propio canal: los segmentos se encadenan con queue()
+        pygame.mixer.set_reserved(CANAL_VOZ + 1)
+        self.canal = pygame.mixer.Channel(CANAL_VOZ)
+        self.tts_io = obtener_tts_io(MAX_WORKERS)
+        self._en_vuelo = set()  # Síntesis de la sesión actual (se cancelan al interrumpir)
+        self._lock_vuelo = threading.Lock()
+        self.tracer = obtener_tracer()
+        self.cache_audio = obtener_tts_cache()
+        # (voz, rate, volumen) de edge-tts; también forman la clave del cache de audio.
+        # Se sustituye la tupla entera: cada frase lee una combinación coherente
+        self.parametros = (VOIZ_NEURAL, VOICE_RATE, VOICE_VOLUME)
+        
+        # Voz local (sin red): respaldo automático y confirmaciones cortas
+        self._configurar_local(config or {})
+        self._neural_degradada_hasta = 0.0
         
-        # Limpiar basura anterior
-        self._limpiar_temporales()
+        # Un solo hilo reproduce todo lo que se dice, por prioridad (ver speech_scheduler.py)
+        self.planificador = SpeechScheduler(reproducir=self._reproducir, interrumpir=self._cortar_audio)
 
-    def _limpiar_temporales(self):
-        """Elimina archivos de audio viejos al inicio"""
-        try:
-            for file in os.listdir():
-                if file.startswith("tts_") and file.endswith(".mp3"):
-                    try:
-                        os.remove(file)
-                    except: pass
-        except Exception as e:
-            logging.error(f"Error limpieza: {e}")
+    def _configurar_local(self, config):
+        # tts_local: "" = automático, "siempre" = solo voz local, "no" = desactivada
+        self.modo_local = config.get("tts_local", "")
+        self.voz_local = None if self.modo_local == "no" else obtener_tts_local(config.get("tts_local_model", ""))
+
+    def reconfigurar(self, config=None, voz=None, rate=None, volumen=None):
+        """
+        Cambia la voz, la velocidad, el volumen y/o la voz local sin recrear el
+        motor: el planificador, el canal del mixer y los callbacks hablar() que
+        ya tienen NetworkGuardian, Pomodoro, etc. siguen siendo los mismos.
+        Lo que ya está sonando termina con la voz anterior.
+        """
+        voz_actual, rate_actual, volumen_actual = self.parametros
+        self.parametros = (voz or voz_actual, rate or rate_actual, volumen or volumen_actual)
+        if config is not None:
+            self._configurar_local(config)
+        logging.info(f"🎙️ Voz reconfigurada: {self.parametros[0]} ({self.parametros[1]})")
 
     def _limpiar_texto(self, texto):
         """Prepara el texto para ser leído naturalmente."""
@@ -56,181 +169,379 @@ class NeuralVoiceEngine:
         texto_limpio = re.sub(r'[^a-zA-Z0-9áéíóúÁÉÍÓÚñÑüÜ\s,.\¿\?¡\!\-\(\)\"\']', '', texto)
         return re.sub(r'\s+', ' ', texto_limpio).strip()
 
-    async def _generar_chunk_async(self, texto, filename):
-        """Genera audio de forma asíncrona"""
-        try:
-            communicate = edge_tts.Communicate(
-                texto, 
-                VOIZ_NEURAL, 
-                rate=VOICE_RATE,
-                volume=VOICE_VOLUME
-            )
-            await communicate.save(filename)
-            return True
-        except Exception as e:
-            logging.error(f"Error TTS: {e}")
-            return False
-
-    def _generar_chunk_sync(self, texto, filename):
-        """Wrapper síncrono para generación"""
-        try:
-            communicate = edge_tts.Communicate(
-                texto, 
-                VOIZ_NEURAL, 
-                rate=VOICE_RATE,
-                volume=VOICE_VOLUME
-            )
-            # Solución: Usar asyncio.run que maneja el loop correctamente en threads
-            asyncio.run(communicate.save(filename))
-            return True
-        except Exception as e:
-            logging.error(f"Error TTS sync: {e}")
-            return False
-        except Exception as e:
-            logging.error(f"Error TTS sync: {e}")
-            return False
+    def _frases(self, texto):
+        """Texto limpio dividido en frases (la unidad de síntesis y de cache)"""
+        texto_limpio = self._limpiar_texto(texto)
+        return [f.strip() for f in FIN_DE_FRASE.split(texto_limpio) if f.strip()]
 
-    def hablar(self, texto):
-        """Habla el texto con latencia mínima"""
-        if not texto: 
-            return
+    async def _sintetizar_async(self, texto, segmentos=None, sesion=None, limite_primer_audio=None, parametros=None):
+        """
+        Sintetiza en memoria: los bytes MP3 de edge-tts se acumulan y se
+        entregan por segmentos (cortados en frontera de frame) en cuanto hay
+        suficiente audio, sin esperar a que termine la frase.
         
-        # Detener audio anterior inmediatamente
-        self.stop_event.set()
-        if pygame.mixer.music.get_busy():
-            pygame.mixer.music.stop()
+        Returns:
+            El audio completo de la frase, o None si se interrumpió
         
-        # Limpiar cola
-        while not self.cola_audio.empty():
+        Raises:
+            TTSSinAudio: Error de red, o nada llegó en limite_primer_audio segundos
+        """
+        communicate = self.tts_io.comunicador(texto, *(parametros or self.parametros))
+        completo = bytearray()
+        buffer = bytearray()
+        umbral = PRIMER_SEGMENTO_BYTES
+        stream = communicate.stream().__aiter__()
+        while True:
             try:
-                filename = self.cola_audio.get_nowait()
-                if filename:
-                    self._safe_remove(filename)
-            except queue.Empty:
+                if limite_primer_audio is not None and not completo:
+                    chunk = await asyncio.wait_for(stream.__anext__(), limite_primer_audio)
+                else:
+                    chunk = await stream.__anext__()
+            except StopAsyncIteration:
                 break
+            except asyncio.TimeoutError:
+                raise TTSSinAudio(f"sin audio en {limite_primer_audio} s")
+            except Exception as e:
+                if not completo:
+                    raise TTSSinAudio(str(e)) from e
+                raise
+            if sesion is not None and not self._vigente(sesion):
+                return None
+            if chunk["type"] != "audio":
+                continue
+            completo.extend(chunk["data"])
+            if segmentos is None:
+                continue
+            buffer.extend(chunk["data"])
+            if len(buffer) >= umbral:
+                corte = _corte_frames_mp3(buffer, umbral // 2)
+                if corte > 0:
+                    segmentos.put(bytes(buffer[:corte]))
+                    del buffer[:corte]
+                    umbral = SEGMENTO_BYTES
+        if buffer:
+            segmentos.put(bytes(buffer))
+        return bytes(completo)
 
-        self.stop_event.clear()
-        self.is_speaking = True
+    def _local_listo(self):
+        return self.voz_local is not None and self.voz_local.listo()
 
-        texto_limpio = self._limpiar_texto(texto)
+    def _usar_local(self, preferir_local=False):
+        """Voz local si se pidió, si la frase es una confirmación o si la red va mal"""
+        if not self._local_listo():
+            return False
+        return (self.modo_local == "siempre" or preferir_local
+                or time.monotonic() < self._neural_degradada_hasta)
+
+    def _degradar_neural(self, motivo):
+        if time.monotonic() >= self._neural_degradada_hasta:
+            logging.warning(f"⚠️ Voz neural no disponible ({motivo}): voz local durante {REINTENTO_NEURAL} s")
+        self._neural_degradada_hasta = time.monotonic() + REINTENTO_NEURAL
+
+    async def _sintetizar_local(self, texto, segmentos, traza=None):
+        inicio = time.perf_counter()
+        segmentos.put(await asyncio.wrap_future(self.voz_local.sintetizar(texto)))
+        self.tracer.registrar("tts_generar_local", (time.perf_counter() - inicio) * 1000, traza)
+        return True
+
+    async def _generar_frase(self, texto, segmentos, sesion, traza=None, preferir_local=False):
+        """Síntesis de una frase en el loop TTS (siempre cierra los segmentos con None)"""
+        inicio = time.perf_counter()
+        parametros = self.parametros  # La misma voz para sintetizar y para la clave del cache
+        try:
+            cacheable = self.cache_audio.cacheable(texto)
+            if cacheable:
+                audio = self.cache_audio.obtener(texto, *parametros)
+                if audio:
+                    segmentos.put(audio)  # Frase conocida: sin red
+                    return True
+            
+            if self._usar_local(preferir_local):
+                return await self._sintetizar_local(texto, segmentos, traza)
+            
+            # Con respaldo local, no esperar más de LATENCIA_MAX_NEURAL al primer audio
+            limite = LATENCIA_MAX_NEURAL if self._local_listo() else None
+            try:
+                audio = await self._sintetizar_async(texto, segmentos, sesion, limite, parametros)
+            except TTSSinAudio as e:
+                if not self._local_listo() or not self._vigente(sesion):
+                    raise
+                self._degradar_neural(e)
+                return await self._sintetizar_local(texto, segmentos, traza)
+            if audio and cacheable:
+                self.cache_audio.guardar(texto, *parametros, audio)
+            self.tracer.registrar("tts_generar", (time.perf_counter() - inicio) * 1000, traza)
+            return audio is not None
+        except Exception as e:
+            logging.error(f"Error TTS: {e}")
+            return False
+        finally:
+            segmentos.put(None)
+
+    def hablar(self, texto, prioridad=PRIORIDAD_NORMAL):
+        """
+        Habla el texto con latencia mínima (no bloquea: entra al planificador)
         
-        # ⚡ Iniciar pipeline optimizado
-        t_gen = threading.Thread(
-            target=self._hilo_productor_paralelo, 
-            args=(texto_limpio,), 
-            daemon=True
-        )
-        t_play = threading.Thread(
-            target=self._hilo_consumidor, 
-            daemon=True
-        )
-        t_gen.start()
-        t_play.start()
-
-    def _hilo_productor_paralelo(self, texto_completo):
-        """Genera audio en paralelo para múltiples frases"""
-        # Dividir en frases más pequeñas para inicio más rápido
-        frases = re.split(r'(?<=[.!?])\s+', texto_completo)
+        Args:
+            texto: Lo que hay que decir
+            prioridad: PRIORIDAD_INFO / NORMAL / ALARMA / CRITICA (speech_scheduler)
         
-        # Filtrar frases vacías
-        frases = [f.strip() for f in frases if f.strip()]
+        Returns:
+            threading.Event que se activa cuando el mensaje termina de sonar (o
+            se descarta); None si no había nada que decir
+        """
+        if not texto: 
+            return None
         
+        # Dividir en frases más pequeñas para inicio más rápido
+        frases = self._frases(texto)
         if not frases:
-            self.cola_audio.put(None)
-            return
-        
-        # ⚡ Generar primera frase inmediatamente (sin esperar)
-        primera_frase = frases[0]
-        filename_0 = f"tts_{uuid.uuid4().hex[:8]}.mp3"
+            return None
         
-        if self._generar_chunk_sync(primera_frase, filename_0):
-            self.cola_audio.put(filename_0)
+        # Confirmaciones cortas ("Hecho.", "Volumen al 50"): voz local, sin ir a la red
+        confirmacion = sum(len(f) for f in frases) <= MAX_CHARS_CONFIRMACION_LOCAL
+        mensaje = self.planificador.encolar(Mensaje(
+            frases, prioridad, clave=" ".join(frases),
+            traza=self.tracer.traza_actual(), preferir_local=confirmacion
+        ))
+        return mensaje.terminado
+
+    def precalentar(self, textos):
+        """
+        Sintetiza en segundo plano las frases fijas que aún no estén en el
+        cache de audio (avisos de rutinas, salud, Pomodoro, confirmaciones).
+        """
+        frases = []
+        for texto in textos:
+            frases.extend(f for f in self._frases(texto) if self.cache_audio.cacheable(f))
+        threading.Thread(target=self._hilo_precalentar, args=(frases,), daemon=True).start()
+
+    def _hilo_precalentar(self, frases):
+        nuevas = 0
+        parametros = self.parametros
+        for frase in dict.fromkeys(frases):
+            if self.cache_audio.contiene(frase, *parametros):
+                continue
+            try:
+                corrutina = self._sintetizar_async(frase, parametros=parametros)
+                audio = self.tts_io.ejecutar(corrutina).result(timeout=TTS_CHUNK_TIMEOUT)
+            except Exception as e:
+                # Sin red: se reintentará en el próximo arranque
+                logging.debug(f"Precalentado TTS interrumpido: {e}")
+                break
+            if audio:
+                self.cache_audio.guardar(frase, *parametros, audio)
+                nuevas += 1
+        if nuevas:
+            logging.info(f"🔊 Cache de audio precalentado: {nuevas} frases nuevas")
+
+    def hablar_stream(self, fragmentos, prioridad=PRIORIDAD_NORMAL):
+        """
+        Habla un texto que llega por partes (streaming del LLM).
+        Cada frase pasa al TTS en cuanto se cierra, sin esperar al resto.
         
-        # ⚡ Generar resto en paralelo (Optimizado con futures_map)
-        if len(frases) > 1:
-            futures_map = {}
-            orden_futures = [] # Para mantener el orden de reproducción
+        Args:
+            fragmentos: Iterable de trozos de texto (se consume en el productor)
+            prioridad: Ver hablar()
+        """
+        self.planificador.encolar(Mensaje(
+            self._frases_de_stream(fragmentos), prioridad, stream=True,
+            traza=self.tracer.traza_actual()
+        ))
 
-            for frase in frases[1:]:
-                if self.stop_event.is_set(): break
-                
-                filename = f"tts_{uuid.uuid4().hex[:8]}.mp3"
-                future = self.executor.submit(self._generar_chunk_sync, frase, filename)
-                
-                futures_map[future] = filename
-                orden_futures.append(future)
+    def _frases_de_stream(self, fragmentos):
+        """Acumula fragmentos y produce frases completas (ya limpias)"""
+        buffer = ""
+        for fragmento in fragmentos:
+            buffer += fragmento
             
-            # Recolectar resultados en ORDEN
-            for future in orden_futures:
-                if self.stop_event.is_set(): break
-                try:
-                    # Esperar a que este chunk específico esté listo
-                    if future.result(timeout=15): 
-                        filename = futures_map[future]
-                        self.cola_audio.put(filename)
-                except Exception as e:
-                    logging.error(f"Error en futuro TTS: {e}")
+            # Frase cerrada: puntuación final seguida de espacio o salto de línea
+            while True:
+                fin = FIN_DE_FRASE_STREAM.search(buffer)
+                if not fin:
+                    break
+                frase = self._limpiar_texto(buffer[:fin.start()])
+                buffer = buffer[fin.end():]
+                if frase:
+                    yield frase
+            
+            # Frase demasiado larga sin puntuación: cortar en el último espacio
+            if len(buffer) > MAX_CHARS_FRASE_STREAM and " " in buffer:
+                corte = buffer.rfind(" ")
+                frase = self._limpiar_texto(buffer[:corte])
+                buffer = buffer[corte + 1:]
+                if frase:
+                    yield frase
         
-        self.cola_audio.put(None)  # Señal de fin
+        resto = self._limpiar_texto(buffer)
+        if resto:
+            yield resto
+
+    def _reproducir(self, mensaje):
+        """
+        Dice un mensaje completo (hilo del planificador): el productor programa
+        la síntesis de cada frase en el loop TTS y aquí se reproducen en orden.
+        """
+        sesion = mensaje.sesion
+        traza = mensaje.extra.get("traza")
+        cola = queue.Queue()
+        productor = self.tts_io.programar(self._productor(
+            mensaje.frases, mensaje.stream, cola, sesion, traza, mensaje.extra.get("preferir_local", False)
+        ))
+        try:
+            self._consumidor(cola, sesion, traza, time.perf_counter())
+        finally:
+            productor.cancel()
+
+    def _cortar_audio(self):
+        """Interrupción (la pide el planificador): silencio y fuera la síntesis en vuelo"""
+        self.canal.stop()
+        self._cancelar_sintesis()
 
-    def _hilo_consumidor(self):
-        """Reproduce audio de la cola"""
-        while not self.stop_event.is_set():
+    def _vigente(self, sesion):
+        """True si el mensaje de esa sesión no ha sido interrumpido ni detenido"""
+        return self.planificador.vigente(sesion)
+
+    def _vaciar_cola(self, cola):
+        """Descarta las frases pendientes de una cola (cancela su síntesis)"""
+        while True:
+            try:
+                item = cola.get_nowait()
+            except queue.Empty:
+                break
+            if item:
+                future, _segmentos = item
+                future.cancel()
+
+    def _cancelar_sintesis(self):
+        """Cancela las síntesis en vuelo (cierra sus websockets en el loop TTS)"""
+        with self._lock_vuelo:
+            en_vuelo = list(self._en_vuelo)
+            self._en_vuelo.clear()
+        for future in en_vuelo:
+            future.cancel()
+
+    def _lanzar_sintesis(self, frase, segmentos, sesion, traza=None, preferir_local=False):
+        """Programa la síntesis de una frase en el loop TTS"""
+        future = self.tts_io.ejecutar(self._generar_frase(frase, segmentos, sesion, traza, preferir_local))
+        with self._lock_vuelo:
+            self._en_vuelo.add(future)
+        future.add_done_callback(self._fin_sintesis)
+        return future
+
+    def _fin_sintesis(self, future):
+        with self._lock_vuelo:
+            self._en_vuelo.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"Error en síntesis TTS: {future.exception()}")
+
+    async def _productor(self, frases, stream, cola, sesion, traza=None, preferir_local=False):
+        """
+        Genera audio en paralelo para múltiples frases.
+        Las frases pueden llegar poco a poco (streaming): cada una se programa
+        en el loop TTS en cuanto está disponible y su cola de segmentos entra
+        a la cola EN ORDEN.
+        """
+        loop = asyncio.get_running_loop()
+        iterador = iter(frases)
+        try:
+            while self._vigente(sesion):
+                # El texto en streaming llega de la IA: se espera fuera del loop
+                if stream:
+                    frase = await loop.run_in_executor(None, next, iterador, None)
+                else:
+                    frase = next(iterador, None)
+                if frase is None or not self._vigente(sesion):
+                    break
+                
+                segmentos = queue.Queue()
+                future = self._lanzar_sintesis(frase, segmentos, sesion, traza, preferir_local)
+                cola.put((future, segmentos))
+        except Exception as e:
+            logging.error(f"Error productor TTS: {e}")
+        finally:
+            cola.put(None)  # Señal de fin
+
+    def _siguiente_segmento(self, future, segmentos, sesion):
+        """Espera el próximo segmento de una frase (None = fin, cancelada o timeout)"""
+        limite = time.perf_counter() + TTS_CHUNK_TIMEOUT
+        while self._vigente(sesion) and time.perf_counter() < limite:
+            try:
+                return segmentos.get(timeout=0.1)
+            except queue.Empty:
+                # Cancelada antes de empezar: nadie cerrará la cola
+                if future.cancelled():
+                    return None
+        if self._vigente(sesion):
+            logging.error("Timeout esperando audio TTS")
+        return None
+
+    def _esperar_canal(self, sesion, vacio=False):
+        """Espera a que quede libre el hueco de cola del canal (o a que calle, si vacio=True)"""
+        ocupado = self.canal.get_busy if vacio else (lambda: self.canal.get_queue() is not None)
+        reloj = pygame.time.Clock()
+        while ocupado() and self._vigente(sesion):
+            reloj.tick(PYGAME_CLOCK_TICK)
+
+    def _consumidor(self, cola, sesion, traza=None, t_inicio=None):
+        """
+        Reproduce desde memoria (en orden): cada segmento se decodifica a un
+        Sound y se encola en el canal de voz mientras suena el anterior.
+        """
+        primer_audio = True
+        while self._vigente(sesion):
             try:
-                filename = self.cola_audio.get(timeout=0.5)
+                item = cola.get(timeout=0.5)
                 
-                if filename is None:  # Fin
+                if item is None:  # Fin
                     break
                 
-                # Reproducir inmediatamente
-                try:
-                    pygame.mixer.music.load(filename)
-                    pygame.mixer.music.play()
+                future, segmentos = item
+                while True:
+                    datos = self._siguiente_segmento(future, segmentos, sesion)
+                    if datos is None or not self._vigente(sesion):
+                        break
+                    try:
+                        sonido = pygame.mixer.Sound(file=io.BytesIO(datos))
+                    except Exception as e:
+                        logging.error(f"Error decodificando audio: {e}")
+                        continue
                     
-                    # Esperar a que termine
-                    while pygame.mixer.music.get_busy() and not self.stop_event.is_set():
-                        pygame.time.Clock().tick(PYGAME_CLOCK_TICK)
+                    # Encadenar sin hueco: el canal admite un sonido en espera
+                    self._esperar_canal(sesion)
+                    if not self._vigente(sesion):
+                        break
+                    if self.canal.get_busy():
+                        self.canal.queue(sonido)
+                    else:
+                        self.canal.play(sonido)
                     
-                    pygame.mixer.music.unload() # CRÍTICO: Liberar archivo para poder borrarlo en Windows
-                except Exception as e:
-                    logging.error(f"Error reproducción: {e}")
-                
-                # Limpiar archivo con reintentos (Fix Windows File Lock)
-                self._safe_remove(filename)
+                    # Latencia percibida: desde que le toca al mensaje hasta el primer sonido
+                    if primer_audio and t_inicio is not None:
+                        self.tracer.registrar("tts_primer_audio", (time.perf_counter() - t_inicio) * 1000, traza)
+                    primer_audio = False
                     
             except queue.Empty:
                 continue
             except Exception as e:
                 logging.error(f"Error consumidor: {e}")
         
-        self.is_speaking = False
-
-    def _safe_remove(self, path):
-        """Intenta borrar un archivo con reintentos para evitar errores de bloqueo"""
-        if not path or not os.path.exists(path): return
+        # Esperar a que termine lo último que se encoló
+        self._esperar_canal(sesion, vacio=True)
         
-        for i in range(5): # 5 intentos
-            try:
-                os.remove(path)
-                return
-            except PermissionError:
-                time.sleep(0.1) # Esperar un poco
-            except Exception as e:
-                logging.debug(f"Error borrando {path}: {e}")
-                return
+        # Interrumpido: descartar lo que quede de esta sesión
+        self._vaciar_cola(cola)
 
     def detener(self):
-        """Detiene la reproducción inmediatamente"""
-        self.stop_event.set()
-        if pygame.mixer.music.get_busy():
-            pygame.mixer.music.stop()
-        self.is_speaking = False
+        """Detiene la reproducción inmediatamente (y descarta lo pendiente)"""
+        self.planificador.detener()
+        self.canal.stop()
+        self._cancelar_sintesis()
 
     def esta_hablando(self):
-        """Verifica si está hablando"""
-        return self.is_speaking or pygame.mixer.music.get_busy()
+        """Verifica si está hablando (o tiene algo pendiente de decir)"""
+        return self.planificador.ocupado() or self.canal.get_busy()
     
     def __del__(self):
         """Limpieza al destruir"""
         self.detener()
-        self.executor.shutdown(wait=False)
@@ -2,6 +2,8 @@ from playwright.sync_api import sync_playwright
 import logging
 import time
 
+MAX_CHARS_PAGINA = 40000  # Tope de texto leído por página (solo para no saturar memoria)
+
 class SaraWebSurfer:
     def __init__(self, headless=False):
         self.headless = headless
@@ -65,8 +67,10 @@ class SaraWebSurfer:
                     texto = el.inner_text()
                     break
             
-            # Limpiar un poco (tomar primeros 2000 chars para no saturar memoria)
-            return texto[:2000] + "\n...(contenido truncado)" if texto else "No pude leer el contenido."
+            # Tope solo por memoria: el recorte para la IA lo hace context_budget por relevancia
+            if not texto:
+                return "No pude leer el contenido."
+            return texto[:MAX_CHARS_PAGINA] + "\n...(contenido truncado)" if len(texto) > MAX_CHARS_PAGINA else texto
 
         return self._navegar(url, accion)
 